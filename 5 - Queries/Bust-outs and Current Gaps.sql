@@ -0,0 +1,23 @@
+-- Biggest bust-outs of 2023: performances with the longest gap
+-- since the song was previously played (uses performance_gaps)
+SELECT
+    s.title,
+    pg.show_date,
+    pg.shows_since_previous,
+    pg.days_since_previous
+FROM performance_gaps pg
+JOIN songs s ON s.song_id = pg.song_id
+WHERE pg.show_date BETWEEN '2023-01-01' AND '2023-12-31'
+ORDER BY pg.shows_since_previous DESC NULLS LAST
+LIMIT 20;
+
+-- Songs not played in 100+ shows (uses song_current_gaps)
+SELECT
+    title,
+    album,
+    last_played,
+    shows_since_last,
+    days_since_last
+FROM song_current_gaps
+WHERE shows_since_last >= 100
+ORDER BY shows_since_last ASC;
@@ -24,7 +24,7 @@ PhillyShows AS (
     SELECT
         sh.show_id,
         sh.date
-    FROM shows sh
+    FROM show_details sh
     WHERE
         sh.city = 'Philadelphia'
         AND sh.state_code = 'PA' -- Specify Pennsylvania to be sure
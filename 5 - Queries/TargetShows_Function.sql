@@ -3,7 +3,7 @@ WITH TargetShows AS (
     SELECT
         show_id
     FROM
-        shows
+        show_details
     WHERE
         -- Criterion 1: Tours after "Working on a Dream"
         -- We'll approximate this by selecting shows on or after Jan 1, 2010
@@ -3,6 +3,10 @@
 // Adds Prism.js syntax highlighting for SQL display.
 // Adds Vertical resizing for Explanation/SQL and Table sections.
 // REMOVED: Vertical resizing for Input section.
+// Streams the AI answer over Server-Sent Events: SQL/explanation render as they arrive
+// and "Run" is enabled as soon as the SQL block is complete.
+// Optional one-step mode (/ask_and_run) generates and executes the SQL in a single request.
+// Large results arrive a page at a time ("Load more rows" fetches the next page).
 
 // --- DOM Elements ---
 const nlQueryTextarea = document.getElementById('nl-query');
@@ -13,6 +17,7 @@ const resultsAnalysisDiv = document.getElementById('results-analysis');
 const loadingSpinner = document.getElementById('loading-spinner');
 const generatedSqlContainer = document.getElementById('generated-sql-container');
 const generatedSqlDisplay = document.getElementById('generated-sql-display');
+const autoRunToggle = document.getElementById('auto-run-toggle');
 // References for resizable sections and their handles
 // REMOVED inputAreaContent and resizeHandleInput
 // const inputAreaContent = document.getElementById('input-area-content');
@@ -30,6 +35,7 @@ const detailsResultsTable = document.getElementById('details-results-table');
 
 // --- State Variables ---
 let currentSql = "";
+let currentContinuation = null; // Token for the next page of the last query, if the server has more rows
 let currentAppState = "idle";
 
 // --- Functions ---
@@ -55,6 +61,7 @@ function clearOutput(clearInput = false) {
     if (detailsExplanationSql) detailsExplanationSql.open = false;
     if (detailsResultsTable) detailsResultsTable.open = false;
 
+    updateLoadMore({ has_more: false }); // Drop any "Load more" footer from the previous query
     currentSql = ""; setAppState("idle");
     if (clearInput) nlQueryTextarea.value = '';
 }
@@ -67,10 +74,43 @@ function showStatus(message, isError = false, isLoading = false) {
     statusMessageDiv.className = classes; if (isLoading) loadingSpinner.classList.remove('hidden'); else loadingSpinner.classList.add('hidden');
 }
 
+/** Builds one table row */
+function buildRow(rowData) {
+    const row = document.createElement('tr'); if(Array.isArray(rowData)){ rowData.forEach(cellData => { const td = document.createElement('td'); td.className = 'px-6 py-4 whitespace-nowrap text-sm text-gray-900'; td.textContent = cellData === null ? 'NULL' : String(cellData); row.appendChild(td); }); } return row;
+}
+
+/** Shows "Load more" under the table while the server still holds an open cursor for the query */
+function updateLoadMore(result) {
+    currentContinuation = result.has_more ? result.continuation : null;
+    let footer = document.getElementById('load-more-footer');
+    if (!currentContinuation) { if (footer) footer.remove(); return; }
+    if (!footer) {
+        footer = document.createElement('div'); footer.id = 'load-more-footer'; footer.className = 'mt-2 flex items-center gap-4 text-sm text-gray-600';
+        footer.innerHTML = '<button id="load-more-button" class="bg-gray-200 hover:bg-gray-300 font-bold py-1 px-3 rounded">Load more rows</button><span id="load-more-info"></span>';
+        resultsTableContainer.appendChild(footer);
+        document.getElementById('load-more-button').addEventListener('click', loadMoreRows);
+    }
+    const estimate = result.row_estimate ? ` of ~${result.row_estimate}` : '';
+    document.getElementById('load-more-info').textContent = `Showing ${result.rows_fetched}${estimate} rows.`;
+}
+
+/** Fetches the next page of the current query and appends it to the table */
+async function loadMoreRows() {
+    if (!currentContinuation) return;
+    const button = document.getElementById('load-more-button'); if (button) { button.disabled = true; button.textContent = 'Loading...'; }
+    try {
+        const response = await fetch('/query', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ continuation: currentContinuation }), });
+        const result = await response.json(); if (!response.ok || result.error) throw new Error(result.error || `HTTP error ${response.status}`);
+        const tbody = resultsTableContainer.querySelector('tbody'); result.data.forEach(rowData => tbody.appendChild(buildRow(rowData)));
+        showStatus(result.message || 'Success.', false); updateLoadMore(result);
+    } catch (error) { console.error('Load more Error:', error); showStatus(`Error: ${error.message}`, true); updateLoadMore({ has_more: false }); }
+    finally { if (button) { button.disabled = false; button.textContent = 'Load more rows'; } }
+}
+
 /** Renders the data table */
 function renderTable(columns, data) {
     // (Function unchanged)
-    const table = document.createElement('table'); table.className = 'min-w-full divide-y divide-gray-200'; const thead = document.createElement('thead'); thead.className = 'bg-gray-50'; const headerRow = document.createElement('tr'); if (Array.isArray(columns)) { columns.forEach(colName => { const th = document.createElement('th'); th.scope = 'col'; th.className = 'px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider'; th.textContent = colName; headerRow.appendChild(th); }); } thead.appendChild(headerRow); table.appendChild(thead); const tbody = document.createElement('tbody'); tbody.className = 'bg-white divide-y divide-gray-200'; if (!data || data.length === 0) { const row = document.createElement('tr'); const cell = document.createElement('td'); cell.colSpan = columns?.length || 1; cell.textContent = 'Query returned no results.'; cell.className = 'px-6 py-4 text-sm text-gray-500 text-center'; row.appendChild(cell); tbody.appendChild(row); } else { data.forEach(rowData => { const row = document.createElement('tr'); if(Array.isArray(rowData)){ rowData.forEach(cellData => { const td = document.createElement('td'); td.className = 'px-6 py-4 whitespace-nowrap text-sm text-gray-900'; td.textContent = cellData === null ? 'NULL' : String(cellData); row.appendChild(td); }); } tbody.appendChild(row); }); } table.appendChild(tbody); resultsTableContainer.innerHTML = ''; resultsTableContainer.appendChild(table);
+    const table = document.createElement('table'); table.className = 'min-w-full divide-y divide-gray-200'; const thead = document.createElement('thead'); thead.className = 'bg-gray-50'; const headerRow = document.createElement('tr'); if (Array.isArray(columns)) { columns.forEach(colName => { const th = document.createElement('th'); th.scope = 'col'; th.className = 'px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider'; th.textContent = colName; headerRow.appendChild(th); }); } thead.appendChild(headerRow); table.appendChild(thead); const tbody = document.createElement('tbody'); tbody.className = 'bg-white divide-y divide-gray-200'; if (!data || data.length === 0) { const row = document.createElement('tr'); const cell = document.createElement('td'); cell.colSpan = columns?.length || 1; cell.textContent = 'Query returned no results.'; cell.className = 'px-6 py-4 text-sm text-gray-500 text-center'; row.appendChild(cell); tbody.appendChild(row); } else { data.forEach(rowData => tbody.appendChild(buildRow(rowData))); } table.appendChild(tbody); resultsTableContainer.innerHTML = ''; resultsTableContainer.appendChild(table);
 }
 
 /** Sets the application state and updates button */
@@ -86,12 +126,106 @@ function setAppState(newState) {
     }
 }
 
+/** Highlights the SQL display with Prism (if loaded) */
+function highlightSql() {
+    setTimeout(() => { if (window.Prism && Prism.languages.sql) { try { Prism.highlightElement(generatedSqlDisplay); } catch (e) { console.error("Prism failed:", e); } } else { console.warn('Prism/SQL lang not loaded.'); } }, 0);
+}
+
+/** Shows the final SQL and switches the button to "Run" (may happen while the explanation is still streaming) */
+function showSqlReady(sql, stillStreaming = false) {
+    currentSql = sql || "";
+    if (!currentSql || !generatedSqlDisplay || !generatedSqlContainer) return;
+    generatedSqlDisplay.textContent = currentSql; // textContent prevents XSS from SQL
+    generatedSqlContainer.style.display = 'block';
+    highlightSql();
+    if (detailsExplanationSql) detailsExplanationSql.open = true;
+    setAppState("sql_ready");
+    showStatus(stillStreaming ? 'SQL ready. Click Run to execute (explanation still arriving)...' : 'AI generated SQL. Click Run to execute.', false, false);
+}
+
+/** Parses a text/event-stream body, calling onEvent(eventName, data) for each message */
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader(); const decoder = new TextDecoder(); let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read(); if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+            const message = buffer.slice(0, boundary); buffer = buffer.slice(boundary + 2);
+            let eventName = 'message'; const dataLines = [];
+            message.split('\n').forEach(line => { if (line.startsWith('event:')) eventName = line.slice(6).trim(); else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim()); });
+            if (dataLines.length) onEvent(eventName, JSON.parse(dataLines.join('\n')));
+        }
+    }
+}
+
+/** Asks the AI via the streaming endpoint and renders SQL/explanation progressively */
+async function streamNlQuery(nlQuery) {
+    const response = await fetch('/process_nl_query_stream', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ query: nlQuery }), });
+    if (!response.ok || !response.body) { let message = `HTTP error ${response.status}`; try { message = (await response.json()).error || message; } catch (e) {} throw new Error(message); }
+    let streamedSql = '', streamedExplanation = '', finished = false;
+    if (detailsExplanationSql) detailsExplanationSql.open = true;
+    await readEventStream(response, (eventName, data) => {
+        switch (eventName) {
+            case 'sql_delta':
+                streamedSql += data.text; generatedSqlDisplay.textContent = streamedSql; generatedSqlContainer.style.display = 'block'; break;
+            case 'explanation_delta':
+                streamedExplanation += data.text; resultsAnalysisDiv.textContent = streamedExplanation; break; // Plain text until the formatted version arrives
+            case 'sql':
+                showSqlReady(data.sql, true); break;
+            case 'repairing':
+                showStatus(`Generated SQL failed to plan (${data.error}); asking the AI to fix it...`, false, true); break;
+            case 'done':
+                finished = true;
+                resultsAnalysisDiv.innerHTML = data.explanation || "<ul><li>(No explanation provided.)</li></ul>";
+                if (data.sql && data.sql !== currentSql) showSqlReady(data.sql);
+                if (currentAppState === "sql_ready") showStatus(data.cached ? 'AI generated SQL (from cache). Click Run to execute.' : data.validation && data.validation.status === 'repaired' ? 'AI generated SQL (fixed after a planning error). Click Run to execute.' : 'AI generated SQL. Click Run to execute.', false, false);
+                break;
+            case 'error':
+                finished = true;
+                if (data.explanation) resultsAnalysisDiv.innerHTML = data.explanation;
+                throw new Error(data.error || 'Streaming failed.');
+        }
+    });
+    if (!finished) throw new Error('Connection closed before the AI finished answering.');
+}
+
+/** One round trip: the server generates the SQL, runs it and returns everything together */
+async function askAndRun(nlQuery) {
+    const response = await fetch('/ask_and_run', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ query: nlQuery }), });
+    const result = await response.json();
+    if (result.explanation && resultsAnalysisDiv) resultsAnalysisDiv.innerHTML = result.explanation;
+    if (result.sql) { currentSql = result.sql; generatedSqlDisplay.textContent = currentSql; generatedSqlContainer.style.display = 'block'; highlightSql(); }
+    if (detailsExplanationSql && (result.sql || result.explanation)) detailsExplanationSql.open = true;
+    const execResult = result.results;
+    if (!execResult) throw new Error(result.error || `HTTP error ${response.status}`);
+    if (!response.ok || execResult.error) throw new Error(`SQL Failed: ${execResult.error || result.error}`);
+    showStatus(execResult.message || 'Success.', false); renderTable(execResult.columns, execResult.data); updateLoadMore(execResult);
+    if (detailsResultsTable) detailsResultsTable.open = true;
+}
+
 /** Main handler for the submit button click */
 async function handleSubmitClick() {
     // (Function unchanged)
     if (currentAppState === "idle") {
         const nlQuery = nlQueryTextarea.value.trim(); if (!nlQuery) { showStatus('Please enter a question.', true); return; }
         clearOutput(); setAppState("processing_nl");
+        if (autoRunToggle && autoRunToggle.checked) {
+            showStatus('Asking AI Assistant and running the query...', false, true);
+            try { await askAndRun(nlQuery); }
+            catch (error) { console.error('Ask-and-run Error:', error); showStatus(`Error: ${error.message}`, true); }
+            finally { setAppState("idle"); }
+            return;
+        }
+        if (window.ReadableStream && window.TextDecoder) {
+            try { await streamNlQuery(nlQuery); }
+            catch (error) {
+                console.error('NL Stream Error:', error);
+                if (currentAppState === 'sql_ready') showStatus(`SQL ready, but the explanation failed: ${error.message}`, true);
+                else { showStatus(`Failed: ${error.message}`, true); setAppState("idle"); }
+            }
+            return;
+        }
         try {
             const response = await fetch('/process_nl_query', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ query: nlQuery }), });
             const result = await response.json(); if (!response.ok || result.error) throw new Error(result.error || `HTTP error ${response.status}`);
@@ -107,7 +241,7 @@ async function handleSubmitClick() {
                 generatedSqlDisplay.textContent = currentSql; // Still use textContent for SQL to prevent XSS from SQL
                 generatedSqlContainer.style.display = 'block';
                 // Re-highlight after setting content
-                setTimeout(() => { if (window.Prism && Prism.languages.sql) { try { Prism.highlightElement(generatedSqlDisplay); console.info("Prism applied."); } catch (e) { console.error("Prism failed:", e); } } else { console.warn('Prism/SQL lang not loaded.'); } }, 0);
+                highlightSql();
                 if (detailsExplanationSql) detailsExplanationSql.open = true;
                 setAppState("sql_ready"); showStatus('AI generated SQL. Click Run to execute.', false, false);
             } else { if (explanation && detailsExplanationSql) detailsExplanationSql.open = true; showStatus(currentSql ? 'Failed display SQL.' : 'Failed generate SQL.', true); setAppState("idle"); }
@@ -119,7 +253,7 @@ async function handleSubmitClick() {
         try {
             const execResponse = await fetch('/query', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ sql: currentSql }), });
             const execResult = await execResponse.json(); if (!execResponse.ok || execResult.error) throw new Error(`SQL Failed: ${execResult.error || `HTTP error ${execResponse.status}`}\nSQL:\n${currentSql}`);
-            showStatus(execResult.message || 'Success.', false); renderTable(execResult.columns, execResult.data);
+            showStatus(execResult.message || 'Success.', false); renderTable(execResult.columns, execResult.data); updateLoadMore(execResult);
             if (detailsResultsTable) detailsResultsTable.open = true;
             setAppState("idle");
         } catch (error) { console.error('SQL Exec Error:', error); showStatus(`Error: ${error.message}`, true); setAppState("idle"); }
@@ -174,6 +308,11 @@ function makeResizable(handleId, targetId, minHeight = 50) {
 
 // --- Event Listeners ---
 submitButton.addEventListener('click', handleSubmitClick);
+// Remember the one-step mode choice between visits
+if (autoRunToggle) {
+    autoRunToggle.checked = localStorage.getItem('autoRun') === 'true';
+    autoRunToggle.addEventListener('change', () => localStorage.setItem('autoRun', autoRunToggle.checked));
+}
 
 // Setup resizing for relevant sections after DOM is loaded
 document.addEventListener('DOMContentLoaded', () => {
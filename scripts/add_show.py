@@ -0,0 +1,155 @@
+# add_show.py
+# Adds one show (and its setlist) to a populated database without a full
+# reload. The show is described by a JSON file:
+#   {"date": "2025-05-14", "tour": "Land of Hope and Dreams Tour",
+#    "venue": "Co-op Live", "city": "Manchester", "state_name": "", "state_code": "",
+#    "country_name": "United Kingdom", "country_code": "GB", "show_notes": "",
+#    "songs": ["No Surrender", {"title": "Land of Hope and Dreams", "notes": "Tour premiere"}]}
+# Unknown tours, venues, cities and songs are created. The gap and transition
+# tables are maintained incrementally (add_show_gaps, add_show_transitions), the
+# small statistics are recomputed, song_timeline is refreshed and the data
+# generation is bumped, all in one transaction; then the setlist similarity
+# index is rebuilt.
+# Usage: python add_show.py show.json [--dry-run]
+
+import sys
+import json
+import logging
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import psycopg2
+
+try:
+    from database_config import get_connection_string
+except ImportError:
+    print("ERROR: database_config.py not found or missing required elements.")
+    sys.exit(1)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# populate_database COPYs explicit ids, which leaves the SERIAL sequences behind
+SERIAL_COLUMNS = (('songs', 'song_id'), ('tours', 'tour_id'), ('cities', 'city_id'), ('venues', 'venue_id'),
+                  ('shows', 'show_id'), ('setlists', 'setlist_entry_id'))
+
+
+def load_show_file(path: Path) -> Dict[str, Any]:
+    """Reads and checks a show description; songs become [{"title", "notes"}] in setlist order."""
+    show = json.loads(path.read_text(encoding='utf-8'))
+    missing = [key for key in ('date', 'tour', 'venue', 'city', 'songs') if not show.get(key)]
+    if missing: raise ValueError(f"{path.name} is missing: {', '.join(missing)}")
+    show['songs'] = [song if isinstance(song, dict) else {"title": song} for song in show['songs']]
+    if any(not (song.get('title') or '').strip() for song in show['songs']): raise ValueError("Every song needs a title.")
+    return show
+
+
+def _nullable(value: Optional[str]) -> Optional[str]:
+    return value.strip() if value and value.strip() else None
+
+
+def sync_sequences(cursor):
+    for table, column in SERIAL_COLUMNS:
+        cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), GREATEST(COALESCE(MAX({column}), 0), 1), MAX({column}) IS NOT NULL) FROM {table};")
+
+
+def get_or_create(cursor, select_sql: str, select_args: tuple, insert_sql: str, insert_args: tuple, label: str) -> int:
+    cursor.execute(select_sql, select_args)
+    row = cursor.fetchone()
+    if row: return row[0]
+    cursor.execute(insert_sql, insert_args)
+    logger.info(f"Created {label}.")
+    return cursor.fetchone()[0]
+
+
+def song_ids(cursor, songs: List[Dict[str, Any]]) -> List[int]:
+    """song_id per setlist entry (matched case-insensitively on the title; unknown titles are added to songs)."""
+    ids = []
+    for song in songs:
+        title = song['title'].strip()
+        ids.append(get_or_create(cursor, "SELECT song_id FROM songs WHERE lower(title) = lower(%s) ORDER BY song_id LIMIT 1;", (title,),
+                                 "INSERT INTO songs (title) VALUES (%s) RETURNING song_id;", (title,), f"song '{title}'"))
+    return ids
+
+
+def add_show(conn: psycopg2.extensions.connection, show: Dict[str, Any]) -> int:
+    """Inserts the show and its setlist and updates every derived table; returns the new show_id (not committed)."""
+    cursor = conn.cursor()
+    try:
+        sync_sequences(cursor)
+        tour_id = get_or_create(cursor, "SELECT tour_id FROM tours WHERE name = %s;", (show['tour'],),
+                                "INSERT INTO tours (name) VALUES (%s) RETURNING tour_id;", (show['tour'],), f"tour '{show['tour']}'")
+        state_code, country_code = _nullable(show.get('state_code')), _nullable(show.get('country_code'))
+        city_id = get_or_create(cursor,
+                                "SELECT city_id FROM cities WHERE name = %s AND state_code IS NOT DISTINCT FROM %s "
+                                "AND country_code IS NOT DISTINCT FROM %s ORDER BY city_id LIMIT 1;",
+                                (show['city'], state_code, country_code),
+                                "INSERT INTO cities (name, state_name, state_code, country_name, country_code) VALUES (%s, %s, %s, %s, %s) RETURNING city_id;",
+                                (show['city'], _nullable(show.get('state_name')), state_code, _nullable(show.get('country_name')), country_code),
+                                f"city '{show['city']}'")
+        venue_id = get_or_create(cursor, "SELECT venue_id FROM venues WHERE name = %s AND city_id = %s;", (show['venue'], city_id),
+                                 "INSERT INTO venues (name, city_id) VALUES (%s, %s) RETURNING venue_id;", (show['venue'], city_id),
+                                 f"venue '{show['venue']}'")
+        cursor.execute("INSERT INTO shows (date, tour_id, venue_id, city_id, show_notes) VALUES (%s, %s, %s, %s, %s) RETURNING show_id;",
+                       (show['date'], tour_id, venue_id, city_id, show.get('show_notes') or None))
+        show_id = cursor.fetchone()[0]
+        entries = [(show_id, song_id, position, song.get('notes') or None)
+                   for position, (song, song_id) in enumerate(zip(show['songs'], song_ids(cursor, show['songs'])), start=1)]
+        cursor.executemany("INSERT INTO setlists (show_id, song_id, position, notes) VALUES (%s, %s, %s, %s);", entries)
+        logger.info(f"Inserted show {show_id} ({show['date']}, {show['venue']}) with {len(entries)} songs.")
+
+        # Numbers the show and appends its gaps (a show older than the latest one renumbers and rebuilds instead)
+        cursor.execute("SELECT add_show_gaps(%s);", (show_id,))
+        cursor.execute("SELECT add_show_transitions(%s);", (show_id,))
+        cursor.execute("""
+            INSERT INTO performances (setlist_entry_id, show_id, song_id, show_date, show_number, tour, venue, city,
+                                      state_name, state_code, country_name, country_code,
+                                      song_title, album, is_outtake, position, notes)
+            SELECT sl.setlist_entry_id, sl.show_id, sl.song_id, sd.date, sd.show_number, sd.tour, sd.venue, sd.city,
+                   sd.state_name, sd.state_code, sd.country_name, sd.country_code,
+                   sg.title, sg.album, sg.is_outtake, sl.position, sl.notes
+            FROM setlists sl
+            JOIN show_details sd ON sd.show_id = sl.show_id
+            JOIN songs sg ON sg.song_id = sl.song_id
+            WHERE sl.show_id = %s;""", (show_id,))
+        cursor.execute("""
+            UPDATE performances p SET show_number = sh.show_number
+            FROM shows sh
+            WHERE p.show_id = sh.show_id AND p.show_number IS DISTINCT FROM sh.show_number;""")
+        for function in ('update_song_play_counts', 'update_song_rarity_levels', 'update_show_song_counts', 'update_dimension_stats'):
+            cursor.execute(f"SELECT {function}();")
+        cursor.execute("REFRESH MATERIALIZED VIEW song_timeline;")
+        cursor.execute("SELECT bump_data_generation();")
+        logger.info(f"Derived tables updated; data generation is now {cursor.fetchone()[0]}.")
+        conn.notices.clear()
+        return show_id
+    finally:
+        cursor.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add one show to the database and update the derived tables incrementally.")
+    parser.add_argument('show_file', type=Path, help="JSON file describing the show and its setlist.")
+    parser.add_argument('--dry-run', action='store_true', help="Do everything, then roll back.")
+    args = parser.parse_args()
+
+    try: show = load_show_file(args.show_file)
+    except (OSError, ValueError) as e: sys.exit(f"Invalid show file: {e}")
+    conn = None
+    try:
+        conn = psycopg2.connect(get_connection_string())
+        show_id = add_show(conn, show)
+        if args.dry_run:
+            conn.rollback(); logger.info("Dry run: rolled back.")
+        else:
+            conn.commit(); logger.info(f"Show {show_id} added.")
+            try:
+                from setlist_similarity import rebuild_and_save
+                logger.info("Rebuilding setlist similarity index...")
+                rebuild_and_save(conn)
+            except Exception as e: logger.error(f"Failed to rebuild setlist similarity index: {e}"); conn.rollback()
+    except psycopg2.errors.UniqueViolation as e: logger.error(f"Show already exists: {e}"); sys.exit(1)
+    except psycopg2.Error as e: logger.error(f"Database error: {e}"); sys.exit(1)
+    finally:
+        if conn: conn.close()
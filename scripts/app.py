@@ -5,16 +5,18 @@
 import os
 import sys
 import logging
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_file, send_from_directory, stream_with_context
 import psycopg2
 # from psycopg2 import sql # Not used
 import json
 import decimal
 from datetime import date, datetime, timedelta
-import google.generativeai as genai
 from pathlib import Path
 import re
 import textwrap # ADDED textwrap import
+import threading
+import time
+from contextlib import nullcontext
 # import asyncio # REMOVED asyncio import
 
 # --- Configuration ---
@@ -23,7 +25,7 @@ logger = logging.getLogger(__name__)
 
 # --- Load Database Config ---
 try:
-    from database_config import get_connection_string
+    from database_config import ReadOnlyConnectionPool
 except ImportError:
     logger.error("ERROR: database_config.py not found.")
     sys.exit("database_config.py not found. Please ensure it's in the same directory as app.py.")
@@ -42,60 +44,283 @@ except Exception as e:
     logger.error(f"ERROR: Failed to read schema.sql: {e}")
     SCHEMA_INFO = "" # Ensure it's defined
 
-# --- Load Distinct Album Names ---
-ALBUM_LIST_INFO = ""
+# --- Database Connection Pool (created on first use, shared by all endpoints) ---
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+def get_db_pool() -> ReadOnlyConnectionPool:
+    """Returns the shared read-only connection pool, creating it on first use (retried if the DB was down)."""
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is None:
+            _db_pool = ReadOnlyConnectionPool()
+            logger.info(f"Created DB connection pool (min={_db_pool.min_size}, max={_db_pool.max_size}, "
+                        f"statement_timeout={_db_pool.statement_timeout_ms}ms)")
+        return _db_pool
+
+from llm_streaming import FencedBlockTracker, sse_event
+
+# --- Query Result Cache (invalidated by the data_generation counter) ---
+from result_cache import QueryResultCache, is_volatile
 try:
-    logger.info("Attempting to load distinct album names from database...")
-    conn_str = get_connection_string()
-    db_conn = psycopg2.connect(conn_str)
-    cursor = db_conn.cursor()
-    cursor.execute("SELECT DISTINCT album FROM songs WHERE album IS NOT NULL ORDER BY album;")
-    albums = [row[0] for row in cursor.fetchall()]
-    if albums:
-        ALBUM_LIST_INFO = ", ".join(albums)
-        logger.info(f"Successfully loaded {len(albums)} distinct album names.")
-    else:
-        logger.warning("No distinct album names found in the database.")
-    cursor.close()
-    db_conn.close()
-except Exception as e:
-    logger.error(f"ERROR: Failed to load distinct album names from database: {e}")
-    # Ensure ALBUM_LIST_INFO remains empty or default
-    ALBUM_LIST_INFO = "(Error loading album list)"
+    from config import (RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL_SECONDS,
+                        DATA_GENERATION_CHECK_INTERVAL)
+except ImportError:
+    RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL_SECONDS = 512, 64 * 1024 * 1024, 3600
+    DATA_GENERATION_CHECK_INTERVAL = 5
+result_cache = QueryResultCache(RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL_SECONDS)
+_data_generation = None
+_data_generation_checked_at = 0.0
+_data_generation_lock = threading.Lock()
+
+def get_data_generation():
+    """Returns the data generation, re-reading it from the database at most every DATA_GENERATION_CHECK_INTERVAL seconds."""
+    global _data_generation, _data_generation_checked_at
+    with _data_generation_lock:
+        now = time.monotonic()
+        if now - _data_generation_checked_at >= DATA_GENERATION_CHECK_INTERVAL:
+            try:
+                with get_db_pool().connection() as db_conn:
+                    cursor = db_conn.cursor()
+                    cursor.execute("SELECT generation FROM data_generation;")
+                    row = cursor.fetchone()
+                    cursor.close()
+                _data_generation = row[0] if row else None
+            except psycopg2.Error as e:
+                logger.warning(f"Could not read data generation: {e}")
+                _data_generation = None
+            _data_generation_checked_at = now
+            result_cache.set_generation(_data_generation)
+        return _data_generation
+
+# --- Paginated Query Cursors (named server-side cursors held between page requests) ---
+from query_pagination import CursorRegistry, iter_query_chunks
+from query_guard import QueryGuard, QueryRejected, prepare_statement
+from result_encoding import FORMATS as RESULT_FORMATS, encode_result, iter_ndjson, negotiate_encoding, compress, compress_stream
+try:
+    from config import QUERY_PAGE_SIZE, QUERY_MAX_PAGE_SIZE, QUERY_MAX_OPEN_CURSORS, QUERY_CURSOR_IDLE_SECONDS
+except ImportError:
+    QUERY_PAGE_SIZE, QUERY_MAX_PAGE_SIZE, QUERY_MAX_OPEN_CURSORS, QUERY_CURSOR_IDLE_SECONDS = 500, 5000, 4, 120
+try:
+    from config import QUERY_MAX_PLAN_COST, QUERY_ROW_LIMIT, QUERY_STATEMENT_TIMEOUT_MS
+except ImportError:
+    QUERY_MAX_PLAN_COST, QUERY_ROW_LIMIT, QUERY_STATEMENT_TIMEOUT_MS = 1_000_000, 100_000, 10_000
+query_guard = QueryGuard(QUERY_MAX_PLAN_COST, QUERY_ROW_LIMIT, QUERY_STATEMENT_TIMEOUT_MS)
+_cursor_registry = None
+_cursor_registry_lock = threading.Lock()
+
+def get_cursor_registry() -> CursorRegistry:
+    global _cursor_registry
+    with _cursor_registry_lock:
+        if _cursor_registry is None:
+            _cursor_registry = CursorRegistry(get_db_pool(), QUERY_MAX_OPEN_CURSORS, QUERY_CURSOR_IDLE_SECONDS, query_guard)
+        return _cursor_registry
+
+def parse_page_size(value):
+    """Client page size clamped to [1, QUERY_MAX_PAGE_SIZE]; QUERY_PAGE_SIZE if absent. Raises ValueError."""
+    if value is None: return QUERY_PAGE_SIZE
+    return max(1, min(int(value), QUERY_MAX_PAGE_SIZE))
+
+# --- Entity Resolver (local song/album/tour/venue/city matching; rebuilt when the data generation changes) ---
+from entity_resolver import EntityResolver, format_resolved_entities
+try:
+    from config import ENTITY_MATCH_THRESHOLD, ENTITY_MAX_MATCHES
+except ImportError:
+    ENTITY_MATCH_THRESHOLD, ENTITY_MAX_MATCHES = 0.55, 8
+_entity_resolver = None
+_entity_resolver_generation = object() # Sentinel so the first call always builds
+_entity_resolver_lock = threading.Lock()
+
+def get_entity_resolver():
+    """Returns the in-memory entity indexes, (re)loading them when the data generation changes. None if the DB is unavailable."""
+    global _entity_resolver, _entity_resolver_generation
+    generation = get_data_generation()
+    with _entity_resolver_lock:
+        if generation != _entity_resolver_generation and not (generation is None and _entity_resolver is not None):
+            try:
+                with get_db_pool().connection() as db_conn:
+                    _entity_resolver = EntityResolver.from_database(db_conn, ENTITY_MATCH_THRESHOLD, ENTITY_MAX_MATCHES)
+            except psycopg2.Error as e:
+                logger.warning(f"Could not load entity resolver indexes: {e}")
+            _entity_resolver_generation = generation # Failed loads are retried only when the generation changes
+        return _entity_resolver
+
+def resolve_entities(nl_query):
+    """Canonical names mentioned in the question (empty if the resolver is unavailable)."""
+    resolver = get_entity_resolver() if nl_query else None
+    if resolver is None: return []
+    start = time.perf_counter()
+    with span("entity_resolve"): matches = resolver.resolve(nl_query)
+    logger.info(f"Resolved {len(matches)} entities in {(time.perf_counter() - start) * 1000:.1f} ms: "
+                + ", ".join(f"{m['mention']!r}->{m['value']!r}" for m in matches))
+    return matches
+
+def nl_cache_entities(entities):
+    """The resolved entities for NL cache matching; None when the resolver is unavailable (exact matches only)."""
+    return entities if _entity_resolver is not None else None
+
+# --- Intent Templates (common question shapes answered from parameterized SQL, without the LLM) ---
+from intent_router import route_question
+try:
+    from config import INTENT_TEMPLATES_ENABLED
+except ImportError:
+    INTENT_TEMPLATES_ENABLED = True
+
+def answer_from_template(nl_query, entities):
+    """Returns {sql, explanation, error, cached, intent} when an intent template fits the question, else None."""
+    if not INTENT_TEMPLATES_ENABLED: return None
+    start = time.perf_counter()
+    with span("intent_match"): routed = route_question(nl_query, entities)
+    cache_lookups.inc(cache="intent_template", result="hit" if routed else "miss")
+    if not routed: return None
+    logger.info(f"Intent template '{routed['intent']}' matched in {(time.perf_counter() - start) * 1000:.1f} ms: {nl_query[:100]}")
+    return {"sql": wrap_sql_comments(routed["sql"], width=56), "explanation": format_explanation_as_bullets(routed["explanation"]),
+            "error": None, "cached": None, "intent": routed["intent"]}
+
+# --- Prompt Schema Digest (compact catalog summary instead of raw schema.sql; rebuilt when the data generation changes) ---
+from prompt_builder import SchemaDigestCache
+schema_digest = SchemaDigestCache()
 
-# --- Configure LLM ---
+def get_prompt_schema():
+    """Schema text for LLM prompts: the cached digest, or the raw schema.sql if the database is unavailable."""
+    return schema_digest.get(get_db_pool, get_data_generation()) or SCHEMA_INFO
+
+# --- Setlist Similarity Index (loaded lazily, reloaded when the file changes) ---
+_similarity_index = None
+_similarity_index_mtime = None
+_similarity_index_lock = threading.Lock()
+
+def get_similarity_index():
+    """Returns the persisted MinHash/LSH index, loading or reloading it if the file changed."""
+    global _similarity_index, _similarity_index_mtime
+    from setlist_similarity import SetlistSimilarityIndex, get_index_path
+    index_path = get_index_path()
+    with _similarity_index_lock:
+        mtime = index_path.stat().st_mtime if index_path.exists() else None
+        if mtime is None and _similarity_index is None:
+            # No persisted index yet: build one from the database and save it
+            logger.info("Similarity index file not found. Building from database...")
+            from setlist_similarity import rebuild_and_save
+            with get_db_pool().connection() as db_conn:
+                _similarity_index = rebuild_and_save(db_conn, index_path)
+            _similarity_index_mtime = index_path.stat().st_mtime
+        elif mtime is not None and mtime != _similarity_index_mtime:
+            _similarity_index = SetlistSimilarityIndex.load(index_path)
+            _similarity_index_mtime = mtime
+            logger.info(f"Loaded similarity index for {len(_similarity_index.show_ids)} shows from {index_path.name}")
+        return _similarity_index
+
+# --- Song Timeline Index (loaded lazily; reloaded when the data generation changes) ---
+_song_timeline = None
+_song_timeline_generation = object() # Sentinel so the first call always loads
+_song_timeline_lock = threading.Lock()
+
+def get_song_timeline():
+    """
+    Returns the in-memory per-song timeline, (re)loading it from the song_timeline view when the data
+    generation changes. A failed reload keeps the previous timeline; with none loaded yet, the error is raised.
+    """
+    global _song_timeline, _song_timeline_generation
+    generation = get_data_generation()
+    with _song_timeline_lock:
+        if generation != _song_timeline_generation and not (generation is None and _song_timeline is not None):
+            from song_timeline import load_song_timeline
+            try:
+                with get_db_pool().connection() as db_conn:
+                    _song_timeline = load_song_timeline(db_conn)
+            except psycopg2.Error as e:
+                if _song_timeline is None: raise
+                logger.warning(f"Could not reload song timeline (serving generation {_song_timeline_generation}): {e}")
+            else:
+                _song_timeline_generation = generation
+        return _song_timeline
+
+# --- Configure LLM (deferred: the google.generativeai import and client setup run during warmup or on first use) ---
+try:
+    from config import LLM_BACKEND, LLM_STUB_RESPONSES_FILE, LLM_STUB_LATENCY_SECONDS, LLM_STUB_JITTER_SECONDS, LLM_RECORD_FILE
+except ImportError:
+    LLM_BACKEND, LLM_STUB_RESPONSES_FILE, LLM_STUB_LATENCY_SECONDS, LLM_STUB_JITTER_SECONDS, LLM_RECORD_FILE = 'gemini', None, 2.0, 0.5, None
 llm_model = None
 gemini_api_key = None
-try:
-    # Reads key from file in the same directory as app.py
-    api_key_file_path = Path(__file__).resolve().parent / "Gemmini 2.5 exp API.txt"
-    logger.info(f"Attempting to load Gemini API key from: {api_key_file_path}")
-    if not api_key_file_path.is_file():
-        raise FileNotFoundError(f"API key file not found at the specified path.")
-    with open(api_key_file_path, "r", encoding="utf-8") as f:
-        gemini_api_key = f.read().strip()
-    if not gemini_api_key:
-        raise ValueError("API key file is empty.")
-    logger.info(f"Successfully loaded API key from {api_key_file_path.name}")
-    genai.configure(api_key=gemini_api_key)
-    # Use model name from config.py if imported, otherwise default
-    try:
-        from config import LLM_MODEL_NAME
-    except ImportError:
-        LLM_MODEL_NAME = 'gemini-1.5-flash-latest' # Fallback
-        logger.warning("Could not import LLM_MODEL_NAME from config, using default.")
+_llm_init_attempted = False
+_llm_lock = threading.Lock()
 
-    llm_model = genai.GenerativeModel(LLM_MODEL_NAME)
-    logger.info(f"Configured Gemini model: {LLM_MODEL_NAME}")
+def get_llm_model():
+    """
+    Returns the LLM backend: the Gemini model (importing google.generativeai and reading the API key on the
+    first call) or, with LLM_BACKEND = 'stub', the local stub from llm_backends.py. None if unavailable.
+    """
+    global llm_model, gemini_api_key, _llm_init_attempted
+    with _llm_lock:
+        if llm_model is not None or _llm_init_attempted: return llm_model
+        _llm_init_attempted = True
+        if LLM_BACKEND == 'stub':
+            from llm_backends import StubLLM
+            try: llm_model = StubLLM.from_file(LLM_STUB_RESPONSES_FILE, latency_seconds=LLM_STUB_LATENCY_SECONDS, jitter_seconds=LLM_STUB_JITTER_SECONDS)
+            except (OSError, ValueError, KeyError) as e: logger.error(f"Stub LLM Configuration Error: {e}")
+            else: logger.info(f"Using the stub LLM backend ({LLM_STUB_LATENCY_SECONDS}s +/- {LLM_STUB_JITTER_SECONDS}s per call).")
+            return llm_model
+        if LLM_BACKEND != 'gemini': logger.warning(f"Unknown LLM_BACKEND {LLM_BACKEND!r}; using Gemini.")
+        try:
+            # Reads key from file in the same directory as app.py
+            api_key_file_path = Path(__file__).resolve().parent / "Gemmini 2.5 exp API.txt"
+            logger.info(f"Attempting to load Gemini API key from: {api_key_file_path}")
+            if not api_key_file_path.is_file():
+                raise FileNotFoundError(f"API key file not found at the specified path.")
+            with open(api_key_file_path, "r", encoding="utf-8") as f:
+                gemini_api_key = f.read().strip()
+            if not gemini_api_key:
+                raise ValueError("API key file is empty.")
+            logger.info(f"Successfully loaded API key from {api_key_file_path.name}")
+            import google.generativeai as genai # Heavy import (~1s); kept off the startup path
+            genai.configure(api_key=gemini_api_key)
+            # Use model name from config.py if imported, otherwise default
+            try:
+                from config import LLM_MODEL_NAME
+            except ImportError:
+                LLM_MODEL_NAME = 'gemini-1.5-flash-latest' # Fallback
+                logger.warning("Could not import LLM_MODEL_NAME from config, using default.")
+
+            llm_model = genai.GenerativeModel(LLM_MODEL_NAME)
+            logger.info(f"Configured Gemini model: {LLM_MODEL_NAME}")
+            if LLM_RECORD_FILE:
+                from llm_backends import RecordingLLM
+                llm_model = RecordingLLM(llm_model, LLM_RECORD_FILE)
+                logger.info(f"Recording LLM answers to {LLM_RECORD_FILE}")
 
-except FileNotFoundError as e: logger.critical(f"API Key Error: {e}. LLM features will be disabled.")
-except ValueError as e: logger.critical(f"API Key Error: {e}. LLM features will be disabled.")
-except Exception as e: logger.error(f"LLM Configuration Error: {e}")
+        except FileNotFoundError as e: logger.critical(f"API Key Error: {e}. LLM features will be disabled.")
+        except ValueError as e: logger.critical(f"API Key Error: {e}. LLM features will be disabled.")
+        except Exception as e: logger.error(f"LLM Configuration Error: {e}")
+        return llm_model
 
 # Initialize Flask app
 # Assumes frontend files are in ../frontend relative to this script's location (scripts/)
 app = Flask(__name__, template_folder='../frontend', static_folder='../frontend')
 
+# --- Request Tracing (timing spans per request; aggregated for /metrics) ---
+from request_metrics import metrics, span, start_trace, finish_trace, llm_tokens, cache_lookups, query_rows, errors, sql_validations
+try:
+    from config import SLOW_REQUEST_LOG_SECONDS
+except ImportError:
+    SLOW_REQUEST_LOG_SECONDS = 2.0
+
+@app.before_request
+def _start_request_trace():
+    start_trace(request.url_rule.rule if request.url_rule else "unmatched", request.method) # Route pattern keeps label counts bounded
+
+@app.after_request
+def _finish_request_trace(response):
+    trace = finish_trace(response.status_code, SLOW_REQUEST_LOG_SECONDS)
+    if trace: response.headers['Server-Timing'] = trace.server_timing()
+    return response
+
+def record_llm_usage(response):
+    """Adds the response's prompt/response token counts (usage_metadata) to app_llm_tokens_total."""
+    usage = getattr(response, 'usage_metadata', None)
+    if not usage: return
+    llm_tokens.inc(getattr(usage, 'prompt_token_count', 0) or 0, kind="prompt")
+    llm_tokens.inc(getattr(usage, 'candidates_token_count', 0) or 0, kind="response")
+
 # --- Helper Function for JSON Serialization ---
 def json_serial(obj):
     """JSON serializer for objects not serializable by default json code"""
@@ -161,21 +386,25 @@ def wrap_sql_comments(sql_string, width=56):
     return '\n'.join(wrapped_lines)
 
 # --- Helper Function for LLM Calls (Synchronous) ---
-def generate_llm_response(prompt):
-    """Sends prompt to configured LLM and returns text response or error."""
-    if not llm_model:
+def generate_llm_response(prompt, timeout=None):
+    """Sends prompt to configured LLM and returns text response or error (timeout in seconds, if given)."""
+    model = get_llm_model()
+    if not model:
         return None, "LLM not configured or key missing/invalid."
     try:
         logger.info(f"Sending prompt to LLM (first 100 chars): {prompt[:100]}...")
         # Use the SYNCHRONOUS generate_content method
-        response = llm_model.generate_content(prompt)
+        with span("llm_generate"):
+            response = model.generate_content(prompt, request_options={"timeout": timeout}) if timeout else model.generate_content(prompt)
         logger.info("Received response from LLM.")
+        record_llm_usage(response)
 
         # Check for blocked response or empty parts
         # Accessing feedback might differ slightly in sync response, adjust if needed based on library docs
         if not response.parts and hasattr(response, 'prompt_feedback') and response.prompt_feedback.block_reason:
              block_reason = response.prompt_feedback.block_reason or "Unknown"
              logger.warning(f"LLM call blocked: {block_reason}.")
+             errors.inc(type="llm_blocked")
              return None, f"Request blocked by API: {block_reason}."
         # Check response.text directly
         if hasattr(response, 'text') and response.text:
@@ -190,24 +419,271 @@ def generate_llm_response(prompt):
              except (AttributeError, IndexError):
                   feedback_info = getattr(response, 'prompt_feedback', 'N/A')
                   logger.error(f"LLM empty/unparseable response. Feedback: {feedback_info}")
+                  errors.inc(type="llm_empty_response")
                   return None, "LLM returned empty or unparseable response."
     except Exception as e:
         logger.error(f"LLM API Error: {e}", exc_info=True)
+        errors.inc(type="llm_api")
         return None, f"LLM Error: {str(e)}"
 
+def clean_generated_sql(extracted_sql_raw):
+    """Wraps long SQL comments and rejects anything that isn't a SELECT/WITH query (returns "")."""
+    extracted_sql_raw = extracted_sql_raw.strip() # Store raw SQL
+    logger.info(f"--- SQL Before Wrapping ---\n{extracted_sql_raw}") # Log raw SQL
+    extracted_sql = wrap_sql_comments(extracted_sql_raw, width=56)
+    logger.info(f"--- SQL After Wrapping ---\n{extracted_sql}") # Log wrapped SQL
+    if not extracted_sql.upper().startswith(("SELECT", "WITH")):
+         logger.error(f"LLM generated non-SELECT SQL: {extracted_sql}")
+         extracted_sql = "" # Invalidate if not SELECT/WITH
+    return extracted_sql
+
+def extract_sql_and_explanation(llm_response_text):
+    """Pulls the ```sql and ```explanation blocks out of an LLM response. SQL is "" if missing or not a SELECT."""
+    # Extract SQL
+    sql_match = re.search(r"```sql\s*([\s\S]*?)\s*```", llm_response_text, re.IGNORECASE | re.DOTALL)
+    extracted_sql = ""
+    if sql_match:
+         extracted_sql = clean_generated_sql(sql_match.group(1))
+    else:
+         logger.warning(f"Could not extract SQL using ```sql marker from LLM response: {llm_response_text}")
+
+    # Extract Explanation
+    explanation_match = re.search(r"```explanation\s*([\s\S]*?)\s*```", llm_response_text, re.IGNORECASE | re.DOTALL)
+    extracted_explanation = ""
+    if explanation_match:
+        raw_explanation = explanation_match.group(1).strip()
+        # --- ADDED: Format explanation --- 
+        extracted_explanation = format_explanation_as_bullets(raw_explanation)
+    else:
+        logger.warning(f"Could not extract explanation using ```explanation marker from LLM response: {llm_response_text}")
+        # Fallback logic
+        fallback_explanation = ""
+        if sql_match and sql_match.end() < len(llm_response_text):
+             remaining_text = llm_response_text[sql_match.end():].strip()
+             if remaining_text: fallback_explanation = remaining_text
+             else: fallback_explanation = "(AI did not provide a separate explanation.)"
+        else:
+             fallback_explanation = llm_response_text.strip() if not sql_match else "(AI did not provide a formatted explanation.)"
+        # Format fallback too
+        extracted_explanation = format_explanation_as_bullets(fallback_explanation)
+
+    return extracted_sql, extracted_explanation
+
+def generate_llm_response_stream(prompt):
+    """Streams the LLM response, yielding text chunks as they arrive. Raises RuntimeError on failure."""
+    model = get_llm_model()
+    if not model:
+        raise RuntimeError("LLM not configured or key missing/invalid.")
+    logger.info(f"Streaming prompt to LLM (first 100 chars): {prompt[:100]}...")
+    try:
+        with span("llm_first_chunk"): response = model.generate_content(prompt, stream=True)
+        for chunk in response:
+            try: text = chunk.text
+            except ValueError: # Chunk without text parts (e.g. safety block)
+                feedback = getattr(response, 'prompt_feedback', None)
+                block_reason = getattr(feedback, 'block_reason', None)
+                if block_reason: raise RuntimeError(f"Request blocked by API: {block_reason}.")
+                continue
+            if text: yield text
+        logger.info("LLM stream finished.")
+        record_llm_usage(response)
+    except RuntimeError:
+        errors.inc(type="llm_blocked")
+        raise
+    except Exception as e:
+        logger.error(f"LLM API Error (stream): {e}", exc_info=True)
+        errors.inc(type="llm_api")
+        raise RuntimeError(f"LLM Error: {str(e)}")
+
+def build_nl_prompt(nl_query, schema_text=None, entities=None):
+    """Prompt asking for both SQL and Explanation, with specific formatting and typo tolerance."""
+    schema_text = schema_text if schema_text is not None else get_prompt_schema()
+    entities = entities if entities is not None else resolve_entities(nl_query)
+    return f"""You are an assistant helping users query a PostgreSQL database about Bruce Springsteen setlists.
+Based ONLY on the provided database schema and the user's question, perform the following two tasks:
+1. Generate a single, valid PostgreSQL SELECT query to retrieve the necessary data. PREFER the denormalized `performances` table (one row per song performance with show date, tour, venue, city, state, country, song title, album, is_outtake and position) over joining setlists, shows and songs yourself. Format the SQL query with standard indentation and line breaks for readability. Enclose the formatted SQL query within ```sql ... ```. Only generate SELECT statements. Prioritize using the get_stats_for_show_ids function if the user asks for subset statistics based on specific shows (pass an array of show_ids).
+2. Provide a brief, user-friendly explanation (2-3 sentences) of what the generated query does, suitable for someone unfamiliar with SQL. Enclose the explanation within ```explanation ... ```.
+
+VERY IMPORTANT: Your primary goal is to understand the user's INTENT. Names in the question (songs, albums, tours, venues, cities, states, countries) have already been matched against the database; when RESOLVED ENTITIES lists a mention, use that exact stored value. If a mention resolved to several kinds (e.g. the song, album and tour 'Born To Run'), pick the one the question means. For any other name, be robust to typos and variations rather than failing on minor discrepancies (see NAME AND TEXT MATCHING).
+
+NAME AND TEXT MATCHING: songs.title, tours.name, venues.name and cities.name have trigram indexes (use the show_details view or performances rather than joining shows to tours, venues and cities yourself). When you are not certain of the exact stored spelling, resolve the canonical value with the lookup_entities function (e.g. `WHERE s.title = (SELECT value FROM lookup_entities('thunder rd', 'song', 1))`) or match with the trigram operator (`s.title % 'thunder rd'`) instead of `ILIKE '%...%'`. To search words inside show notes or performance notes, use `shows.show_notes_tsv @@ websearch_to_tsquery('english', '...')` or `setlists.notes_tsv @@ websearch_to_tsquery('english', '...')` instead of ILIKE.
+
+DATABASE SCHEMA:
+--- START SCHEMA ---
+{schema_text}
+--- END SCHEMA ---
+
+RESOLVED ENTITIES (mention in the question -> exact stored value):
+{format_resolved_entities(entities)}
+
+USER QUESTION:
+"{nl_query}"
+
+OUTPUT:"""
+
+# --- NL->SQL Answer Cache (persistent; scoped to the prompt context and model) ---
+_nl_cache = None
+_nl_cache_digest = None # Schema digest the open cache's context hash was computed from
+_nl_cache_lock = threading.Lock()
+
+def get_nl_cache():
+    """
+    Returns the persistent question -> SQL cache, (re)opening it on first use or when the prompt context changed.
+    None while prompts fall back to the raw schema.sql (no digest built yet): those answers are not cached.
+    """
+    global _nl_cache, _nl_cache_digest
+    from nl_query_cache import NLQueryCache, context_hash
+    digest = schema_digest.get(get_db_pool, get_data_generation())
+    if digest is None: return None
+    with _nl_cache_lock:
+        if _nl_cache is not None and digest == _nl_cache_digest: return _nl_cache
+        # Hashing the prompt without a question or entities covers the schema digest and the instructions
+        prompt_context = context_hash(build_nl_prompt("", schema_text=digest, entities=[]))
+        if _nl_cache is None or _nl_cache.context != prompt_context:
+            try:
+                from config import OUTPUT_PATH, LLM_MODEL_NAME, NL_CACHE_FILENAME, NL_CACHE_SIMILARITY_THRESHOLD
+            except ImportError:
+                OUTPUT_PATH = Path(__file__).resolve().parent.parent / "3 - Schema Creation"
+                LLM_MODEL_NAME, NL_CACHE_FILENAME, NL_CACHE_SIMILARITY_THRESHOLD = 'gemini-1.5-flash-latest', "nl_sql_cache.sqlite3", 0.8
+            cache_path = OUTPUT_PATH / NL_CACHE_FILENAME
+            if LLM_BACKEND == 'stub': # Separate file, so stub answers never serve real users
+                cache_path, LLM_MODEL_NAME = cache_path.with_suffix('.stub' + cache_path.suffix), 'stub'
+            _nl_cache = NLQueryCache(cache_path, prompt_context, LLM_MODEL_NAME, NL_CACHE_SIMILARITY_THRESHOLD)
+        _nl_cache_digest = digest
+        return _nl_cache
+
+# --- Generated SQL Validation and Repair (EXPLAIN before answering; one re-prompt with the Postgres error) ---
+try:
+    from config import SQL_REPAIR_ENABLED, SQL_REPAIR_BUDGET_SECONDS, SQL_REPAIR_MIN_SECONDS
+except ImportError:
+    SQL_REPAIR_ENABLED, SQL_REPAIR_BUDGET_SECONDS, SQL_REPAIR_MIN_SECONDS = True, 30, 4
+
+def plan_error(sql_query):
+    """
+    Plans sql_query through the QueryGuard (EXPLAIN only, nothing runs) on a pooled connection. Returns None
+    if it would run, else the Postgres error or guard rejection. Raises if the database is unreachable.
+    """
+    with get_db_pool().connection() as db_conn:
+        try:
+            with db_conn.cursor() as cursor: query_guard.check(cursor, sql_query)
+            return None
+        except QueryRejected as rejected:
+            return str(rejected)
+        except psycopg2.Error as db_err:
+            if db_conn.closed: raise
+            return str(db_err).strip()
+        finally:
+            if not db_conn.closed: db_conn.rollback()
+
+def build_repair_prompt(prompt, failed_sql, error):
+    """The original prompt followed by the failed SQL and the error it got, asking for a corrected answer."""
+    return f"""{prompt}
+```sql
+{failed_sql}
+```
+
+The SQL above was rejected by PostgreSQL with this error:
+{error}
+
+Write a corrected query that answers the same USER QUESTION, using only tables, columns and functions from the DATABASE SCHEMA and the exact values from RESOLVED ENTITIES. Reply in the same format as before (```sql ... ``` followed by ```explanation ... ```).
+
+OUTPUT:"""
+
+def check_sql(sql_query):
+    """{"status": "ok"}, {"status": "failed", "error": ...} or {"status": "skipped"} when the database is unreachable."""
+    try:
+        with span("sql_validate"): error = plan_error(sql_query)
+    except Exception as e:
+        logger.warning(f"Could not validate generated SQL: {e}")
+        return {"status": "skipped"}
+    return {"status": "ok"} if error is None else {"status": "failed", "error": error}
+
+def validate_and_repair(prompt, sql_query, explanation, started, check=None, llm_gate=None):
+    """
+    EXPLAINs generated SQL (unless `check` already holds check_sql's result) and, if Postgres rejects it,
+    re-prompts the model once with the error while the SQL_REPAIR_BUDGET_SECONDS budget, counted from
+    `started` (a time.monotonic() value), lasts. The repair call goes through llm_gate (see batch_queries.py)
+    if one is given. Returns (sql or None, explanation, validation) with validation["status"] one of
+    ok, repaired, failed, skipped.
+    """
+    if not SQL_REPAIR_ENABLED: return sql_query, explanation, {"status": "skipped"}
+    check = check or check_sql(sql_query)
+    if check["status"] != "failed":
+        # Without a database the SQL can't be checked; it is returned as before rather than failing the question
+        sql_validations.inc(result=check["status"])
+        return sql_query, explanation, {"status": check["status"]}
+
+    error = check["error"]
+    validation = {"status": "failed", "error": error.split('\n')[0], "failed_sql": sql_query}
+    with llm_gate or nullcontext():
+        remaining = SQL_REPAIR_BUDGET_SECONDS - (time.monotonic() - started)
+        if remaining < SQL_REPAIR_MIN_SECONDS:
+            logger.warning(f"Generated SQL failed to plan ({validation['error']}); no repair budget left ({remaining:.1f}s).")
+            sql_validations.inc(result="failed")
+            return None, explanation, validation
+        logger.info(f"Generated SQL failed to plan ({validation['error']}); asking the model to repair it.")
+        repair_start = time.monotonic()
+        with span("llm_repair"): repair_text, repair_error = generate_llm_response(build_repair_prompt(prompt, sql_query, error), timeout=remaining)
+        validation["repair_seconds"] = round(time.monotonic() - repair_start, 3)
+    repaired_sql, repaired_explanation = extract_sql_and_explanation(repair_text) if repair_text else (None, None)
+    if repaired_sql:
+        repaired_check = check_sql(repaired_sql)
+        if repaired_check["status"] == "ok":
+            logger.info(f"Repaired generated SQL in {validation['repair_seconds']:.2f}s.")
+            sql_validations.inc(result="repaired")
+            validation["status"] = "repaired"
+            return repaired_sql, repaired_explanation or explanation, validation
+        validation["repair_error"] = repaired_check.get("error", "Could not validate the repaired SQL.").split('\n')[0]
+    else:
+        validation["repair_error"] = repair_error or "No SQL in the repair response."
+    logger.warning(f"SQL repair failed: {validation['repair_error']}")
+    sql_validations.inc(result="failed")
+    return None, explanation, validation
+
 # --- Routes ---
+# --- Static Assets (fingerprinted, precompressed build from static_assets.py; source files when not built) ---
+from static_assets import StaticAssets, source_index
+try:
+    from config import STATIC_BUILD_DIR, STATIC_MAX_AGE_SECONDS
+except ImportError:
+    STATIC_BUILD_DIR, STATIC_MAX_AGE_SECONDS = Path(__file__).resolve().parent.parent / "frontend" / "dist", 365 * 24 * 3600
+static_assets = StaticAssets(STATIC_BUILD_DIR)
+
+def send_built_asset(name):
+    """
+    The built file, as the precompressed variant the client accepts, with its ETag; hashed names are cached
+    as immutable, index.html is revalidated (304 when If-None-Match matches). None if name isn't built.
+    """
+    variant = static_assets.variant(name, request.headers.get('Accept-Encoding'))
+    if variant is None: return None
+    if request.if_none_match.contains(variant.etag):
+        response = Response(status=304)
+    else:
+        response = send_file(variant.path, mimetype=variant.content_type, etag=False, conditional=False, last_modified=None)
+        response.headers.pop('Content-Disposition', None) # send_file names the .gz/.br file here
+        if variant.encoding: response.headers['Content-Encoding'] = variant.encoding
+    response.headers['ETag'] = f'"{variant.etag}"'
+    response.headers['Cache-Control'] = f"public, max-age={STATIC_MAX_AGE_SECONDS}, immutable" if variant.immutable else "no-cache"
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
 @app.route('/')
 def index():
-    # Serves the main index.html file from the frontend folder
+    # Serves the built index.html (which references the fingerprinted assets), else the source page
+    built = send_built_asset('index.html')
+    if built is not None: return built
     try:
-        return send_from_directory('../frontend', 'index.html')
+        index_path = source_index(Path(app.static_folder))
+        return send_from_directory(index_path.parent, index_path.name)
     except Exception as e:
         logger.error(f"Error serving index.html: {e}")
         return "Error loading page.", 500
 
 @app.route('/<path:filename>')
 def serve_static(filename):
-    # Serves static files like script.js from the frontend folder
+    # Serves built (fingerprinted) files, else static files like script.js from the frontend folder
+    built = send_built_asset(filename)
+    if built is not None: return built
     return send_from_directory(app.static_folder, filename)
 
 # --- Combined LLM Endpoint ---
@@ -218,136 +694,550 @@ def handle_process_nl_query():
     nl_query = data.get('query', '')
     if not nl_query: return jsonify({"error": "No query."}), 400
     if not SCHEMA_INFO: return jsonify({"error": "Schema missing."}), 500
-    if not llm_model: return jsonify({"error": "LLM not configured."}), 500
 
-    # Prompt asking for both SQL and Explanation, with specific formatting and typo tolerance
-    # Adjusted f-string formatting (removed surrounding newlines)
-    prompt = f"""You are an assistant helping users query a PostgreSQL database about Bruce Springsteen setlists.
-Based ONLY on the provided database schema and the user's question, perform the following two tasks:
-1. Generate a single, valid PostgreSQL SELECT query to retrieve the necessary data. Format the SQL query with standard indentation and line breaks for readability. Enclose the formatted SQL query within ```sql ... ```. Only generate SELECT statements. Prioritize using the get_stats_for_show_ids function if the user asks for subset statistics based on specific shows (pass an array of show_ids).
-2. Provide a brief, user-friendly explanation (2-3 sentences) of what the generated query does, suitable for someone unfamiliar with SQL. Enclose the explanation within ```explanation ... ```.
+    answer, status_code = answer_nl_query(nl_query, bypass_cache=bool(data.get('bypass_cache')))
+    return jsonify(answer), status_code
 
-VERY IMPORTANT: Your primary goal is to understand the user's INTENT. Be **extremely robust and generous** in matching user input (like song titles, album names, tours, locations) to the values suggested by the database schema and your general knowledge of the artist. **Aggressively correct** potential spelling errors, typos, variations in punctuation, or slightly different phrasings. If a user mentions 'Born To Run' or 'Born To Run album', you MUST interpret it as the album 'Born to Run'. If they mention 'Asbury Park', assume they mean 'Greetings From Asbury Park, N.J.' unless context strongly implies otherwise. **Prioritize finding a plausible match over failing due to minor discrepancies.**
-
-DATABASE SCHEMA:
---- START SCHEMA ---
-{SCHEMA_INFO}
---- END SCHEMA ---
-
-KNOWN ALBUM NAMES IN DATABASE:
-{ALBUM_LIST_INFO}
-
-USER QUESTION:
-"{nl_query}"
+def answer_nl_query(nl_query, bypass_cache=False, llm_gate=None):
+    """
+    Returns ({sql, explanation, error, cached}, status_code) from an intent template, the NL cache or the LLM.
+    LLM calls go through llm_gate (batch concurrency/rate limit) when one is given.
+    """
+    started = time.monotonic()
+    # Common question shapes are answered locally; bypass_cache asks the LLM for a fresh answer instead
+    entities = resolve_entities(nl_query)
+    templated = None if bypass_cache else answer_from_template(nl_query, entities)
+    if templated: return templated, 200
+    # Answer identical or near-identical questions from the cache unless the client asks for a fresh one
+    nl_cache = None
+    try: nl_cache = get_nl_cache()
+    except Exception as e: logger.error(f"NL query cache unavailable: {e}")
+    if nl_cache and not bypass_cache:
+        with span("nl_cache_lookup"): cached = nl_cache.get(nl_query, nl_cache_entities(entities))
+        cache_lookups.inc(cache="nl_to_sql", result="hit" if cached else "miss")
+        if cached:
+            logger.info(f"NL cache {cached['match']} hit for: {nl_query[:100]}")
+            return {"sql": cached["sql"], "explanation": cached["explanation"], "error": None,
+                    "cached": cached["match"], "matched_question": cached["matched_question"]}, 200
+    if not get_llm_model(): return {"error": "LLM not configured."}, 500
 
-OUTPUT:"""
-    llm_response_text, error = generate_llm_response(prompt) # Use sync helper
+    with span("prompt_build"): prompt = build_nl_prompt(nl_query, entities=entities)
+    gate_start = time.monotonic()
+    with llm_gate or nullcontext():
+        started += time.monotonic() - gate_start # Waiting for a batch slot doesn't use up the repair budget
+        llm_response_text, error = generate_llm_response(prompt) # Use sync helper
 
     if error:
-        return jsonify({"error": error}), 500
+        return {"error": error}, 500
     else:
-        # Extract SQL
-        sql_match = re.search(r"```sql\s*([\s\S]*?)\s*```", llm_response_text, re.IGNORECASE | re.DOTALL)
-        extracted_sql = ""
-        if sql_match:
-             extracted_sql_raw = sql_match.group(1).strip() # Store raw SQL
-             logger.info(f"--- SQL Before Wrapping ---\n{extracted_sql_raw}") # Log raw SQL
-             # --- ADDED: Wrap SQL comments ---
-             extracted_sql = wrap_sql_comments(extracted_sql_raw, width=56)
-             logger.info(f"--- SQL After Wrapping ---\n{extracted_sql}") # Log wrapped SQL
-             # --- END WRAP ---
-             if not extracted_sql.upper().startswith(("SELECT", "WITH")):
-                  logger.error(f"LLM generated non-SELECT SQL: {extracted_sql}")
-                  extracted_sql = "" # Invalidate if not SELECT/WITH
-        else:
-             logger.warning(f"Could not extract SQL using ```sql marker from LLM response: {llm_response_text}")
-
-        # Extract Explanation
-        explanation_match = re.search(r"```explanation\s*([\s\S]*?)\s*```", llm_response_text, re.IGNORECASE | re.DOTALL)
-        extracted_explanation = ""
-        if explanation_match:
-            raw_explanation = explanation_match.group(1).strip()
-            # --- ADDED: Format explanation --- 
-            extracted_explanation = format_explanation_as_bullets(raw_explanation)
-        else:
-            logger.warning(f"Could not extract explanation using ```explanation marker from LLM response: {llm_response_text}")
-            # Fallback logic
-            fallback_explanation = ""
-            if sql_match and sql_match.end() < len(llm_response_text):
-                 remaining_text = llm_response_text[sql_match.end():].strip()
-                 if remaining_text: fallback_explanation = remaining_text
-                 else: fallback_explanation = "(AI did not provide a separate explanation.)"
-            else:
-                 fallback_explanation = llm_response_text.strip() if not sql_match else "(AI did not provide a formatted explanation.)"
-            # Format fallback too
-            extracted_explanation = format_explanation_as_bullets(fallback_explanation)
+        with span("sql_extract"): extracted_sql, extracted_explanation = extract_sql_and_explanation(llm_response_text)
 
         # Return error if SQL is missing after extraction attempts
         if not extracted_sql:
+             errors.inc(type="sql_extract")
              # Include explanation even if SQL fails, might be useful
-             return jsonify({"error": "Failed to generate valid SQL query.", "sql": None, "explanation": extracted_explanation or None}), 500
+             return {"error": "Failed to generate valid SQL query.", "sql": None, "explanation": extracted_explanation or None}, 500
+
+        # Only SQL that plans is returned (and cached); a failing query gets one repair attempt first
+        extracted_sql, extracted_explanation, validation = validate_and_repair(prompt, extracted_sql, extracted_explanation, started,
+                                                                             llm_gate=llm_gate)
+        if not extracted_sql:
+             errors.inc(type="sql_invalid")
+             return {"error": f"Generated SQL does not run: {validation['error']}", "sql": None,
+                     "explanation": extracted_explanation or None, "validation": validation}, 500
 
-        return jsonify({
+        if nl_cache: nl_cache.put(nl_query, extracted_sql, extracted_explanation, nl_cache_entities(entities))
+        return {
             "sql": extracted_sql,
             "explanation": extracted_explanation,
-            "error": None
-        })
+            "error": None,
+            "cached": None,
+            "validation": validation
+        }, 200
+
+# --- Streaming LLM Endpoint (Server-Sent Events) ---
+@app.route('/process_nl_query_stream', methods=['POST'])
+def handle_process_nl_query_stream():
+    """
+    Same as /process_nl_query but streams the answer as SSE events:
+    sql_delta / explanation_delta (raw text as it arrives), sql (final SQL as soon as its
+    block closes and it plans, so the client can enable Run), repairing (it didn't plan; the model
+    is asked to fix it), done (final SQL + formatted explanation), error.
+    """
+    started = time.monotonic()
+    data = request.get_json() or {}
+    nl_query = data.get('query', '')
+    if not nl_query: return jsonify({"error": "No query."}), 400
+    if not SCHEMA_INFO: return jsonify({"error": "Schema missing."}), 500
+
+    entities = resolve_entities(nl_query)
+    templated = None if data.get('bypass_cache') else answer_from_template(nl_query, entities)
+    nl_cache = None
+    try: nl_cache = get_nl_cache()
+    except Exception as e: logger.error(f"NL query cache unavailable: {e}")
+    cached = None
+    if nl_cache and not templated and not data.get('bypass_cache'):
+        with span("nl_cache_lookup"): cached = nl_cache.get(nl_query, nl_cache_entities(entities))
+        cache_lookups.inc(cache="nl_to_sql", result="hit" if cached else "miss")
+    if not cached and not templated and not get_llm_model(): return jsonify({"error": "LLM not configured."}), 500
+    prompt = None
+    if not cached and not templated:
+        with span("prompt_build"): prompt = build_nl_prompt(nl_query, entities=entities)
+
+    def event_stream():
+        if templated:
+            yield sse_event("sql", {"sql": templated["sql"]})
+            yield sse_event("done", templated)
+            return
+        if cached:
+            logger.info(f"NL cache {cached['match']} hit for: {nl_query[:100]}")
+            yield sse_event("sql", {"sql": cached["sql"]})
+            yield sse_event("done", {"sql": cached["sql"], "explanation": cached["explanation"], "error": None,
+                                     "cached": cached["match"], "matched_question": cached["matched_question"]})
+            return
+        tracker = FencedBlockTracker()
+        final_sql, final_check = None, None
+        try:
+            for chunk in generate_llm_response_stream(prompt):
+                for block, new_text, just_closed in tracker.feed(chunk):
+                    if new_text: yield sse_event(f"{block}_delta", {"text": new_text})
+                    if block == 'sql' and just_closed:
+                        final_sql = clean_generated_sql(tracker.block_text('sql'))
+                        if not final_sql: continue
+                        # Plan it while the explanation streams; Run is only enabled for SQL that plans
+                        final_check = check_sql(final_sql) if SQL_REPAIR_ENABLED else {"status": "skipped"}
+                        if final_check["status"] != "failed": yield sse_event("sql", {"sql": final_sql})
+        except RuntimeError as e:
+            yield sse_event("error", {"error": str(e)})
+            return
+        with span("sql_extract"): extracted_sql, extracted_explanation = extract_sql_and_explanation(tracker.text)
+        if not extracted_sql:
+            errors.inc(type="sql_extract")
+            yield sse_event("error", {"error": "Failed to generate valid SQL query.", "explanation": extracted_explanation or None})
+            return
+        # Same rule as /process_nl_query: only SQL that plans is sent (and cached), after at most one repair
+        first_sql = extracted_sql
+        sent = final_sql == extracted_sql and final_check is not None and final_check["status"] != "failed"
+        check = final_check if final_sql == extracted_sql else None
+        if check and check["status"] == "failed": yield sse_event("repairing", {"error": check["error"].split('\n')[0]})
+        extracted_sql, extracted_explanation, validation = validate_and_repair(prompt, extracted_sql, extracted_explanation, started, check)
+        if not extracted_sql:
+            errors.inc(type="sql_invalid")
+            yield sse_event("error", {"error": f"Generated SQL does not run: {validation['error']}",
+                                      "explanation": extracted_explanation or None, "validation": validation})
+            return
+        if not sent or extracted_sql != first_sql: yield sse_event("sql", {"sql": extracted_sql})
+        if nl_cache: nl_cache.put(nl_query, extracted_sql, extracted_explanation, nl_cache_entities(entities))
+        yield sse_event("done", {"sql": extracted_sql, "explanation": extracted_explanation, "error": None, "cached": None,
+                                 "validation": validation})
+
+    return Response(stream_with_context(event_stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# --- Setlist Similarity Endpoint ---
+@app.route('/similar_shows', methods=['POST'])
+def handle_similar_shows():
+    """Returns the top-k shows whose setlists are most Jaccard-similar to the given show."""
+    data = request.get_json() or {}
+    try:
+        k = max(1, min(int(data.get('k', 10)), 100))
+        start_date = date.fromisoformat(data['start_date']) if data.get('start_date') else None
+        end_date = date.fromisoformat(data['end_date']) if data.get('end_date') else None
+        show_date = date.fromisoformat(data['date']) if data.get('date') else None
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+    try:
+        index = get_similarity_index()
+    except Exception as e:
+        logger.error(f"Similarity index unavailable: {e}", exc_info=True)
+        return jsonify({"error": "Similarity index unavailable."}), 500
+
+    show_id = data.get('show_id')
+    if show_id is None:
+        if not show_date: return jsonify({"error": "Provide show_id or date."}), 400
+        show_ids = index.find_show_ids(show_date, venue=data.get('venue'), city=data.get('city'))
+        if not show_ids: return jsonify({"error": f"No show found on {show_date.isoformat()}."}), 404
+        if len(show_ids) > 1: return jsonify({"error": "Multiple shows match; add venue or city.", "show_ids": show_ids}), 400
+        show_id = show_ids[0]
+    try:
+        results = index.query(int(show_id), k=k, tour=data.get('tour'), start_date=start_date, end_date=end_date)
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 404
+    response_json = json.dumps({"show_id": int(show_id), "results": results, "error": None}, default=json_serial)
+    return response_json, 200, {'ContentType':'application/json'}
+
+# --- Song Timeline Endpoint ---
+@app.route('/song_timeline', methods=['POST'])
+def handle_song_timeline():
+    """Answers as-of-date questions for one song (plays between dates, last play before a date, plays through a tour)."""
+    data = request.get_json() or {}
+    try:
+        start_date = date.fromisoformat(data['start_date']) if data.get('start_date') else None
+        end_date = date.fromisoformat(data['end_date']) if data.get('end_date') else None
+        before = date.fromisoformat(data['before']) if data.get('before') else None
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": f"Invalid date: {e}"}), 400
+    song_id = data.get('song_id')
+    if song_id is not None:
+        try: song_id = int(song_id)
+        except (ValueError, TypeError): return jsonify({"error": f"Invalid song_id: {song_id}"}), 400
+    try:
+        timeline = get_song_timeline()
+    except Exception as e:
+        logger.error(f"Song timeline unavailable: {e}", exc_info=True)
+        return jsonify({"error": "Song timeline unavailable."}), 500
+
+    if song_id is None:
+        song_id = timeline.resolve_song_id(data.get('song', ''))
+        if song_id is None: return jsonify({"error": f"Unknown song: {data.get('song', '')}"}), 404
+    result = {
+        "song_id": song_id,
+        "total_plays": timeline.total_plays(song_id),
+        "first_play": timeline.first_play(song_id),
+        "last_play": timeline.last_play(song_id),
+        "error": None,
+    }
+    if start_date or end_date:
+        result["plays_between"] = timeline.plays_between(song_id, start_date, end_date)
+    if before:
+        result["last_play_before"] = timeline.last_play_before(song_id, before)
+        result["plays_before"] = timeline.plays_before(song_id, before)
+    if data.get('tour'):
+        result["plays_through_tour"] = timeline.plays_through_tour(song_id, data['tour'])
+    response_json = json.dumps(result, default=json_serial)
+    return response_json, 200, {'ContentType':'application/json'}
+
+# --- Fuzzy Name Lookup Endpoint ---
+@app.route('/lookup', methods=['POST'])
+def handle_lookup():
+    """Returns canonical song/album/tour/venue/city names ranked by trigram similarity to the search text."""
+    data = request.get_json() or {}
+    search_text = (data.get('query') or '').strip()
+    kind = data.get('kind') or None
+    if not search_text: return jsonify({"error": "No query."}), 400
+    if kind and kind not in ('song', 'album', 'tour', 'venue', 'city'):
+        return jsonify({"error": f"Unknown kind: {kind}"}), 400
+    try: limit = max(1, min(int(data.get('limit', 10)), 50))
+    except (ValueError, TypeError): return jsonify({"error": "Invalid limit."}), 400
+
+    try:
+        with get_db_pool().connection() as db_conn:
+            cursor = db_conn.cursor()
+            cursor.execute("SELECT kind, value, score FROM lookup_entities(%s, %s, %s);", (search_text, kind, limit))
+            matches = [{"kind": row[0], "value": row[1], "score": round(float(row[2]), 3)} for row in cursor.fetchall()]
+            cursor.close()
+        return jsonify({"query": search_text, "matches": matches, "error": None})
+    except psycopg2.Error as db_err:
+        logger.error(f"Lookup DB Error: {db_err}")
+        error_detail = str(db_err).split('\n')[0] # Concise error
+        return jsonify({"error": f"DB Error: {error_detail}"}), 500
 
 # --- Database Query Execution Endpoint ---
 @app.route('/query', methods=['POST'])
 def handle_db_query():
-    """Handles SQL query execution requests from the frontend."""
-    db_conn = None
-    cursor = None
-    sql_query = ""
+    """
+    Handles SQL query execution requests from the frontend. Returns the first page of rows;
+    when has_more is true, POST {"continuation": token} for the next page ({"cancel": true} to discard).
+    "format" selects rows (default), columnar (one array per column) or ndjson (whole result streamed).
+    """
+    data = request.get_json() or {}
+    try: page_size = parse_page_size(data.get('page_size'))
+    except (ValueError, TypeError): return jsonify({"error": "Invalid page_size."}), 400
+    fmt = data.get('format') or ('ndjson' if 'application/x-ndjson' in request.headers.get('Accept', '') else 'rows')
+    if fmt not in RESULT_FORMATS: return jsonify({"error": f"Unknown format: {fmt}"}), 400
+    token = data.get('continuation')
+    if token:
+        if data.get('cancel'): return jsonify({"cancelled": get_cursor_registry().cancel(token), "error": None})
+        response_json, status_code = fetch_next_page(token, page_size, fmt)
+        return json_response(response_json, status_code)
+    sql_query = data.get('sql', '').strip()
+    if not sql_query: return jsonify({"error": "No query."}), 400
+    if fmt == 'ndjson': return stream_ndjson_query(sql_query, page_size)
+    response_json, status_code, cache_status = run_select_query(sql_query, page_size, fmt)
+    return json_response(response_json, status_code, {'X-Cache': cache_status})
+
+def json_response(body, status_code, headers=None):
+    """JSON response compressed with gzip/br when the client accepts it and the body is large enough."""
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    with span("compress"): payload, applied = compress(body.encode('utf-8'), encoding)
+    response = Response(payload, status=status_code, mimetype='application/json', headers=headers or {})
+    response.headers['Vary'] = 'Accept-Encoding'
+    if applied: response.headers['Content-Encoding'] = applied
+    return response
+
+def stream_ndjson_query(sql_query, chunk_rows):
+    """Streams the whole result as NDJSON through a named cursor, chunk_rows rows at a time (not paginated or cached)."""
+    try: prepare_statement(sql_query)
+    except QueryRejected as rejected:
+        logger.warning(f"Blocking query ({rejected}): {sql_query[:100]}...")
+        errors.inc(type="query_rejected")
+        return jsonify({"error": str(rejected)}), 400
+    logger.info(f"Streaming (ndjson): {sql_query[:200]}...")
+    chunks = iter_query_chunks(get_db_pool(), sql_query, chunk_rows, query_guard)
     try:
-        data = request.get_json()
-        sql_query = data.get('sql', '').strip()
-        if not sql_query: return jsonify({"error": "No query."}), 400
-        # Basic safety check - allow SELECT and WITH (for CTEs)
-        if not sql_query.upper().startswith(("SELECT", "WITH")):
-            logger.warning(f"Blocking non-SELECT/WITH query: {sql_query[:100]}...")
-            return jsonify({"error": "Only SELECT queries allowed."}), 400
+        columns, type_codes, first_rows, guard_info = next(chunks) # Run the query now so errors get a proper status code
+    except QueryRejected as rejected:
+        errors.inc(type="query_rejected")
+        return jsonify({"error": str(rejected), "columns": [], "data": []}), 400
+    except psycopg2.Error as db_err:
+        logger.error(f"DB Error: {db_err}\nQuery: {sql_query}")
+        errors.inc(type=f"db_{type(db_err).__name__}")
+        error_detail = str(db_err).split('\n')[0] # Concise error
+        return jsonify({"error": f"DB Error: {error_detail}", "columns": [], "data": []}), 400
+
+    def row_chunks():
+        query_rows.inc(len(first_rows), format="ndjson")
+        yield first_rows, type_codes
+        for _, _, rows, _ in chunks:
+            query_rows.inc(len(rows), format="ndjson")
+            yield rows, type_codes
+
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    body = compress_stream(iter_ndjson({"columns": columns, "format": "ndjson", "guard": guard_info}, row_chunks()), encoding)
+    response = Response(stream_with_context(body), mimetype='application/x-ndjson')
+    response.headers['Vary'] = 'Accept-Encoding'
+    if encoding: response.headers['Content-Encoding'] = encoding
+    return response
+
+def run_select_query(sql_query, page_size=None, fmt='rows'):
+    """
+    Validates a SELECT/WITH query and returns its first page (from a named cursor, or the result cache).
+    Queries pass through the QueryGuard first: read-only transaction, statement_timeout, LIMIT, cost ceiling.
+    Returns (response_json, status_code, cache_status) where response_json holds columns/data/error/message
+    plus has_more, continuation, rows_fetched and row_estimate.
+    """
+    page_size = page_size or QUERY_PAGE_SIZE
+    try:
+        # Basic safety check - a single SELECT or WITH (for CTEs) statement
+        prepare_statement(sql_query)
+
+        # Serve repeated queries from the result cache (only when the data generation is known); results
+        # that depend on the clock or random() would go stale, so those queries always run
+        data_generation = get_data_generation()
+        cache_variant = f"page_size={page_size};format={fmt}"
+        volatile = is_volatile(sql_query)
+        if data_generation is not None and not volatile:
+            cached_json = result_cache.get(sql_query, cache_variant)
+            cache_lookups.inc(cache="query_results", result="hit" if cached_json is not None else "miss")
+            if cached_json is not None:
+                logger.info(f"Result cache hit: {sql_query[:100]}...")
+                return cached_json, 200, 'HIT'
 
         logger.info(f"Executing: {sql_query[:200]}...")
-        conn_str = get_connection_string(); db_conn = psycopg2.connect(conn_str); cursor = db_conn.cursor()
-        cursor.execute(sql_query); logger.info("Query executed.")
-        results = {"columns": [], "data": [], "error": None, "message": "Query executed successfully."}
-
-        if cursor.description:
-            results["columns"] = [desc[0] for desc in cursor.description]
-            rows = cursor.fetchall()
-            results["data"] = rows
-            results["message"] = f"Success. Fetched {len(rows)} rows."
-            logger.info(f"Fetched {len(rows)} rows.")
-        else: # For non-SELECT commands (though blocked above) or commands without results
-            rowcount = cursor.rowcount
-            results["message"] = f"Command successful."
-            if rowcount >= 0:
-                 results["message"] += f" {rowcount} rows affected."
-                 logger.info(f"Cmd rowcount: {rowcount}")
-
-        # Use json.dumps with custom serializer to handle dates/decimals
-        response_json = json.dumps(results, default=json_serial)
-        return response_json, 200, {'ContentType':'application/json'}
+        results, type_codes = get_cursor_registry().open(sql_query, page_size)
+        logger.info(f"Fetched first page: {len(results['data'])} rows (more: {results['has_more']}).")
+        query_rows.inc(len(results['data']), format=fmt)
+
+        # Dates/decimals are converted column by column (see result_encoding.py)
+        with span("serialize"): response_json = encode_result(results, type_codes, fmt)
+        # Only complete results are cacheable; a continuation token points at a live cursor
+        if volatile: return response_json, 200, 'BYPASS'
+        if not results["has_more"]: result_cache.put(sql_query, response_json, data_generation, cache_variant)
+        return response_json, 200, 'MISS'
 
+    except QueryRejected as rejected:
+        logger.warning(f"Blocking query ({rejected}): {sql_query[:100]}...")
+        errors.inc(type="query_rejected")
+        return json.dumps({"error": str(rejected), "columns": [], "data": []}), 400, 'BYPASS'
     except psycopg2.Error as db_err:
         logger.error(f"DB Error: {db_err}\nQuery: {sql_query}")
-        if db_conn: db_conn.rollback(); logger.info("DB rollback.")
+        errors.inc(type=f"db_{type(db_err).__name__}") # e.g. db_QueryCanceled (statement_timeout), db_UndefinedColumn
         error_detail = str(db_err).split('\n')[0] # Concise error
-        return jsonify({"error": f"DB Error: {error_detail}", "columns": [], "data": []}), 400 # Return 400 for bad query
+        return json.dumps({"error": f"DB Error: {error_detail}", "columns": [], "data": []}), 400, 'MISS' # Return 400 for bad query
     except Exception as e:
         logger.error(f"Unexpected query error: {e}\nQuery: {sql_query}", exc_info=True)
-        if db_conn: db_conn.rollback(); logger.info("DB rollback.")
-        return jsonify({"error": f"Unexpected server error: {str(e)}", "columns": [], "data": []}), 500 # Return 500 for server error
-    finally:
-        # Ensure resources are closed
-        if cursor:
-            cursor.close()
-            logger.debug("Cursor closed.")
-        if db_conn:
-            db_conn.close()
-            logger.debug("DB connection closed.")
+        errors.inc(type="unexpected")
+        return json.dumps({"error": f"Unexpected server error: {str(e)}", "columns": [], "data": []}), 500, 'MISS' # Return 500 for server error
+
+def fetch_next_page(token, page_size, fmt='rows'):
+    """Returns (response_json, status_code) for the next page of an open cursor."""
+    try:
+        results, type_codes = get_cursor_registry().fetch(token, page_size)
+        query_rows.inc(len(results['data']), format=fmt)
+        with span("serialize"): response_json = encode_result(results, type_codes, fmt)
+        return response_json, 200
+    except KeyError:
+        errors.inc(type="cursor_expired")
+        return json.dumps({"error": "Result cursor expired or unknown; run the query again.", "columns": [], "data": []}), 410
+    except psycopg2.Error as db_err:
+        logger.error(f"DB Error while paging: {db_err}")
+        errors.inc(type=f"db_{type(db_err).__name__}")
+        error_detail = str(db_err).split('\n')[0] # Concise error
+        return json.dumps({"error": f"DB Error: {error_detail}", "columns": [], "data": []}), 400
+
+# --- Ask-and-Run Endpoint (NL -> SQL -> results in one round trip) ---
+@app.route('/ask_and_run', methods=['POST'])
+def handle_ask_and_run():
+    """Generates SQL for the question and executes it immediately; returns SQL, explanation and results together."""
+    data = request.get_json() or {}
+    nl_query = data.get('query', '')
+    if not nl_query: return jsonify({"error": "No query."}), 400
+    if not SCHEMA_INFO: return jsonify({"error": "Schema missing."}), 500
+    try: page_size = parse_page_size(data.get('page_size'))
+    except (ValueError, TypeError): return jsonify({"error": "Invalid page_size."}), 400
+    answer, status_code = answer_nl_query(nl_query, bypass_cache=bool(data.get('bypass_cache')))
+    if status_code != 200: return jsonify(answer), status_code
+
+    fmt = data.get('format') or 'rows'
+    if fmt not in ('rows', 'columnar'): return jsonify({"error": f"Unsupported format for /ask_and_run: {fmt}"}), 400
+    results_json, query_status, cache_status = run_select_query(answer["sql"], page_size, fmt)
+    answer["error"] = None if query_status == 200 else "Generated SQL failed to execute."
+    # Splice the (possibly cached) serialized results in directly instead of re-parsing them
+    response_json = json.dumps(answer, default=json_serial)[:-1] + ', "results": ' + results_json + '}'
+    return json_response(response_json, 200 if query_status == 200 else query_status, {'X-Cache': cache_status})
+
+# --- Batch Endpoint (many questions at once; bounded concurrent LLM calls, SQL run in parallel on the pool) ---
+from batch_queries import LLMGate, run_batch
+try:
+    from config import BATCH_MAX_QUESTIONS, BATCH_MAX_WORKERS, BATCH_LLM_CONCURRENCY, BATCH_LLM_RATE_PER_MINUTE, BATCH_MAX_ROWS
+except ImportError:
+    BATCH_MAX_QUESTIONS, BATCH_MAX_WORKERS, BATCH_LLM_CONCURRENCY, BATCH_LLM_RATE_PER_MINUTE, BATCH_MAX_ROWS = 100, 4, 3, 60, 1000
+
+def answer_and_run(nl_query, llm_gate, run=True, max_rows=BATCH_MAX_ROWS, fmt='rows', bypass_cache=False):
+    """One batch item: {sql, explanation, source, error, results, timings}. Results are capped at max_rows."""
+    start = time.perf_counter()
+    answer, status_code = answer_nl_query(nl_query, bypass_cache=bypass_cache, llm_gate=llm_gate)
+    timings = {"answer": round(time.perf_counter() - start, 3)}
+    source = "template" if answer.get("intent") else "cache" if answer.get("cached") else "llm"
+    item = {"sql": answer.get("sql"), "explanation": answer.get("explanation"), "source": source,
+            "error": answer.get("error"), "results": None, "timings": timings}
+    for key in ("intent", "cached", "validation"):
+        if answer.get(key): item[key] = answer[key]
+    if status_code != 200 or not run: return item
+
+    start = time.perf_counter()
+    results_json, query_status, cache_status = run_select_query(answer["sql"], max_rows, fmt)
+    results = json.loads(results_json)
+    if results.get("continuation"): get_cursor_registry().cancel(results["continuation"]) # Don't hold a pooled connection
+    results["truncated"], results["continuation"] = bool(results.get("has_more")), None
+    timings["query"] = round(time.perf_counter() - start, 3)
+    item.update(results=results, result_cache=cache_status)
+    if query_status != 200: item["error"] = f"SQL failed: {results.get('error')}"
+    return item
+
+@app.route('/batch', methods=['POST'])
+def handle_batch():
+    """
+    Answers a list of questions in one request: {"questions": [...], "run": true, "max_rows": 1000,
+    "format": "rows"|"columnar", "bypass_cache": false}. Returns per-item SQL, results and timings plus a summary.
+    """
+    data = request.get_json() or {}
+    questions = data.get('questions')
+    if not isinstance(questions, list) or not questions or not all(isinstance(q, str) and q.strip() for q in questions):
+        return jsonify({"error": "questions must be a non-empty list of strings."}), 400
+    if len(questions) > BATCH_MAX_QUESTIONS: return jsonify({"error": f"At most {BATCH_MAX_QUESTIONS} questions per batch."}), 400
+    if not SCHEMA_INFO: return jsonify({"error": "Schema missing."}), 500
+    try: max_rows = max(1, min(int(data.get('max_rows', BATCH_MAX_ROWS)), BATCH_MAX_ROWS))
+    except (ValueError, TypeError): return jsonify({"error": "Invalid max_rows."}), 400
+    fmt = data.get('format') or 'rows'
+    if fmt not in ('rows', 'columnar'): return jsonify({"error": f"Unsupported format for /batch: {fmt}"}), 400
+
+    items, summary = run_questions([q.strip() for q in questions], run=data.get('run', True) is not False, max_rows=max_rows,
+                                   fmt=fmt, bypass_cache=bool(data.get('bypass_cache')))
+    return json_response(json.dumps({"items": items, "summary": summary, "error": None}, default=json_serial), 200)
+
+def run_questions(questions, run=True, max_rows=BATCH_MAX_ROWS, fmt='rows', bypass_cache=False,
+                  max_workers=BATCH_MAX_WORKERS, llm_concurrency=BATCH_LLM_CONCURRENCY, rate_per_minute=BATCH_LLM_RATE_PER_MINUTE):
+    """Runs the batch with its own LLM gate; returns (items, summary). Shared by /batch and batch_report.py."""
+    gate = LLMGate(llm_concurrency, rate_per_minute)
+    logger.info(f"Batch of {len(questions)} questions ({max_workers} workers, {llm_concurrency} concurrent LLM calls, "
+                f"{rate_per_minute or 'unlimited'}/min).")
+    items, summary = run_batch(questions, lambda q: answer_and_run(q, gate, run, max_rows, fmt, bypass_cache), max_workers)
+    summary.update(gate.stats(), llm_concurrency=llm_concurrency, llm_rate_per_minute=rate_per_minute)
+    # Item time minus time spent queueing for the LLM gate: roughly what a one-at-a-time run would take
+    summary["sequential_estimate_seconds"] = round(summary["item_seconds_total"] - summary["wait_seconds_total"], 3)
+    logger.info(f"Batch finished in {summary['seconds']:.2f}s ({summary['succeeded']}/{summary['questions']} succeeded).")
+    return items, summary
+
+# --- Result Cache Metrics Endpoint ---
+@app.route('/cache_stats', methods=['GET'])
+def handle_cache_stats():
+    """Returns /query result cache, open cursor and NL->SQL cache metrics."""
+    return jsonify({"query_results": result_cache.stats(),
+                    "cursors": _cursor_registry.stats() if _cursor_registry else None,
+                    "nl_to_sql": _nl_cache.stats() if _nl_cache else None})
+
+# --- Connection Pool Metrics Endpoint ---
+@app.route('/pool_stats', methods=['GET'])
+def handle_pool_stats():
+    """Returns connection pool usage and wait metrics."""
+    if _db_pool is None: return jsonify({"error": "Connection pool not created yet."}), 503
+    return jsonify(_db_pool.stats())
+
+# --- Prometheus Metrics Endpoint ---
+metrics.gauge("app_db_pool_connections_in_use", "Pooled connections checked out right now.",
+              lambda: _db_pool.stats()["in_use"] if _db_pool else None)
+metrics.gauge("app_db_pool_connections_idle", "Pooled connections waiting to be checked out.",
+              lambda: _db_pool.stats()["idle"] if _db_pool else None)
+metrics.gauge("app_db_pool_wait_seconds_total", "Total time requests waited for a pooled connection.",
+              lambda: _db_pool.stats()["wait_seconds_total"] if _db_pool else None, metric_type="counter")
+metrics.gauge("app_open_cursors", "Paginated /query cursors held open for continuation tokens.",
+              lambda: _cursor_registry.stats()["open"] if _cursor_registry else None)
+metrics.gauge("app_result_cache_bytes", "Size of the cached /query results.", lambda: result_cache.stats()["bytes"])
+
+@app.route('/metrics', methods=['GET'])
+def handle_metrics():
+    """Request/phase latency histograms, LLM token, cache, row and error counters in Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# --- Background Warmup (the server starts answering immediately; dependencies load in these threads) ---
+try:
+    from config import WARMUP_RETRY_SECONDS
+except ImportError:
+    WARMUP_RETRY_SECONDS = 5
+_started_at = time.monotonic()
+_warmup_status = {name: {"state": "pending"} for name in ("db_pool", "schema_digest", "entity_resolver", "llm_model")}
+_warmup_lock = threading.Lock()
+_warmup_started = False
+
+def _warm(component, load):
+    """Runs one warmup step and records its state and duration; returns True if it produced a value."""
+    with _warmup_lock: _warmup_status[component] = {"state": "loading"}
+    start = time.perf_counter()
+    try:
+        ok, error = load() is not None, None
+    except Exception as e:
+        ok, error = False, str(e).split('\n')[0]
+    status = {"state": "ok" if ok else "error", "seconds": round(time.perf_counter() - start, 3)}
+    if not ok: status["error"] = error or "unavailable"
+    with _warmup_lock: _warmup_status[component] = status
+    return ok
+
+def _warmup_database():
+    """Primes the pool, schema digest and entity indexes; retries until the database is reachable."""
+    while True:
+        if (_warm("db_pool", get_db_pool)
+                and _warm("schema_digest", lambda: schema_digest.get(get_db_pool, get_data_generation()))
+                and _warm("entity_resolver", get_entity_resolver)):
+            logger.info(f"Database warmup finished {time.monotonic() - _started_at:.2f}s after startup.")
+            return
+        logger.warning(f"Database warmup incomplete; retrying in {WARMUP_RETRY_SECONDS}s.")
+        time.sleep(WARMUP_RETRY_SECONDS)
+
+def start_warmup():
+    """Starts the warmup threads once (database and LLM client load in parallel)."""
+    global _warmup_started
+    with _warmup_lock:
+        if _warmup_started: return
+        _warmup_started = True
+    threading.Thread(target=_warmup_database, name="warmup-db", daemon=True).start()
+    threading.Thread(target=_warm, args=("llm_model", get_llm_model), name="warmup-llm", daemon=True).start()
+
+# --- Health Endpoints ---
+@app.route('/healthz', methods=['GET'])
+def handle_healthz():
+    """Liveness: the process is up and serving requests (no dependencies are touched)."""
+    return jsonify({"status": "ok", "uptime_seconds": round(time.monotonic() - _started_at, 1)})
+
+@app.route('/readyz', methods=['GET'])
+def handle_readyz():
+    """Readiness: 200 once the pool, schema digest, entity indexes and LLM client are loaded, 503 before that."""
+    with _warmup_lock: components = {name: dict(status) for name, status in _warmup_status.items()}
+    ready = all(status["state"] == "ok" for status in components.values())
+    return jsonify({"ready": ready, "components": components,
+                    "uptime_seconds": round(time.monotonic() - _started_at, 1)}), 200 if ready else 503
+
+start_warmup()
 
 # --- Run the App ---
 if __name__ == '__main__':
@@ -355,13 +1245,7 @@ if __name__ == '__main__':
         # Import Flask settings from config.py within this block
         from config import FLASK_HOST, FLASK_PORT, FLASK_DEBUG
 
-        # Perform checks before starting server
-        if not gemini_api_key:
-             logger.critical("FATAL: Gemini API key not loaded. LLM features will fail.")
-             sys.exit("Exiting: API key not loaded.")
-        if not llm_model:
-             logger.critical("FATAL: LLM model initialization failed. LLM features will fail.")
-             sys.exit("Exiting: LLM model initialization failed.")
+        # Database and LLM problems no longer stop startup; they show up in /readyz and the log
         if not SCHEMA_INFO:
              logger.warning("Schema information missing. LLM queries may be inaccurate.")
 
@@ -371,9 +1255,6 @@ if __name__ == '__main__':
 
     except ImportError:
          logger.error("Could not import Flask settings from config.py. Using defaults.")
-         # Add checks here too before starting with defaults
-         if not gemini_api_key: sys.exit("Exiting: API key not loaded.")
-         if not llm_model: sys.exit("Exiting: LLM model init failed.")
          app.run(debug=True, host='127.0.0.1', port=5000) # Fallback defaults
     except Exception as e:
          logger.critical(f"Failed to start Flask app: {e}", exc_info=True)
@@ -0,0 +1,86 @@
+# batch_queries.py
+# Runs a list of natural-language questions concurrently (for /batch and the
+# batch_report.py CLI). Questions are processed by a small thread pool; the LLM
+# calls they make go through an LLMGate that caps how many are in flight and
+# how many start per minute, while templated/cached answers and SQL execution
+# (on pooled connections) run without waiting for it.
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+
+class RateLimiter:
+    """Spaces calls at least 60/rate_per_minute seconds apart (0 = unlimited)."""
+
+    def __init__(self, rate_per_minute: float):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute and rate_per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Blocks until the next call may start; returns the seconds waited."""
+        if not self.interval: return 0.0
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now: time.sleep(start - now)
+        return start - now
+
+
+class LLMGate:
+    """Context manager around one LLM call: at most `concurrency` at once, started no faster than the rate limit."""
+
+    def __init__(self, concurrency: int, rate_per_minute: float = 0):
+        self._slots = threading.BoundedSemaphore(max(1, concurrency))
+        self._rate = RateLimiter(rate_per_minute)
+        self._lock = threading.Lock()
+        self._stats = {"llm_calls": 0, "wait_seconds_total": 0.0}
+
+    def __enter__(self):
+        start = time.monotonic()
+        self._slots.acquire()
+        try: self._rate.acquire()
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._stats["llm_calls"] += 1
+            self._stats["wait_seconds_total"] += time.monotonic() - start
+        return self
+
+    def __exit__(self, *exc_info):
+        self._slots.release()
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock: return dict(self._stats, wait_seconds_total=round(self._stats["wait_seconds_total"], 3))
+
+
+def run_batch(questions: Sequence[str], process: Callable[[str], Dict[str, Any]], max_workers: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Calls process(question) for every question on up to max_workers threads. Returns (items in question
+    order, summary); each item is process()'s dict plus index, question and seconds. An exception in one
+    item becomes that item's error instead of failing the batch.
+    """
+    def run_one(index: int, question: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try: item = process(question)
+        except Exception as e: item = {"error": f"Unexpected error: {e}"}
+        return dict(item, index=index, question=question, seconds=round(time.perf_counter() - start, 3))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="batch") as pool:
+        items = list(pool.map(run_one, range(len(questions)), questions))
+    elapsed = time.perf_counter() - start
+    summary = {
+        "questions": len(items),
+        "succeeded": sum(1 for item in items if not item.get("error")),
+        "failed": sum(1 for item in items if item.get("error")),
+        "seconds": round(elapsed, 3),
+        "item_seconds_total": round(sum(item["seconds"] for item in items), 3),
+        "max_workers": max(1, max_workers),
+    }
+    return items, summary
@@ -0,0 +1,53 @@
+# batch_report.py
+# Runs a file of canned natural-language questions (one per line, '#' starts a
+# comment) through the same path as the /batch endpoint: LLM calls run
+# concurrently under the concurrency and rate limits, the SQL runs in parallel
+# on pooled connections, and per-question results and timings are written to a
+# JSON report.
+# Usage: python batch_report.py questions.txt [--output report.json] [--workers N]
+#        [--llm-concurrency N] [--rate-per-minute R] [--max-rows N] [--no-run] [--bypass-cache]
+
+import sys
+import json
+import logging
+import argparse
+from pathlib import Path
+
+import app # Same pool, guard, caches, templates and model as the web app
+
+logger = logging.getLogger(__name__)
+
+
+def read_questions(path: Path):
+    lines = (line.strip() for line in path.read_text(encoding='utf-8').splitlines())
+    return [line for line in lines if line and not line.startswith('#')]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer (and run) a list of questions concurrently and write a JSON report.")
+    parser.add_argument('questions', type=Path, help="Text file with one question per line.")
+    parser.add_argument('--output', type=Path, help="Report file (default: print to stdout).")
+    parser.add_argument('--workers', type=int, default=app.BATCH_MAX_WORKERS, help="Questions processed at once.")
+    parser.add_argument('--llm-concurrency', type=int, default=app.BATCH_LLM_CONCURRENCY, help="Gemini calls in flight at once.")
+    parser.add_argument('--rate-per-minute', type=float, default=app.BATCH_LLM_RATE_PER_MINUTE, help="Gemini calls started per minute (0 = unlimited).")
+    parser.add_argument('--max-rows', type=int, default=app.BATCH_MAX_ROWS, help="Rows kept per question.")
+    parser.add_argument('--no-run', action='store_true', help="Only generate SQL; don't execute it.")
+    parser.add_argument('--bypass-cache', action='store_true', help="Skip intent templates and the NL cache (always ask the LLM).")
+    args = parser.parse_args()
+
+    questions = read_questions(args.questions)
+    if not questions: sys.exit(f"No questions in {args.questions}.")
+    items, summary = app.run_questions(questions, run=not args.no_run, max_rows=args.max_rows, bypass_cache=args.bypass_cache,
+                                       max_workers=args.workers, llm_concurrency=args.llm_concurrency,
+                                       rate_per_minute=args.rate_per_minute)
+    report = json.dumps({"items": items, "summary": summary}, default=app.json_serial, indent=2)
+    if args.output:
+        args.output.write_text(report, encoding='utf-8')
+        logger.info(f"Wrote {len(items)} results to {args.output}")
+    else:
+        print(report)
+    for item in items:
+        status = "ERROR " + item["error"][:80] if item.get("error") else f"{item['source']:<8} {len((item.get('results') or {}).get('data') or [])} rows"
+        logger.info(f"[{item['index']:>3}] {item['seconds']:6.2f}s  {status}  {item['question'][:60]}")
+    logger.info(f"{summary['succeeded']}/{summary['questions']} succeeded in {summary['seconds']:.2f}s "
+                f"(about {summary['sequential_estimate_seconds']:.2f}s one at a time; {summary['llm_calls']} LLM calls).")
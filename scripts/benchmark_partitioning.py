@@ -0,0 +1,99 @@
+# benchmark_partitioning.py
+# Benchmarks date-bounded queries on the era-partitioned performances table
+# against an unpartitioned copy, and reports which partitions were scanned.
+# Usage: python benchmark_partitioning.py [--runs N]
+
+import sys
+import json
+import logging
+import argparse
+import statistics
+from typing import Any, Dict, List, Set
+
+import psycopg2
+
+try:
+    from database_config import get_connection_string
+except ImportError:
+    print("ERROR: database_config.py not found.")
+    sys.exit(1)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# {table} is replaced with performances or the unpartitioned copy
+BENCHMARK_QUERIES = [
+    ("Songs played in 1978", """
+        SELECT song_title, COUNT(*) FROM {table}
+        WHERE show_date >= '1978-01-01' AND show_date < '1979-01-01'
+        GROUP BY song_title ORDER BY COUNT(*) DESC LIMIT 20"""),
+    ("Top songs 2016-2017", """
+        SELECT song_title, COUNT(*) FROM {table}
+        WHERE show_date BETWEEN '2016-01-01' AND '2017-12-31'
+        GROUP BY song_title ORDER BY COUNT(*) DESC LIMIT 20"""),
+    ("Shows per year in the 1980s", """
+        SELECT EXTRACT(YEAR FROM show_date) AS yr, COUNT(DISTINCT show_id) FROM {table}
+        WHERE show_date >= '1980-01-01' AND show_date < '1990-01-01'
+        GROUP BY yr ORDER BY yr"""),
+    ("Career-wide song counts (no date bound)", """
+        SELECT song_title, COUNT(*) FROM {table}
+        GROUP BY song_title ORDER BY COUNT(*) DESC LIMIT 20"""),
+]
+
+FLAT_TABLE = "performances_unpartitioned_bench"
+
+
+def collect_relations(plan: Dict[str, Any], found: Set[str]):
+    """Walks an EXPLAIN (FORMAT JSON) plan tree and collects scanned relation names."""
+    if 'Relation Name' in plan: found.add(plan['Relation Name'])
+    for child in plan.get('Plans', []): collect_relations(child, found)
+
+
+def explain_analyze(cursor, sql: str) -> Dict[str, Any]:
+    cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")
+    result = cursor.fetchone()[0]
+    return result[0] if isinstance(result, list) else json.loads(result)[0]
+
+
+def run_benchmark(runs: int):
+    conn = psycopg2.connect(get_connection_string())
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET enable_partitionwise_aggregate = on; SET enable_partitionwise_join = on;") # As the app's pool does
+        cursor.execute("SELECT COUNT(*) FROM pg_inherits WHERE inhparent = 'performances'::regclass;")
+        partition_count = cursor.fetchone()[0]
+        logger.info(f"performances has {partition_count} partitions. Creating unpartitioned copy for comparison...")
+        cursor.execute(f"CREATE TEMP TABLE {FLAT_TABLE} AS SELECT * FROM performances;")
+        cursor.execute(f"CREATE INDEX ON {FLAT_TABLE}(show_date) INCLUDE (song_title, tour, venue, city);")
+        cursor.execute(f"ANALYZE {FLAT_TABLE};")
+
+        rows: List[tuple] = []
+        for label, sql_template in BENCHMARK_QUERIES:
+            timings = {}
+            scanned: Set[str] = set()
+            for table in ('performances', FLAT_TABLE):
+                sql = sql_template.format(table=table)
+                explain_analyze(cursor, sql) # Warm-up run
+                samples = []
+                for _ in range(runs):
+                    plan = explain_analyze(cursor, sql)
+                    samples.append(plan['Execution Time'])
+                    if table == 'performances': collect_relations(plan['Plan'], scanned)
+                timings[table] = statistics.median(samples)
+            rows.append((label, len(scanned), partition_count, timings['performances'], timings[FLAT_TABLE]))
+    finally:
+        cursor.close()
+        conn.rollback()
+        conn.close()
+
+    print(f"\n{'Query':<42} {'Partitions scanned':>19} {'Partitioned ms':>15} {'Unpartitioned ms':>17}")
+    print("-" * 96)
+    for label, scanned_count, total, partitioned_ms, flat_ms in rows:
+        print(f"{label:<42} {f'{scanned_count}/{total}':>19} {partitioned_ms:>15.2f} {flat_ms:>17.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark partition pruning on the performances table.")
+    parser.add_argument('--runs', type=int, default=5, help="Timed runs per query (median is reported).")
+    args = parser.parse_args()
+    run_benchmark(args.runs)
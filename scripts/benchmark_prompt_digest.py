@@ -0,0 +1,77 @@
+# benchmark_prompt_digest.py
+# Compares the NL->SQL prompt built with the raw schema.sql against the one
+# built with the compact schema digest (prompt_builder.py): characters, tokens
+# and, when the Gemini API key is configured, end-to-end generation latency.
+# Usage: python benchmark_prompt_digest.py [--latency-runs N]
+
+import time
+import logging
+import argparse
+import statistics
+from typing import Callable, List, Optional
+
+import app # Loads the schema, digest, entity indexes and LLM model exactly as the web app does
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_QUESTIONS = [
+    "How many times has Thunder Road been played?",
+    "What were the most common openers on the Wrecking Ball tour?",
+    "Which songs have not been played in the last 100 shows?",
+]
+
+
+def count_tokens(prompt: str) -> Optional[int]:
+    """Exact token count from the Gemini API, or None if the model isn't configured."""
+    model = app.get_llm_model()
+    if not model: return None
+    try: return model.count_tokens(prompt).total_tokens
+    except Exception as e:
+        logger.warning(f"count_tokens failed: {e}")
+        return None
+
+
+def time_generation(build_prompt: Callable[[str], str], runs: int) -> List[float]:
+    samples = []
+    for i in range(runs):
+        prompt = build_prompt(SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)])
+        start = time.perf_counter()
+        app.generate_llm_response(prompt)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run_benchmark(latency_runs: int):
+    digest = app.get_prompt_schema()
+    if digest is app.SCHEMA_INFO: logger.warning("Schema digest unavailable (database down?); both prompts use schema.sql.")
+    variants = [("raw schema.sql", lambda q: app.build_nl_prompt(q, app.SCHEMA_INFO)),
+                ("schema digest", lambda q: app.build_nl_prompt(q, digest))]
+
+    print(f"\n{'Prompt':<16} {'Schema chars':>13} {'Prompt chars':>13} {'Tokens':>8}")
+    sizes = []
+    for label, build_prompt in variants:
+        prompt = build_prompt(SAMPLE_QUESTIONS[0])
+        tokens = count_tokens(prompt)
+        schema_chars = len(app.SCHEMA_INFO if label.startswith("raw") else digest)
+        sizes.append((len(prompt), tokens))
+        print(f"{label:<16} {schema_chars:>13} {len(prompt):>13} {tokens if tokens is not None else 'n/a':>8}")
+    (raw_chars, raw_tokens), (digest_chars, digest_tokens) = sizes
+    print(f"\nPrompt size reduced by {100 * (1 - digest_chars / raw_chars):.1f}% (characters)"
+          + (f", {100 * (1 - digest_tokens / raw_tokens):.1f}% (tokens)." if raw_tokens and digest_tokens else "."))
+    if raw_tokens is None: print("Token counts need a reachable Gemini API (key in app.py); estimate roughly chars / 4.")
+
+    if latency_runs <= 0: return
+    if not app.get_llm_model():
+        print("\nSkipping latency: LLM model not configured.")
+        return
+    print(f"\nGeneration latency over {latency_runs} runs (median / min, seconds):")
+    for label, build_prompt in variants:
+        samples = time_generation(build_prompt, latency_runs)
+        print(f"{label:<16} {statistics.median(samples):>8.2f} {min(samples):>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure prompt size and latency with the raw schema vs. the schema digest.")
+    parser.add_argument('--latency-runs', type=int, default=0, help="Timed Gemini calls per prompt variant (0 = sizes only).")
+    args = parser.parse_args()
+    run_benchmark(args.latency_runs)
@@ -0,0 +1,79 @@
+# benchmark_sql_repair.py
+# Sends questions through the NL->SQL path of app.py (templates and the NL
+# cache bypassed, so every question reaches Gemini) and reports how often the
+# generated SQL failed to plan, how often the one-shot repair fixed it, and the
+# latency the repair saved. Without the repair, a failing query costs the user
+# a /query round trip that errors plus a fresh question (another full
+# generation); with it, the request takes one extra LLM call instead.
+# Usage: python benchmark_sql_repair.py [--questions FILE] [--limit N]
+
+import time
+import logging
+import argparse
+import statistics
+from collections import Counter
+from pathlib import Path
+
+import app # Same pool, guard, prompt and model as the web app
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_QUESTIONS = [
+    "What were the most common openers on the Wrecking Ball tour?",
+    "Which songs have not been played in the last 100 shows?",
+    "Which albums had the most songs played live in 2016?",
+    "What was the longest show by number of songs on the River tour?",
+    "How many different songs were played in Europe in 2023?",
+    "Which outtakes have been played more than 50 times?",
+    "What songs debuted on the Magic tour?",
+    "Which venues has he played more than 20 times?",
+    "What was the average setlist length per tour?",
+    "Which songs were only ever played once?",
+]
+
+
+def time_failed_run(sql_query: str) -> float:
+    """Seconds for the /query round trip the user would have made with the broken SQL (it fails at planning)."""
+    start = time.perf_counter()
+    app.plan_error(sql_query)
+    return time.perf_counter() - start
+
+
+def run_benchmark(questions, limit: int):
+    if not app.get_llm_model():
+        print("LLM model not configured (Gemini API key); nothing to measure.")
+        return
+    outcomes, saved, repair_times = Counter(), [], []
+    for question in questions[:limit]:
+        start = time.perf_counter()
+        answer, status_code = app.answer_nl_query(question, bypass_cache=True)
+        total = time.perf_counter() - start
+        validation = answer.get("validation") or {"status": "llm_error" if status_code != 200 else "unvalidated"}
+        outcomes[validation["status"]] += 1
+        logger.info(f"{validation['status']:<9} {total:6.2f}s  {question}")
+        if validation["status"] == "repaired":
+            repair_seconds = validation["repair_seconds"]
+            first_generation = total - repair_seconds
+            # Without repair: the failed run, then the question again (about one more first generation)
+            saved.append(time_failed_run(validation["failed_sql"]) + first_generation - repair_seconds)
+            repair_times.append(repair_seconds)
+
+    checked = outcomes["ok"] + outcomes["repaired"] + outcomes["failed"]
+    print(f"\nQuestions: {sum(outcomes.values())}  " + "  ".join(f"{k}={v}" for k, v in sorted(outcomes.items())))
+    if not checked: return
+    first_failures = outcomes["repaired"] + outcomes["failed"]
+    print(f"Generated SQL failing to plan: {first_failures}/{checked} ({100 * first_failures / checked:.0f}%)")
+    if first_failures:
+        print(f"Repair rate: {outcomes['repaired']}/{first_failures} ({100 * outcomes['repaired'] / first_failures:.0f}%)")
+    if saved:
+        print(f"Repair call: median {statistics.median(repair_times):.2f}s; "
+              f"latency saved per repaired question: median {statistics.median(saved):.2f}s, total {sum(saved):.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the repair rate and latency saved by validate-and-repair.")
+    parser.add_argument('--questions', type=Path, help="Text file with one question per line (default: built-in samples).")
+    parser.add_argument('--limit', type=int, default=100)
+    args = parser.parse_args()
+    questions = [line.strip() for line in args.questions.read_text(encoding='utf-8').splitlines() if line.strip()] if args.questions else SAMPLE_QUESTIONS
+    run_benchmark(questions, args.limit)
@@ -0,0 +1,91 @@
+# benchmark_startup.py
+# Measures app.py cold start: time from process launch until the first HTTP
+# request is answered (GET /), and, when the app has /readyz, until warmup has
+# finished and it reports ready.
+# Usage: python benchmark_startup.py [--runs N] [--port P] [--stalled-db]
+
+import os
+import sys
+import time
+import socket
+import logging
+import argparse
+import statistics
+import subprocess
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Optional
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+LAUNCHER = "import app; app.app.run(host='127.0.0.1', port={port}, debug=False, use_reloader=False)"
+
+
+def wait_for(url: str, deadline: float, want_ok: bool) -> Optional[float]:
+    """Polls url until it answers (any status, or 200 if want_ok); returns the monotonic time or None on timeout."""
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if not want_ok or response.status == 200: return time.monotonic()
+        except urllib.error.HTTPError as e:
+            if not want_ok and e.code != 404: return time.monotonic()
+            if e.code == 404: return None # Endpoint doesn't exist in this version
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.02)
+    return None
+
+
+def measure_once(port: int, timeout: float, env: dict):
+    start = time.monotonic()
+    process = subprocess.Popen([sys.executable, "-c", LAUNCHER.format(port=port)], cwd=SCRIPT_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = start + timeout
+        first = wait_for(f"http://127.0.0.1:{port}/", deadline, want_ok=False)
+        ready = wait_for(f"http://127.0.0.1:{port}/readyz", deadline, want_ok=True) if first else None
+        return (first - start if first else None), (ready - start if ready else None)
+    finally:
+        process.terminate()
+        try: process.wait(timeout=5)
+        except subprocess.TimeoutExpired: process.kill()
+
+
+def stalled_listener() -> socket.socket:
+    """A TCP socket that accepts connections (via the backlog) but never answers, like an overloaded Postgres."""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(64)
+    return listener
+
+
+def run_benchmark(runs: int, port: int, timeout: float, stalled_db: bool):
+    env = dict(os.environ)
+    listener = None
+    if stalled_db:
+        listener = stalled_listener()
+        env.update(PGHOST="127.0.0.1", PGPORT=str(listener.getsockname()[1]), PGCONNECT_TIMEOUT="10")
+    first_times, ready_times = [], []
+    for i in range(runs):
+        first, ready = measure_once(port, timeout, env)
+        logger.info(f"Run {i + 1}: first response {first if first is None else f'{first:.2f}s'}, "
+                    f"ready {ready if ready is None else f'{ready:.2f}s'}")
+        if first is not None: first_times.append(first)
+        if ready is not None: ready_times.append(ready)
+    print(f"\nTime to first response (median of {len(first_times)}): "
+          + (f"{statistics.median(first_times):.2f}s" if first_times else f"none within {timeout:.0f}s"))
+    print("Time to ready (/readyz 200): " + (f"{statistics.median(ready_times):.2f}s" if ready_times else "n/a"))
+    if listener: listener.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure app.py time-to-first-request and time-to-ready.")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--port', type=int, default=5057)
+    parser.add_argument('--timeout', type=float, default=60.0, help="Seconds to wait per run.")
+    parser.add_argument('--stalled-db', action='store_true', help="Point the app at a server that never answers (10s connect timeout).")
+    args = parser.parse_args()
+    run_benchmark(args.runs, args.port, args.timeout, args.stalled_db)
@@ -0,0 +1,107 @@
+# benchmark_wire_formats.py
+# Compares /query wire formats on a large result: the original per-cell
+# json.dumps(default=json_serial) row arrays vs. column-wise converted rows,
+# columnar JSON and NDJSON, each raw and gzip/br compressed.
+# Usage: python benchmark_wire_formats.py [--rows N] [--runs N]
+
+import sys
+import json
+import time
+import decimal
+import logging
+import argparse
+import statistics
+from datetime import date, datetime, timedelta
+from typing import Callable, List, Tuple
+
+import psycopg2
+
+try:
+    from database_config import get_connection_string
+except ImportError:
+    print("ERROR: database_config.py not found.")
+    sys.exit(1)
+from result_encoding import encode_result, iter_ndjson, compress, brotli
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Mixed column types: dates, integers, text, booleans and a NUMERIC column
+BENCHMARK_SQL = """
+    SELECT p.show_date, p.show_id, p.song_title, p.album, p.tour, p.venue, p.city, p.state_code,
+           p.position, p.is_outtake, ROUND(p.position::NUMERIC / 3, 3) AS position_third
+    FROM performances p
+    ORDER BY p.show_date, p.position
+    LIMIT %s
+"""
+
+
+def legacy_json_serial(obj):
+    """The per-cell serializer /query used before column-wise encoding (copied from app.py)."""
+    if isinstance(obj, (datetime, date)): return obj.isoformat()
+    if isinstance(obj, decimal.Decimal): return float(obj)
+    if isinstance(obj, timedelta): return str(obj)
+    raise TypeError(f"Type {type(obj)} not serializable")
+
+
+def time_median(func: Callable[[], bytes], runs: int) -> Tuple[float, bytes]:
+    samples, output = [], b""
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), output
+
+
+def run_benchmark(row_limit: int, runs: int):
+    conn = psycopg2.connect(get_connection_string())
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(BENCHMARK_SQL, (row_limit,))
+            rows = cursor.fetchall()
+            columns = [desc[0] for desc in cursor.description]
+            type_codes = [desc[1] for desc in cursor.description]
+    finally:
+        conn.close()
+    logger.info(f"Fetched {len(rows)} rows x {len(columns)} columns. Timing {runs} runs per format...")
+
+    def base_result():
+        return {"columns": columns, "data": rows, "error": None, "message": f"Success. Fetched {len(rows)} rows."}
+
+    formats: List[Tuple[str, Callable[[], bytes]]] = [
+        ("rows, per-cell default= (legacy)", lambda: json.dumps(base_result(), default=legacy_json_serial).encode('utf-8')),
+        ("rows, column-wise conversion", lambda: encode_result(base_result(), type_codes, 'rows').encode('utf-8')),
+        ("columnar", lambda: encode_result(base_result(), type_codes, 'columnar').encode('utf-8')),
+        ("ndjson", lambda: ''.join(iter_ndjson({"columns": columns}, [(rows, type_codes)])).encode('utf-8')),
+    ]
+    encodings = ['gzip'] + (['br'] if brotli is not None else [])
+    if brotli is None: logger.info("brotli module not installed; skipping br.")
+
+    results = []
+    for label, serialize in formats:
+        serialize_ms, body = time_median(serialize, runs)
+        compressed = {}
+        for encoding in encodings:
+            compress_ms, payload = time_median(lambda: compress(body, encoding)[0], max(1, runs // 2))
+            compressed[encoding] = (len(payload), compress_ms)
+        results.append((label, serialize_ms, len(body), compressed))
+
+    baseline_ms, baseline_bytes = results[0][1], results[0][2]
+    header = f"{'Format':<34} {'Serialize ms':>13} {'vs legacy':>10} {'Raw KB':>9}"
+    for encoding in encodings: header += f" {encoding + ' KB':>9} {encoding + ' ms':>8}"
+    print(f"\n{len(rows)} rows\n{header}\n" + "-" * len(header))
+    for label, serialize_ms, raw_bytes, compressed in results:
+        line = f"{label:<34} {serialize_ms:>13.1f} {baseline_ms / serialize_ms:>9.2f}x {raw_bytes / 1024:>9.0f}"
+        for encoding in encodings:
+            size, compress_ms = compressed[encoding]
+            line += f" {size / 1024:>9.0f} {compress_ms:>8.1f}"
+        print(line)
+    print(f"\nLegacy payload: {baseline_bytes / 1024:.0f} KB uncompressed.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark /query result wire formats.")
+    parser.add_argument('--rows', type=int, default=50000, help="Rows to fetch for the benchmark result.")
+    parser.add_argument('--runs', type=int, default=5, help="Timed runs per format (median is reported).")
+    args = parser.parse_args()
+    run_benchmark(args.rows, args.runs)
@@ -1,6 +1,7 @@
 # config.py
 # Simplified configuration for sequence-based matching.
 
+import os
 import re
 from pathlib import Path
 
@@ -20,6 +21,9 @@ SETLISTS_FILENAME = "Setlists.csv" # Raw data input from Set_List_Finder.py
 SONGS_OUTPUT_FILENAME = "songs.csv"
 SHOWS_OUTPUT_FILENAME = "shows.csv"
 SETLISTS_OUTPUT_FILENAME = "setlists.csv"
+TOURS_OUTPUT_FILENAME = "tours.csv"
+VENUES_OUTPUT_FILENAME = "venues.csv"
+CITIES_OUTPUT_FILENAME = "cities.csv"
 
 # --- Output File Names (Data Collection) ---
 # Output file for Setlist_Finder test mode
@@ -63,12 +67,76 @@ REUNION_TOUR_RAW_NAMES = {"reunion tour", "reunion"}
 # User confirmed this title is correct based on their sessions data
 REUNION_BITUSA_LOOKUP_TITLE = "Born In The USA (Acoustic)"
 
+# --- Setlist Similarity Configuration (`setlist_similarity.py`) ---
+SIMILARITY_INDEX_FILENAME = "setlist_minhash_index.pkl" # Persisted MinHash/LSH index, saved in OUTPUT_PATH
+MINHASH_NUM_PERM = 128 # Signature length (number of hash permutations)
+MINHASH_LSH_BANDS = 32 # LSH bands; rows per band = MINHASH_NUM_PERM / MINHASH_LSH_BANDS
+MINHASH_SEED = 42 # Fixed seed so signatures are stable across rebuilds
+
 # --- Web Application Configuration (`app.py`) ---
 # LLM Model to use (check Google AI docs for available model IDs)
 LLM_MODEL_NAME = 'gemini-2.5-pro-exp-03-25' # Defaulting to Flash
 # Experimental model ID (use if you have access and confirmed ID):
 # LLM_MODEL_NAME = 'models/gemini-2.5-pro-exp-03-25'
 
+# LLM backend (llm_backends.py): 'gemini' (live API) or 'stub' (deterministic local answers for load tests
+# and offline benchmarks). The LLM_BACKEND / LLM_STUB_* environment variables override these.
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'gemini')
+LLM_STUB_RESPONSES_FILE = os.environ.get('LLM_STUB_RESPONSES_FILE') or None # JSONL of recorded {"question", "response"}; None = canned answer only
+LLM_STUB_LATENCY_SECONDS = float(os.environ.get('LLM_STUB_LATENCY_SECONDS', 2.0)) # About a Gemini Flash NL->SQL answer
+LLM_STUB_JITTER_SECONDS = float(os.environ.get('LLM_STUB_JITTER_SECONDS', 0.5)) # Deterministic per prompt
+LLM_RECORD_FILE = os.environ.get('LLM_RECORD_FILE') or None # With 'gemini', append each answer here (JSONL) for the stub to replay
+
+# /query result cache (in-process LRU; dropped whenever the data generation changes)
+RESULT_CACHE_MAX_ENTRIES = 512
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024 # Total serialized result size kept in memory
+RESULT_CACHE_TTL_SECONDS = 3600
+DATA_GENERATION_CHECK_INTERVAL = 5 # Seconds between data_generation lookups (cache hits skip the DB in between)
+
+# NL->SQL answer cache (SQLite, saved in OUTPUT_PATH; invalidated when schema.sql or LLM_MODEL_NAME changes)
+NL_CACHE_FILENAME = "nl_sql_cache.sqlite3"
+NL_CACHE_SIMILARITY_THRESHOLD = 0.8 # Minimum content-word Jaccard for a near-duplicate question to reuse an answer
+
+# /query pagination (named server-side cursors; each open cursor holds one pooled connection)
+QUERY_PAGE_SIZE = 500 # Rows per page when the client doesn't ask for a size
+QUERY_MAX_PAGE_SIZE = 5000
+QUERY_MAX_OPEN_CURSORS = 4 # Keep below DB_POOL_MAX_SIZE; the oldest open cursor is closed beyond this
+QUERY_CURSOR_IDLE_SECONDS = 120 # Open cursors not read for this long are closed
+
+# /query guard (checked with EXPLAIN before a query runs; see query_guard.py)
+QUERY_MAX_PLAN_COST = 1_000_000 # Planner cost units; a full scan of performances is ~2,000, a cross join of it ~100,000,000
+QUERY_ROW_LIMIT = 100_000 # LIMIT added to queries without one; larger explicit LIMITs are capped to it
+QUERY_STATEMENT_TIMEOUT_MS = 10_000 # SET LOCAL statement_timeout for each /query transaction
+
+# Entity resolution pre-pass (local fuzzy matching of names in the question before the LLM call)
+ENTITY_MATCH_THRESHOLD = 0.55 # Minimum trigram similarity for a typo'd mention to resolve to a stored name
+ENTITY_MAX_MATCHES = 8 # Resolved values injected into the prompt at most
+
+# Intent templates (common question shapes answered from SQL templates without the LLM; see intent_router.py)
+INTENT_TEMPLATES_ENABLED = True # False sends every question to the LLM
+
+# Validate-and-repair of LLM-generated SQL (EXPLAINed before it is returned; one re-prompt with the Postgres error)
+SQL_REPAIR_ENABLED = True # False returns generated SQL without planning it first
+SQL_REPAIR_BUDGET_SECONDS = 30 # Time allowed for generation plus repair; the repair call gets whatever remains
+SQL_REPAIR_MIN_SECONDS = 4 # No repair is attempted with less than this much of the budget left
+
+# Batch questions (/batch endpoint and batch_report.py)
+BATCH_MAX_QUESTIONS = 100 # Questions accepted per /batch request
+BATCH_MAX_WORKERS = 4 # Questions processed at once; SQL runs on pooled connections, so keep this below DB_POOL_MAX_SIZE
+BATCH_LLM_CONCURRENCY = 3 # Gemini calls in flight at once per batch
+BATCH_LLM_RATE_PER_MINUTE = 60 # Gemini calls started per minute per batch at most (0 = unlimited)
+BATCH_MAX_ROWS = 1000 # Rows returned per question (the rest are dropped, marked truncated)
+
+# Request tracing (/metrics histograms; see request_metrics.py)
+SLOW_REQUEST_LOG_SECONDS = 2.0 # Requests slower than this are logged with their per-phase timings (None disables)
+
+# Static assets (`python static_assets.py` writes fingerprinted, precompressed copies here; app.py serves them when present)
+STATIC_BUILD_DIR = BASE_PATH / "frontend" / "dist"
+STATIC_MAX_AGE_SECONDS = 365 * 24 * 3600 # Cache lifetime of fingerprinted files (their names change with their content)
+
+# Startup warmup (runs in background threads; /readyz reports progress)
+WARMUP_RETRY_SECONDS = 5 # Delay between database warmup attempts while Postgres is unreachable
+
 # Flask App Settings
 FLASK_HOST = '127.0.0.1' # Use '0.0.0.0' to make accessible on local network
 FLASK_PORT = 5000
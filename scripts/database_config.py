@@ -1,7 +1,14 @@
 # database_config.py
 import os
 import sys
+import time
 import logging
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import PoolError
 
 DB_HOST = os.environ.get("PGHOST", "localhost")
 DB_PORT = os.environ.get("PGPORT", "5432")
@@ -20,3 +27,151 @@ def get_postgres_connection_string():
                 f"port='{DB_PORT}' password='{HARDCODED_PASSWORD}'")
     logging.debug(f"Generated 'postgres' DB connection string (using hardcoded credentials)")
     return conn_str
+
+
+# --- Connection Pool (read-only, used by the Flask app) ---
+DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_CHECKOUT_TIMEOUT = float(os.environ.get("DB_POOL_CHECKOUT_TIMEOUT", "10")) # Seconds to wait for a free connection
+DB_POOL_HEALTHCHECK_IDLE = float(os.environ.get("DB_POOL_HEALTHCHECK_IDLE", "30")) # Ping connections idle longer than this
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", "15000"))
+
+
+class ReadOnlyConnectionPool:
+    """
+    Thread-safe pool of read-only connections with a statement_timeout.
+    Idle connections are kept (up to max_size) instead of being closed on return;
+    callers block up to checkout_timeout when every connection is in use.
+    """
+
+    def __init__(self, min_size: int = DB_POOL_MIN_SIZE, max_size: int = DB_POOL_MAX_SIZE,
+                 checkout_timeout: float = DB_POOL_CHECKOUT_TIMEOUT,
+                 healthcheck_idle: float = DB_POOL_HEALTHCHECK_IDLE,
+                 statement_timeout_ms: int = DB_STATEMENT_TIMEOUT_MS):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size}, max={max_size}")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.healthcheck_idle = healthcheck_idle
+        self.statement_timeout_ms = statement_timeout_ms
+        self._idle = [] # (connection, returned_at) pairs, most recently returned last
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._metrics = {
+            "checkouts": 0, "waits": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0,
+            "timeouts": 0, "connections_opened": 0, "connections_closed": 0,
+            "healthcheck_failures": 0, "peak_in_use": 0,
+        }
+        for _ in range(min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self) -> psycopg2.extensions.connection:
+        # Read-only, statement_timeout and the planner settings are session settings, so they survive rollbacks
+        # between checkouts; partition-wise plans aggregate/join performances one era partition at a time
+        conn = psycopg2.connect(get_connection_string(),
+                                options=f"-c default_transaction_read_only=on -c statement_timeout={self.statement_timeout_ms} "
+                                        "-c enable_partitionwise_aggregate=on -c enable_partitionwise_join=on")
+        with self._cond: self._metrics["connections_opened"] += 1
+        return conn
+
+    def _discard(self, conn):
+        try: conn.close()
+        except Exception: pass
+        with self._cond: self._metrics["connections_closed"] += 1
+
+    def _is_healthy(self, conn, idle_for: float) -> bool:
+        if conn.closed: return False
+        if idle_for < self.healthcheck_idle: return True
+        try:
+            with conn.cursor() as cursor: cursor.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self) -> psycopg2.extensions.connection:
+        """Checks out a healthy connection, waiting up to checkout_timeout if the pool is exhausted."""
+        start = time.monotonic()
+        waited = False
+        with self._cond:
+            while True:
+                if self._closed: raise PoolError("connection pool is closed")
+                if self._idle or self._in_use + len(self._idle) < self.max_size: break
+                waited = True
+                remaining = self.checkout_timeout - (time.monotonic() - start)
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    if self._idle or self._in_use + len(self._idle) < self.max_size: break
+                    self._metrics["timeouts"] += 1
+                    raise PoolError(f"No database connection available within {self.checkout_timeout}s "
+                                    f"({self._in_use}/{self.max_size} in use)")
+            candidate = self._idle.pop() if self._idle else None
+            self._in_use += 1
+            wait_seconds = time.monotonic() - start
+            self._metrics["checkouts"] += 1
+            if waited: self._metrics["waits"] += 1
+            self._metrics["wait_seconds_total"] += wait_seconds
+            self._metrics["wait_seconds_max"] = max(self._metrics["wait_seconds_max"], wait_seconds)
+            self._metrics["peak_in_use"] = max(self._metrics["peak_in_use"], self._in_use)
+
+        # Health check / connect outside the lock so slow network calls don't block other threads
+        try:
+            if candidate is not None:
+                conn, returned_at = candidate
+                if self._is_healthy(conn, time.monotonic() - returned_at): return conn
+                logging.warning("Discarding unhealthy pooled database connection.")
+                with self._cond: self._metrics["healthcheck_failures"] += 1
+                self._discard(conn)
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def putconn(self, conn: psycopg2.extensions.connection, close: bool = False):
+        """Returns a connection; broken or still-in-transaction connections are reset or dropped."""
+        if not close and not conn.closed:
+            status = conn.info.transaction_status
+            if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN: close = True
+            elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                try: conn.rollback()
+                except psycopg2.Error: close = True
+        with self._cond:
+            self._in_use -= 1
+            if close or conn.closed or self._closed: self._discard(conn)
+            else: self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager: `with pool.connection() as conn:` checks out and always returns a connection."""
+        conn = self.getconn()
+        try:
+            yield conn
+        except psycopg2.OperationalError:
+            # Connection may be dead (server restart, network); don't hand it out again
+            self.putconn(conn, close=conn.closed != 0)
+            raise
+        except BaseException:
+            self.putconn(conn)
+            raise
+        else:
+            self.putconn(conn)
+
+    def stats(self) -> dict:
+        """Pool usage and wait metrics."""
+        with self._cond:
+            result = dict(self._metrics)
+            result.update(in_use=self._in_use, idle=len(self._idle), min_size=self.min_size, max_size=self.max_size)
+        checkouts = result["checkouts"]
+        result["wait_seconds_avg"] = result["wait_seconds_total"] / checkouts if checkouts else 0.0
+        return result
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            for conn, _ in self._idle: self._discard(conn)
+            self._idle.clear()
+            self._cond.notify_all()
@@ -0,0 +1,160 @@
+# entity_resolver.py
+# Local pre-pass that finds song, album, tour, venue and city mentions in a
+# natural-language question before it is sent to the LLM. Canonical names are
+# loaded once into in-memory indexes (exact normalized names plus a character
+# trigram inverted index for typos), and every word n-gram of the question is
+# matched against them in a few milliseconds. Only the resolved canonical
+# values go into the prompt, instead of asking the model to guess spellings.
+
+import re
+import time
+import logging
+import unicodedata
+from collections import Counter, defaultdict
+from itertools import chain
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# kind -> (query returning canonical names, columns the value can be compared with)
+ENTITY_SOURCES = {
+    'song': ("SELECT title FROM songs;", "performances.song_title / songs.title"),
+    'album': ("SELECT DISTINCT album FROM songs WHERE album IS NOT NULL;", "performances.album / songs.album"),
+    'tour': ("SELECT name FROM tours;", "performances.tour / tours.name / show_details.tour"),
+    'venue': ("SELECT name FROM venues;", "performances.venue / venues.name / show_details.venue"),
+    'city': ("SELECT DISTINCT name FROM cities;", "performances.city / cities.name / show_details.city"),
+    'state': ("SELECT DISTINCT state_name FROM cities WHERE state_name IS NOT NULL;", "performances.state_name / cities.state_name"),
+    'country': ("SELECT DISTINCT country_name FROM cities WHERE country_name IS NOT NULL;", "performances.country_name / cities.country_name"),
+}
+# Words next to a mention that say which kind is meant ("the Wrecking Ball tour")
+_KIND_HINTS = {'song': 'song', 'songs': 'song', 'album': 'album', 'record': 'album', 'lp': 'album',
+               'tour': 'tour', 'venue': 'venue', 'arena': 'venue', 'stadium': 'venue', 'city': 'city'}
+# Question words that never form a mention on their own
+_STOPWORDS = frozenset("""
+a an the of in on at to for from by with and or is are was were be been has have had do does did
+what which who how many much times time played play plays song songs show shows tour tours album albums
+venue venues city cities concert concerts most least first last ever never often year years me list
+give tell find count number bruce springsteen e street band
+""".split())
+_MAX_MENTION_WORDS = 8
+
+
+def normalize_name(text: str) -> str:
+    """Lowercase ASCII words only: accents, punctuation and '&' vs 'and' differences disappear."""
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii').lower().replace('&', ' and ')
+    return ' '.join(re.findall(r"[a-z0-9]+", text))
+
+
+def trigrams(normalized: str) -> FrozenSet[str]:
+    """Word-padded character trigrams, as pg_trgm computes them."""
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class EntityResolver:
+    """In-memory exact and trigram indexes over canonical entity names."""
+
+    def __init__(self, names: Dict[str, List[str]], threshold: float = 0.55, max_matches: int = 8):
+        self.threshold = threshold
+        self.max_matches = max_matches
+        self._entries: List[Tuple[str, str, FrozenSet[str]]] = [] # (kind, canonical value, trigrams)
+        self._names: List[str] = [] # Normalized name per entry id
+        self._exact: Dict[str, List[int]] = defaultdict(list) # normalized name -> entry ids
+        self._by_trigram: Dict[str, List[int]] = defaultdict(list)
+        for kind, values in names.items():
+            for value in values:
+                normalized = normalize_name(value)
+                if not normalized or normalized.isdigit(): continue # Year-named tours would match every year in a question
+                entry_id = len(self._entries)
+                grams = trigrams(normalized)
+                self._entries.append((kind, value, grams))
+                self._names.append(normalized)
+                self._exact[normalized].append(entry_id)
+                for gram in grams: self._by_trigram[gram].append(entry_id)
+
+    @classmethod
+    def from_database(cls, conn, threshold: float = 0.55, max_matches: int = 8) -> "EntityResolver":
+        start = time.perf_counter()
+        names = {}
+        with conn.cursor() as cursor:
+            for kind, (sql, _) in ENTITY_SOURCES.items():
+                cursor.execute(sql)
+                names[kind] = [row[0] for row in cursor.fetchall() if row[0]]
+        resolver = cls(names, threshold, max_matches)
+        logger.info(f"Entity resolver indexed {len(resolver._entries)} names in {(time.perf_counter() - start) * 1000:.0f} ms.")
+        return resolver
+
+    def _candidates(self, normalized: str) -> List[Tuple[float, int]]:
+        """(score, entry id) pairs at or above the threshold; exact normalized matches score 1.0."""
+        exact = self._exact.get(normalized)
+        if exact: return [(1.0, entry_id) for entry_id in exact]
+        grams = trigrams(normalized)
+        shared = Counter(chain.from_iterable(self._by_trigram.get(gram, ()) for gram in grams))
+        scores, contained = {}, []
+        min_shared = min(self.threshold, 0.9) * len(grams) # Neither score can pass with fewer shared trigrams
+        for entry_id, count in shared.items():
+            if count < min_shared: continue
+            scores[entry_id] = count / (len(grams) + len(self._entries[entry_id][2]) - count)
+            if count >= 0.9 * len(grams) and f" {normalized} " in f" {self._names[entry_id]} ": contained.append(entry_id)
+        contained.sort(key=lambda e: len(self._names[e]))
+        if contained and len(normalized) >= 6 and (len(contained) == 1 or len(self._names[contained[0]]) < len(self._names[contained[1]])):
+            # Short form of a longer name ("rosalita" -> 'Rosalita (Come Out Tonight)'); the shortest such name
+            # must be unique, so "jersey" (Jersey Girl / Jersey Rain) stays unresolved
+            entry_id = contained[0]
+            scores[entry_id] = max(scores[entry_id], 0.6 + 0.4 * len(normalized) / len(self._names[entry_id]))
+        return [(score, entry_id) for entry_id, score in scores.items() if score >= self.threshold]
+
+    def resolve(self, question: str) -> List[Dict[str, Any]]:
+        """Returns non-overlapping mentions: [{mention, kind, value, score}], best matches first."""
+        words = normalize_name(question).split()
+        spans = [] # (score, length, start, [entry ids])
+        for start in range(len(words)):
+            for end in range(start + 1, min(len(words), start + _MAX_MENTION_WORDS) + 1):
+                ngram = words[start:end]
+                if all(w in _STOPWORDS or w.isdigit() for w in ngram): continue
+                if ngram[-1] in _STOPWORDS: continue # Trailing filler only lowers the score of the shorter span
+                candidates = self._candidates(' '.join(ngram))
+                if ngram[0] in _STOPWORDS: candidates = [c for c in candidates if c[0] == 1.0] # 'The River', not 'the wreking ball'
+                if len(ngram) == 1: candidates = [c for c in candidates if c[0] >= max(self.threshold, 0.7)]
+                if not candidates: continue
+                best = max(score for score, _ in candidates)
+                # Keep every kind that matches (almost) equally well, e.g. song and album 'Born to Run'
+                spans.append((best, end - start, start, [e for score, e in candidates if score >= best - 0.05]))
+
+        # Pick the set of non-overlapping spans with the highest total weight (score^2 per content word), so
+        # 'jersy girl' + 'brendan byrne' beats one long fuzzy span across both
+        spans.sort(key=lambda s: s[2] + s[1])
+        best_total = [0.0] * (len(spans) + 1)
+        choice: List[Optional[int]] = [None] * (len(spans) + 1)
+        for i, (score, length, start, _) in enumerate(spans, 1):
+            weight = score * score * sum(1 for w in words[start:start + length] if w not in _STOPWORDS)
+            prev = max((j for j in range(i - 1, 0, -1) if spans[j - 1][2] + spans[j - 1][1] <= start), default=0)
+            best_total[i], choice[i] = max((best_total[i - 1], None), (best_total[prev] + weight, prev), key=lambda t: t[0])
+        chosen, i = [], len(spans)
+        while i > 0:
+            if choice[i] is None: i -= 1
+            else: chosen.append(spans[i - 1]); i = choice[i]
+
+        matches = []
+        for score, length, start, entry_ids in sorted(chosen, key=lambda s: (-s[0], s[2])):
+            hint = {_KIND_HINTS.get(w) for w in words[max(0, start - 1):start] + words[start + length:start + length + 1]}
+            hinted = [e for e in entry_ids if self._entries[e][0] in hint]
+            mention = ' '.join(words[start:start + length])
+            for entry_id in (hinted or entry_ids)[:3]:
+                kind, value, _ = self._entries[entry_id]
+                matches.append({"mention": mention, "kind": kind, "value": value, "score": round(score, 3)})
+            if len(matches) >= self.max_matches: break
+        return matches[:self.max_matches]
+
+
+def format_resolved_entities(matches: List[Dict[str, Any]]) -> str:
+    """Prompt lines for the resolved mentions."""
+    if not matches: return "(none detected; use lookup_entities() for names you are unsure of)"
+    lines = []
+    for match in matches:
+        value = match["value"].replace("'", "''")
+        lines.append(f"- \"{match['mention']}\" -> {match['kind']} '{value}' (compare with {ENTITY_SOURCES[match['kind']][1]})")
+    return "\n".join(lines)
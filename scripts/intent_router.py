@@ -0,0 +1,318 @@
+# intent_router.py
+# Local fast path for the question shapes we see most often: how many times a
+# song was played, which songs were played at a venue/city, the setlist for a
+# date, overdue songs at a place, and a tour's first/last show and show count.
+# A question is routed only when every word is accounted for (resolved entity
+# mentions from entity_resolver.py, a date or year, the intent's keywords and
+# filler); anything else falls back to the LLM. Matched questions fill a
+# parameterized SQL template, so the answer needs no Gemini call.
+
+import re
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from entity_resolver import normalize_name
+
+# Entity kind -> column holding that value in performances and show_details
+_PLACE_COLUMNS = {'venue': 'venue', 'city': 'city', 'state': 'state_name', 'country': 'country_name'}
+_FILTER_COLUMNS = dict(_PLACE_COLUMNS, tour='tour')
+# Words that never change what is being asked
+_FILLER = frozenset("""
+a an the of in on at to for from by with and during has have had do does did is are was were be been
+he bruce springsteen e street band what which how many much number count total all me list show give tell please
+ever live play played plays playing perform performed performance performances concert concerts gig gigs
+so far there it its that time times tour
+""".split())
+_MONTHS = {name: i for i, names in enumerate([
+    ('jan', 'january'), ('feb', 'february'), ('mar', 'march'), ('apr', 'april'), ('may',), ('jun', 'june'),
+    ('jul', 'july'), ('aug', 'august'), ('sep', 'sept', 'september'), ('oct', 'october'), ('nov', 'november'),
+    ('dec', 'december')], 1) for name in names}
+_MONTH = '|'.join(sorted(_MONTHS, key=len, reverse=True))
+_YEAR = r"19[6-9]\d|20\d\d"
+# Patterns run on normalize_name() output, where punctuation is already spaces ("9/19/1978" -> "9 19 1978")
+_DATE_PATTERNS = [
+    (re.compile(rf"\b(?P<y>{_YEAR}) (?P<m>\d{{1,2}}) (?P<d>\d{{1,2}})\b"), False),
+    (re.compile(rf"\b(?P<m>\d{{1,2}}) (?P<d>\d{{1,2}}) (?P<y>{_YEAR}|\d\d)\b"), False),
+    (re.compile(rf"\b(?P<m>{_MONTH}) (?P<d>\d{{1,2}})(?:st|nd|rd|th)?(?: of)? (?P<y>{_YEAR})\b"), True),
+    (re.compile(rf"\b(?P<d>\d{{1,2}})(?:st|nd|rd|th)? (?:of )?(?P<m>{_MONTH}) (?P<y>{_YEAR})\b"), True),
+]
+_YEAR_RE = re.compile(rf"\b({_YEAR})\b")
+
+
+def sql_literal(value: Any) -> str:
+    """SQL literal for a template parameter (standard_conforming_strings is on, so doubling quotes is enough)."""
+    if isinstance(value, date): return f"DATE '{value.isoformat()}'"
+    if isinstance(value, int): return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def render_sql(template: str, params: Dict[str, Any]) -> str:
+    """Fills %(name)s placeholders with quoted literals."""
+    return template % {name: sql_literal(value) for name, value in params.items()}
+
+
+def parse_show_date(text: str) -> Tuple[Optional[date], str]:
+    """(date, the normalized words it was read from) for the first full date in text, or (None, '')."""
+    for pattern, named_month in _DATE_PATTERNS:
+        for match in pattern.finditer(text):
+            year = int(match['y'])
+            if year < 100: year += 1900 if year >= 60 else 2000
+            month = _MONTHS[match['m']] if named_month else int(match['m'])
+            try: return date(year, month, int(match['d'])), match.group(0)
+            except ValueError: continue
+    return None, ''
+
+
+class _Question:
+    """Normalized words of a question with its resolved mentions grouped as mention -> {kind: [values]}."""
+
+    def __init__(self, question: str, matches: List[Dict[str, Any]]):
+        self.text = normalize_name(question)
+        self.words = self.text.split()
+        self.mentions: Dict[str, Dict[str, List[str]]] = {}
+        for match in matches:
+            values = self.mentions.setdefault(match["mention"], {}).setdefault(match["kind"], [])
+            if match["value"] not in values: values.append(match["value"]) # Same-named venues in different cities
+        for mention, kinds in self.mentions.items():
+            # "Born in the U.S.A. tour": the resolver only sees the word right after a mention, before 'tour' here
+            end = next((i + len(mention.split()) for i in range(len(self.words)) if self.words[i:i + len(mention.split())] == mention.split()), 0)
+            if 'tour' in kinds and 'tour' in self.words[end:end + 2]: self.mentions[mention] = {'tour': kinds['tour']}
+        self.show_date, date_text = parse_show_date(self.text)
+        covered = set(date_text.split())
+        year_match = None if self.show_date else _YEAR_RE.search(self.text)
+        self.year = int(year_match.group(1)) if year_match else None
+        if year_match: covered.add(year_match.group(1))
+        # Words outside every mention, date and year; these decide whether a template really fits
+        self.leftover = []
+        mention_words = [m.split() for m in self.mentions]
+        i = 0
+        while i < len(self.words):
+            span = next((len(m) for m in mention_words if self.words[i:i + len(m)] == m), 0)
+            if span: i += span; continue
+            if self.words[i] not in covered: self.leftover.append(self.words[i])
+            i += 1
+
+    def only_words(self, allowed: frozenset) -> bool:
+        return all(w in _FILLER or w in allowed for w in self.leftover)
+
+    def assign(self, main_kinds: Tuple[str, ...], filter_kinds: Tuple[str, ...]) -> Optional[Tuple[Tuple[str, str], List[Tuple[str, str]]]]:
+        """
+        ((kind, value) of the one mention that can be a main kind, [(kind, value) filters]) or None when
+        a mention is ambiguous or fits neither role. A main mention may also have matched other kinds
+        ('Born to Run' as a song and an album), since the intent says which one is meant.
+        """
+        main, filters = None, []
+        for kinds in self.mentions.values():
+            usable = [k for k in main_kinds if k in kinds]
+            if usable:
+                if main is not None or len(usable) > 1 or len(kinds[usable[0]]) > 1: return None
+                main = (usable[0], kinds[usable[0]][0])
+            elif len(kinds) == 1 and next(iter(kinds)) in filter_kinds and len(next(iter(kinds.values()))) == 1:
+                kind, values = next(iter(kinds.items()))
+                filters.append((kind, values[0]))
+            else:
+                return None
+        if main is None or len({kind for kind, _ in filters}) < len(filters): return None
+        return main, filters
+
+
+def _where(filters: List[Tuple[str, str]], year: Optional[int], params: Dict[str, Any], date_column: str = 'show_date') -> Tuple[List[str], List[str]]:
+    """(SQL conditions, English descriptions) for the filter mentions and year; fills params."""
+    conditions, described = [], []
+    for kind, value in filters:
+        params[kind] = value
+        conditions.append(f"{_FILTER_COLUMNS[kind]} = %({kind})s")
+        described.append(f"on the {value} tour" if kind == 'tour' else f"in {value}" if kind in ('city', 'state', 'country') else f"at {value}")
+    if year:
+        params.update(year_start=date(year, 1, 1), year_end=date(year, 12, 31))
+        conditions.append(f"{date_column} BETWEEN %(year_start)s AND %(year_end)s") # Range, so partitions are pruned
+        described.append(f"in {year}")
+    return conditions, described
+
+
+def _and(conditions: List[str], indent: str = "    ") -> str:
+    return "".join(f"\n{indent}AND {c}" for c in conditions)
+
+
+# --- Intents: each returns (sql template, params, explanation) or None ---
+_SONG_PLAYS_WORDS = frozenset("times often many count number when first last debut debuted".split())
+
+def _song_plays(q: _Question):
+    """How many times has Thunder Road been played (at Giants Stadium / on the River tour / in 1985)?"""
+    if not ({'times', 'often', 'count', 'number'} & set(q.words) or ('when' in q.words and {'first', 'last'} & set(q.words))):
+        return None
+    if q.show_date or not q.only_words(_SONG_PLAYS_WORDS): return None
+    if {'first', 'last'} & set(q.leftover) and 'when' not in q.words: return None # "played first" means as an opener
+    assigned = q.assign(('song',), tuple(_FILTER_COLUMNS))
+    if not assigned: return None
+    (_, song), filters = assigned
+    params = {'song': song}
+    conditions, described = _where(filters, q.year, params)
+    sql = f"""SELECT
+    song_title,
+    COUNT(*) AS times_played,
+    MIN(show_date) AS first_played,
+    MAX(show_date) AS last_played
+FROM performances
+WHERE song_title = %(song)s{_and(conditions)}
+GROUP BY song_title;"""
+    scope = (" " + " ".join(described)) if described else ""
+    return sql, params, (f"Counts every performance of '{song}'{scope}. "
+                         "It also shows the dates it was first and last played.")
+
+
+_SONGS_AT_WORDS = frozenset("songs song setlists most common commonly frequently frequent popular top".split())
+
+def _songs_at_place(q: _Question):
+    """What songs has he played at the Capitol Theatre / in Passaic (on a tour / in a year)?"""
+    if not {'songs', 'song'} & set(q.words) or q.show_date or not q.only_words(_SONGS_AT_WORDS): return None
+    assigned = q.assign(tuple(_PLACE_COLUMNS), ('tour',))
+    if not assigned: return None
+    (kind, place), filters = assigned
+    params = {'place': place}
+    conditions, described = _where(filters, q.year, params)
+    sql = f"""SELECT
+    song_title,
+    COUNT(*) AS times_played,
+    MIN(show_date) AS first_played,
+    MAX(show_date) AS last_played
+FROM performances
+WHERE {_PLACE_COLUMNS[kind]} = %(place)s{_and(conditions)}
+GROUP BY song_title
+ORDER BY times_played DESC, song_title;"""
+    where = f"at {place}" if kind == 'venue' else f"in {place}"
+    scope = (" " + " ".join(described)) if described else ""
+    return sql, params, (f"Lists every song played {where}{scope}, most played first. "
+                         "Each song shows how many times it was played there and when it was first and last played.")
+
+
+_SETLIST_WORDS = frozenset("setlist setlists set songs song order".split())
+
+def _setlist_for_date(q: _Question):
+    """What was the setlist on September 19, 1978 (at the Capitol Theatre)?"""
+    if not q.show_date or not ({'setlist', 'setlists', 'songs'} & set(q.words) or 'set list' in q.text): return None
+    if not q.only_words(_SETLIST_WORDS): return None
+    params: Dict[str, Any] = {'show_date': q.show_date}
+    conditions = []
+    for kinds in q.mentions.values():
+        # Only a place may narrow the date down (early and late shows on the same day)
+        if len(kinds) != 1 or next(iter(kinds)) not in _PLACE_COLUMNS or len(next(iter(kinds.values()))) != 1: return None
+        kind, values = next(iter(kinds.items()))
+        if kind in params: return None
+        params[kind] = values[0]
+        conditions.append(f"{_PLACE_COLUMNS[kind]} = %({kind})s")
+    sql = f"""SELECT
+    show_date,
+    venue,
+    city,
+    position,
+    song_title,
+    notes
+FROM performances
+WHERE show_date = %(show_date)s{_and(conditions)}
+ORDER BY show_id, position;"""
+    return sql, params, (f"Lists the songs played on {q.show_date.strftime('%B')} {q.show_date.day}, {q.show_date.year} in setlist order. "
+                         "If there was more than one show that day, each show's songs are listed together.")
+
+
+_OVERDUE_WORDS = frozenset("overdue due songs song not since hasn t haven been longest".split())
+
+def _overdue_at_place(q: _Question):
+    """Which songs are overdue in Philadelphia?"""
+    if 'overdue' not in q.words and 'due' not in q.words: return None
+    if q.show_date or q.year or not q.only_words(_OVERDUE_WORDS): return None
+    assigned = q.assign(tuple(_PLACE_COLUMNS), ())
+    if not assigned: return None
+    (kind, place), _ = assigned
+    column = _PLACE_COLUMNS[kind]
+    sql = f"""WITH place_shows AS (
+    -- Every show at the place
+    SELECT show_id, date
+    FROM show_details
+    WHERE {column} = %(place)s
+),
+song_history AS (
+    -- Songs played there at least twice, with their most recent performance there
+    SELECT
+        song_title,
+        COUNT(*) AS times_played_here,
+        MAX(show_date) AS last_played_here
+    FROM performances
+    WHERE {column} = %(place)s
+    GROUP BY song_title
+    HAVING COUNT(*) >= 2
+)
+SELECT
+    sh.song_title,
+    sh.times_played_here,
+    sh.last_played_here,
+    (SELECT COUNT(*) FROM place_shows ps WHERE ps.date > sh.last_played_here) AS shows_here_since
+FROM song_history sh
+ORDER BY shows_here_since DESC, sh.times_played_here DESC
+LIMIT 50;"""
+    where = f"at {place}" if kind == 'venue' else f"in {place}"
+    return sql, {'place': place}, (f"Finds songs played {where} at least twice that have gone the most shows there without being played. "
+                                   "Each song shows how often it was played there, when it was last played there and how many shows there have happened since.")
+
+
+_TOUR_WORDS = frozenset("""first last final opening closing start started starts begin began begins end ended ends
+open opened close closed shows show long lasted when where summary dates date""".split())
+
+def _tour_summary(q: _Question):
+    """When did the Wrecking Ball tour start and end, and how many shows did it have?"""
+    if not q.only_words(_TOUR_WORDS) or q.show_date or q.year: return None
+    if not ({'first', 'last', 'final', 'opening', 'closing', 'start', 'started', 'begin', 'began', 'end', 'ended', 'long', 'summary'} & set(q.words)
+            or ('shows' in q.words and {'many', 'number', 'count'} & set(q.words))):
+        return None
+    # A tour named after an album only counts as the tour when the question says "tour"
+    if 'tour' not in q.words and any(len(kinds) > 1 for kinds in q.mentions.values()): return None
+    assigned = q.assign(('tour',), ())
+    if not assigned: return None
+    (_, tour), _ = assigned
+    sql = """SELECT
+    t.name AS tour,
+    t.first_show_date,
+    first_show.venue || ', ' || first_show.city AS first_show,
+    t.last_show_date,
+    last_show.venue || ', ' || last_show.city AS last_show,
+    t.show_count
+FROM tours t
+LEFT JOIN LATERAL (
+    SELECT venue, city FROM show_details sd
+    WHERE sd.tour_id = t.tour_id
+    ORDER BY sd.date, sd.show_id
+    LIMIT 1
+) first_show ON TRUE
+LEFT JOIN LATERAL (
+    SELECT venue, city FROM show_details sd
+    WHERE sd.tour_id = t.tour_id
+    ORDER BY sd.date DESC, sd.show_id DESC
+    LIMIT 1
+) last_show ON TRUE
+WHERE t.name = %(tour)s;"""
+    return sql, {'tour': tour}, (f"Looks up the {tour} tour. "
+                                 "It shows the date and venue of its first and last shows and how many shows it had.")
+
+
+INTENTS: List[Tuple[str, Callable[[_Question], Optional[tuple]]]] = [
+    ('setlist_for_date', _setlist_for_date),
+    ('song_plays', _song_plays),
+    ('overdue_at_place', _overdue_at_place),
+    ('songs_at_place', _songs_at_place),
+    ('tour_summary', _tour_summary),
+]
+
+
+def route_question(question: str, matches: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    {intent, sql, explanation} when the question fits a template, given the resolver's matches for it;
+    None means the question needs the LLM.
+    """
+    q = _Question(question, matches)
+    if not q.words: return None
+    for name, intent in INTENTS:
+        answer = intent(q)
+        if answer:
+            template, params, explanation = answer
+            return {"intent": name, "sql": render_sql(template, params), "explanation": explanation}
+    return None
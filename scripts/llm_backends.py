@@ -0,0 +1,174 @@
+# llm_backends.py
+# LLM backends for app.py. A backend is any object with the part of the
+# google.generativeai GenerativeModel interface the app uses:
+#   generate_content(prompt, stream=False, request_options=None) -> response
+# where the response has .text, .parts, .candidates, .prompt_feedback and
+# .usage_metadata and, when streamed, iterates over chunks with .text.
+# Besides Gemini itself ('gemini'), there is a deterministic local stub
+# ('stub') that replays recorded answers or returns a canned one after a
+# configurable delay, so the app can be load-tested and benchmarked offline,
+# and a recorder that saves live Gemini answers for the stub to replay.
+
+import re
+import json
+import time
+import zlib
+import logging
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_QUESTION_RE = re.compile(r'USER QUESTION:\s*\n"(.*?)"\s*\n', re.DOTALL)
+
+CANNED_RESPONSE = """```sql
+SELECT title, album, times_played
+FROM songs
+ORDER BY times_played DESC
+LIMIT 10;
+```
+```explanation
+Lists the ten most played songs. This is the canned answer of the local stub LLM backend.
+```"""
+
+
+def prompt_question(prompt: str) -> Optional[str]:
+    """The USER QUESTION embedded in an NL->SQL (or repair) prompt, or None."""
+    match = _QUESTION_RE.search(prompt)
+    return match.group(1) if match else None
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(question.lower().split()).rstrip("?.! ")
+
+
+def _usage(prompt: str, text: str) -> SimpleNamespace:
+    # Roughly four characters per token, like Gemini's own estimate for English
+    return SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=len(text) // 4,
+                           total_token_count=(len(prompt) + len(text)) // 4)
+
+
+class StubResponse:
+    """Gemini-shaped response; iterating it yields the text in chunks (for stream=True)."""
+
+    def __init__(self, prompt: str, text: str, chunks: List[str], chunk_delay: float):
+        self.text = text
+        part = SimpleNamespace(text=text)
+        self.parts = [part]
+        self.candidates = [SimpleNamespace(content=SimpleNamespace(parts=[part]), finish_reason="STOP")]
+        self.prompt_feedback = SimpleNamespace(block_reason=None)
+        self.usage_metadata = _usage(prompt, text)
+        self._chunks, self._chunk_delay = chunks, chunk_delay
+
+    def __iter__(self) -> Iterator[SimpleNamespace]:
+        for i, chunk in enumerate(self._chunks):
+            if i and self._chunk_delay: time.sleep(self._chunk_delay)
+            yield SimpleNamespace(text=chunk)
+
+
+class StubLLM:
+    """
+    Deterministic stand-in for the Gemini model. Answers a prompt with the recorded response for its
+    USER QUESTION, or the canned response, after latency_seconds (plus a jitter of up to
+    +/- jitter_seconds derived from the prompt, so the same prompt always takes the same time).
+    Streamed responses spend first_chunk_fraction of that before the first chunk and spread the rest
+    over the remaining chunks of chunk_chars characters.
+    """
+
+    def __init__(self, responses: Optional[Dict[str, str]] = None, default_response: str = CANNED_RESPONSE,
+                 latency_seconds: float = 0.0, jitter_seconds: float = 0.0,
+                 chunk_chars: int = 40, first_chunk_fraction: float = 0.3):
+        self.responses = {normalize_question(q): text for q, text in (responses or {}).items()}
+        self.default_response = default_response
+        self.latency_seconds, self.jitter_seconds = max(0.0, latency_seconds), max(0.0, jitter_seconds)
+        self.chunk_chars, self.first_chunk_fraction = max(1, chunk_chars), min(1.0, max(0.0, first_chunk_fraction))
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    @classmethod
+    def from_file(cls, path: Optional[Path], **kwargs) -> "StubLLM":
+        """Loads recorded answers from a JSONL file of {"question", "response"} lines (as written by RecordingLLM)."""
+        responses = {}
+        if path:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip(): continue
+                    record = json.loads(line)
+                    responses[record["question"]] = record["response"]
+            logger.info(f"Stub LLM loaded {len(responses)} recorded responses from {path}")
+        return cls(responses, **kwargs)
+
+    def response_text(self, prompt: str) -> str:
+        question = prompt_question(prompt)
+        if question is None: return self.default_response
+        return self.responses.get(normalize_question(question), self.default_response)
+
+    def latency(self, prompt: str) -> float:
+        if not self.jitter_seconds: return self.latency_seconds
+        unit = zlib.crc32(prompt.encode("utf-8")) / 0xFFFFFFFF # Stable in [0, 1] for a given prompt
+        return max(0.0, self.latency_seconds + (2 * unit - 1) * self.jitter_seconds)
+
+    def generate_content(self, prompt: str, stream: bool = False, request_options: Optional[dict] = None) -> StubResponse:
+        with self._lock: self.calls += 1
+        text, delay = self.response_text(prompt), self.latency(prompt)
+        timeout = (request_options or {}).get("timeout")
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Stub LLM call took longer than the {timeout}s timeout.")
+        if not stream:
+            time.sleep(delay)
+            return StubResponse(prompt, text, [text], 0.0)
+        chunks = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)] or [""]
+        time.sleep(delay * self.first_chunk_fraction)
+        chunk_delay = delay * (1 - self.first_chunk_fraction) / (len(chunks) - 1) if len(chunks) > 1 else 0.0
+        return StubResponse(prompt, text, chunks, chunk_delay)
+
+    def count_tokens(self, prompt: str) -> SimpleNamespace:
+        return SimpleNamespace(total_tokens=len(prompt) // 4)
+
+
+class RecordingLLM:
+    """
+    Wraps a model and appends each answered question and its full response text to a JSONL file that
+    StubLLM.from_file replays. Streamed responses are recorded once they have been read to the end.
+    """
+
+    def __init__(self, model, path: Path):
+        self.model, self.path = model, Path(path)
+        self._lock = threading.Lock()
+
+    def _record(self, prompt: str, text: str):
+        question = prompt_question(prompt)
+        if question is None or not text: return
+        line = json.dumps({"question": question, "response": text}) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f: f.write(line)
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs):
+        response = self.model.generate_content(prompt, stream=stream, **kwargs)
+        if stream: return _RecordedStream(response, lambda text: self._record(prompt, text))
+        try: self._record(prompt, response.text)
+        except ValueError: pass # Blocked response without text
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.model, name) # count_tokens etc.
+
+
+class _RecordedStream:
+    """Passes a streamed response through, collecting the chunk text and recording it when the stream ends."""
+
+    def __init__(self, response, on_complete):
+        self._response, self._on_complete = response, on_complete
+
+    def __iter__(self):
+        texts = []
+        for chunk in self._response:
+            try: texts.append(chunk.text)
+            except ValueError: pass
+            yield chunk
+        self._on_complete("".join(texts))
+
+    def __getattr__(self, name):
+        return getattr(self._response, name) # prompt_feedback, usage_metadata
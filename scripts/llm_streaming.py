@@ -0,0 +1,64 @@
+# llm_streaming.py
+# Helpers for streaming LLM output to the browser as Server-Sent Events:
+# an incremental tracker for the ```sql / ```explanation fenced blocks and
+# SSE message formatting.
+
+import re
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+_FENCE_OPEN_RE = {
+    'sql': re.compile(r"```sql[^\S\n]*\n?", re.IGNORECASE),
+    'explanation': re.compile(r"```explanation[^\S\n]*\n?", re.IGNORECASE),
+}
+_FENCE = "```"
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Formats one SSE message (data is JSON-encoded, so it is always a single line)."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class FencedBlockTracker:
+    """
+    Follows a growing LLM response and reports, per fenced block, the text that is
+    new since the last call and whether the block's closing ``` has arrived.
+    Trailing backticks are held back so a half-received closing fence is never emitted.
+    """
+
+    def __init__(self, blocks: Tuple[str, ...] = ('sql', 'explanation')):
+        self.text = ""
+        self._emitted: Dict[str, int] = {name: 0 for name in blocks}
+        self.closed: Dict[str, bool] = {name: False for name in blocks}
+
+    def _block_bounds(self, name: str) -> Optional[Tuple[int, Optional[int]]]:
+        opening = _FENCE_OPEN_RE[name].search(self.text)
+        if not opening: return None
+        end = self.text.find(_FENCE, opening.end())
+        return opening.end(), (end if end >= 0 else None)
+
+    def feed(self, chunk: str) -> List[Tuple[str, str, bool]]:
+        """Adds a chunk; returns (block, new_text, just_closed) for every block that changed."""
+        self.text += chunk
+        updates = []
+        for name in self._emitted:
+            if self.closed[name]: continue
+            bounds = self._block_bounds(name)
+            if bounds is None: continue
+            start, end = bounds
+            if end is None:
+                body = self.text[start:]
+                body = body[:len(body.rstrip('`'))] # Could be the start of the closing fence
+            else:
+                body = self.text[start:end]
+            new_text = body[self._emitted[name]:]
+            self._emitted[name] = len(body)
+            if end is not None: self.closed[name] = True
+            if new_text or end is not None: updates.append((name, new_text, end is not None))
+        return updates
+
+    def block_text(self, name: str) -> Optional[str]:
+        bounds = self._block_bounds(name)
+        if bounds is None: return None
+        start, end = bounds
+        return self.text[start:end] if end is not None else self.text[start:]
@@ -0,0 +1,225 @@
+# load_test.py
+# Load generator for app.py: keeps --concurrency requests in flight against
+# /process_nl_query and /query for --duration seconds (or --requests in total)
+# and reports p50/p95/p99 latency and throughput per endpoint. By default it
+# launches the app itself with the stub LLM backend (llm_backends.py) against
+# the local Postgres, so runs are offline and repeatable; pass --url to drive a
+# server that is already running (whatever backend it uses).
+# Usage: python load_test.py [--url http://127.0.0.1:5000] [--concurrency N] [--duration S | --requests N]
+#        [--nl-share F] [--bypass-cache] [--stub-latency S] [--stub-jitter S] [--stub-responses FILE]
+#        [--questions FILE] [--queries FILE] [--output report.json]
+
+import os
+import sys
+import json
+import math
+import time
+import logging
+import argparse
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+LAUNCHER = "import app; app.app.run(host='127.0.0.1', port={port}, debug=False, use_reloader=False, threaded=True)"
+
+# Templated, cacheable and LLM-bound questions, so the NL path is exercised end to end
+SAMPLE_QUESTIONS = [
+    "What was the setlist on 1978-09-19?",
+    "How many times has Thunder Road been played?",
+    "What were the most common openers on the Wrecking Ball tour?",
+    "Which songs have not been played in the last 100 shows?",
+    "Which albums had the most songs played live in 2016?",
+    "How many different songs were played in Europe in 2023?",
+    "Which venues has he played more than 20 times?",
+    "What was the average setlist length per tour?",
+]
+
+SAMPLE_QUERIES = [
+    "SELECT title, album, times_played FROM songs ORDER BY times_played DESC LIMIT 25",
+    "SELECT name, first_show_date, last_show_date, show_count FROM tours ORDER BY first_show_date",
+    "SELECT date, tour, venue, city, song_count FROM show_details ORDER BY date DESC LIMIT 100",
+    "SELECT country_name, SUM(show_count) AS shows FROM cities GROUP BY country_name ORDER BY shows DESC",
+    "SELECT sh.date, st.position, so.title FROM setlists st JOIN shows sh ON sh.show_id = st.show_id "
+    "JOIN songs so ON so.song_id = st.song_id WHERE sh.date >= DATE '2016-01-01' ORDER BY sh.date, st.position",
+]
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an ascending list (None if empty)."""
+    if not sorted_values: return None
+    return sorted_values[max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)]
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def read_lines(path: Optional[Path], default: List[str]) -> List[str]:
+    if not path: return default
+    lines = (line.strip() for line in path.read_text(encoding='utf-8').splitlines())
+    return [line for line in lines if line and not line.startswith('#')]
+
+
+class RequestPlan:
+    """Thread-safe, deterministic sequence of (endpoint, body): every question and query in turn, NL requests at nl_share."""
+
+    def __init__(self, questions: List[str], queries: List[str], nl_share: float, bypass_cache: bool, limit: Optional[int]):
+        self.questions, self.queries, self.nl_share, self.bypass_cache, self.limit = questions, queries, nl_share, bypass_cache, limit
+        self._issued, self._nl_issued = 0, 0
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            if self.limit is not None and self._issued >= self.limit: return None
+            self._issued += 1
+            # Send an NL request whenever they have fallen behind their share (an even interleave)
+            send_nl = not self.queries or (bool(self.questions) and self._nl_issued < self.nl_share * self._issued)
+            if send_nl:
+                question = self.questions[self._nl_issued % len(self.questions)]
+                self._nl_issued += 1
+                return "/process_nl_query", {"query": question, "bypass_cache": self.bypass_cache}
+            return "/query", {"sql": self.queries[(self._issued - self._nl_issued - 1) % len(self.queries)]}
+
+
+def send(base_url: str, endpoint: str, body: Dict, timeout: float):
+    """POSTs body; returns (status, X-Cache header). The response is read in full, as a browser would."""
+    request = urllib.request.Request(base_url + endpoint, data=json.dumps(body).encode('utf-8'), method='POST',
+                                     headers={'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return response.status, response.headers.get('X-Cache')
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code, None
+    except (urllib.error.URLError, ConnectionError, OSError) as e:
+        return f"{type(e).__name__}", None
+
+
+def run_load(base_url: str, plan: RequestPlan, concurrency: int, duration: Optional[float], timeout: float):
+    """Runs `concurrency` client threads until the plan is exhausted or duration passes; returns (samples, elapsed)."""
+    samples, lock = [], threading.Lock()
+    start = time.perf_counter()
+    deadline = start + duration if duration else None
+
+    def client():
+        while deadline is None or time.perf_counter() < deadline:
+            step = plan.next()
+            if step is None: return
+            endpoint, body = step
+            sent = time.perf_counter()
+            status, cache = send(base_url, endpoint, body, timeout)
+            with lock: samples.append((endpoint, time.perf_counter() - sent, status, cache))
+
+    threads = [threading.Thread(target=client, name=f"load-{i}", daemon=True) for i in range(max(1, concurrency))]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, elapsed: float) -> Dict[str, Dict]:
+    """Per endpoint (and overall): requests, errors, throughput and latency percentiles in milliseconds."""
+    groups = defaultdict(list)
+    for sample in samples:
+        groups[sample[0]].append(sample)
+        groups["all"].append(sample)
+    report = {}
+    for endpoint, group in groups.items():
+        latencies = sorted(seconds for _, seconds, _, _ in group)
+        statuses = Counter(str(status) for _, _, status, _ in group)
+        report[endpoint] = {
+            "requests": len(group),
+            "errors": sum(count for status, count in statuses.items() if status != "200"),
+            "statuses": dict(statuses),
+            "throughput_rps": round(len(group) / elapsed, 2) if elapsed else None,
+            "mean_ms": _ms(sum(latencies) / len(latencies)),
+            "p50_ms": _ms(percentile(latencies, 50)),
+            "p95_ms": _ms(percentile(latencies, 95)),
+            "p99_ms": _ms(percentile(latencies, 99)),
+            "max_ms": _ms(latencies[-1]),
+        }
+        caches = Counter(cache for _, _, _, cache in group if cache)
+        if caches: report[endpoint]["x_cache"] = dict(caches)
+    return report
+
+
+def wait_ready(base_url: str, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + "/readyz", timeout=1) as response:
+                if response.status == 200: return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def launch_app(port: int, args) -> subprocess.Popen:
+    """Starts app.py on port with the stub LLM backend (the rest of the configuration, e.g. PG*, is inherited)."""
+    env = dict(os.environ, LLM_BACKEND="stub", LLM_STUB_LATENCY_SECONDS=str(args.stub_latency),
+               LLM_STUB_JITTER_SECONDS=str(args.stub_jitter))
+    if args.stub_responses: env["LLM_STUB_RESPONSES_FILE"] = str(args.stub_responses.resolve())
+    return subprocess.Popen([sys.executable, "-c", LAUNCHER.format(port=port)], cwd=SCRIPT_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def print_report(report: Dict[str, Dict], elapsed: float, concurrency: int):
+    print(f"\n{concurrency} concurrent clients for {elapsed:.1f}s")
+    print(f"{'endpoint':<20} {'reqs':>6} {'errors':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for endpoint in sorted(report, key=lambda name: (name == "all", name)):
+        row = report[endpoint]
+        print(f"{endpoint:<20} {row['requests']:>6} {row['errors']:>6} {row['throughput_rps']:>8} "
+              f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9} {row['max_ms']:>9}")
+    if "/query" in report and report["/query"].get("x_cache"):
+        print("/query X-Cache: " + ", ".join(f"{k}={v}" for k, v in sorted(report["/query"]["x_cache"].items())))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive /process_nl_query and /query at a target concurrency and report latency percentiles.")
+    parser.add_argument('--url', help="Base URL of a running app (default: launch one with the stub LLM backend).")
+    parser.add_argument('--port', type=int, default=5057, help="Port for the launched app.")
+    parser.add_argument('--concurrency', type=int, default=8, help="Requests in flight at once.")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds to run (ignored with --requests).")
+    parser.add_argument('--requests', type=int, help="Total requests to send instead of running for --duration.")
+    parser.add_argument('--nl-share', type=float, default=0.5, help="Fraction of requests sent to /process_nl_query (the rest go to /query).")
+    parser.add_argument('--bypass-cache', action='store_true', help="Skip intent templates and the NL cache so every NL request reaches the LLM.")
+    parser.add_argument('--questions', type=Path, help="Text file with one question per line (default: built-in samples).")
+    parser.add_argument('--queries', type=Path, help="Text file with one SQL query per line (default: built-in samples).")
+    parser.add_argument('--stub-latency', type=float, default=2.0, help="Stub LLM seconds per call (launched app only).")
+    parser.add_argument('--stub-jitter', type=float, default=0.5, help="Stub LLM +/- seconds per call, fixed per prompt (launched app only).")
+    parser.add_argument('--stub-responses', type=Path, help="JSONL of recorded answers for the stub to replay (launched app only).")
+    parser.add_argument('--timeout', type=float, default=120, help="Per-request timeout in seconds.")
+    parser.add_argument('--output', type=Path, help="Also write the report as JSON.")
+    args = parser.parse_args()
+
+    questions, queries = read_lines(args.questions, SAMPLE_QUESTIONS), read_lines(args.queries, SAMPLE_QUERIES)
+    if not questions and not queries: sys.exit("No questions or queries to send.")
+    plan = RequestPlan(questions, queries, min(1.0, max(0.0, args.nl_share)), args.bypass_cache, args.requests)
+    process, base_url = None, (args.url or f"http://127.0.0.1:{args.port}").rstrip('/')
+    if not args.url:
+        logger.info(f"Launching app.py on port {args.port} with the stub LLM backend ({args.stub_latency}s +/- {args.stub_jitter}s)...")
+        process = launch_app(args.port, args)
+    try:
+        if not wait_ready(base_url, timeout=60): sys.exit(f"{base_url} did not become ready (GET /readyz) within 60s.")
+        logger.info(f"Sending load at concurrency {args.concurrency}...")
+        samples, elapsed = run_load(base_url, plan, args.concurrency, None if args.requests else args.duration, args.timeout)
+    finally:
+        if process:
+            process.terminate()
+            try: process.wait(timeout=5)
+            except subprocess.TimeoutExpired: process.kill()
+    if not samples: sys.exit("No requests completed.")
+    report = summarize(samples, elapsed)
+    print_report(report, elapsed, args.concurrency)
+    if args.output:
+        args.output.write_text(json.dumps({"concurrency": args.concurrency, "seconds": round(elapsed, 3), "endpoints": report}, indent=2), encoding='utf-8')
+        logger.info(f"Wrote report to {args.output}")
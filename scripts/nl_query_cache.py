@@ -0,0 +1,163 @@
+# nl_query_cache.py
+# Persistent cache of natural-language question -> (SQL, explanation) answers.
+# Stored in SQLite next to the normalized CSVs. Entries are scoped to a hash of
+# the prompt context (schema digest, instructions) and the LLM model name:
+# after editing schema.sql or switching LLM_MODEL_NAME only the entries of the
+# new context are served, and the older ones return if the context does.
+# Near-duplicate matches also require the same resolved entities (songs,
+# venues, cities, ...), so questions that differ only in a name don't share SQL.
+
+import re
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Filler words ignored for near-duplicate matching. Words that change meaning
+# (not, never, most, least, first, last, before, after, ...) are deliberately kept.
+_STOPWORDS = frozenset("""
+a an the of in on at to for from by with and or is are was were be been has have had do does did
+what which who whom whose how me my i you your we our us can could would will please show list give
+tell find get bruce springsteen springsteens
+""".split())
+_WORD_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def normalize_question(question: str) -> str:
+    """Lowercases, folds unicode/quotes, strips punctuation and collapses whitespace."""
+    text = unicodedata.normalize('NFKC', question).lower().replace('’', "'")
+    return ' '.join(_WORD_RE.findall(text))
+
+
+def _stem(word: str) -> str:
+    for suffix in ('ing', 'ed', 'es', 's'):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix): return word[:-len(suffix)]
+    return word
+
+
+def question_signature(normalized: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """(content tokens, numeric tokens) used for near-duplicate matching."""
+    words = [w.replace("'", '') for w in normalized.split()]
+    content = frozenset(_stem(w) for w in words if w not in _STOPWORDS)
+    numbers = frozenset(w for w in words if any(ch.isdigit() for ch in w))
+    return content, numbers
+
+
+def entity_key(entities: Optional[List[Dict[str, Any]]]) -> Optional[FrozenSet[Tuple[str, str]]]:
+    """(kind, value) pairs of the resolved entities; None if they are unknown (the resolver was unavailable)."""
+    if entities is None: return None
+    return frozenset((e["kind"], e["value"]) for e in entities)
+
+
+def context_hash(prompt_context: str) -> str:
+    return hashlib.sha256(prompt_context.encode('utf-8')).hexdigest()
+
+
+class NLQueryCache:
+    """SQLite-backed question cache with exact and near-duplicate lookups."""
+
+    def __init__(self, path: Path, context: str, model_name: str, similarity_threshold: float = 0.8):
+        self.path = Path(path)
+        self.context = context
+        self.model_name = model_name
+        self.similarity_threshold = similarity_threshold
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS nl_cache (
+                context_hash TEXT NOT NULL,
+                model_name TEXT NOT NULL,
+                normalized_question TEXT NOT NULL,
+                question TEXT NOT NULL,
+                sql TEXT NOT NULL,
+                explanation TEXT,
+                created_at TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                entities TEXT,
+                PRIMARY KEY (context_hash, model_name, normalized_question)
+            )""")
+        if "entities" not in {row[1] for row in self._conn.execute("PRAGMA table_info(nl_cache);")}:
+            self._conn.execute("ALTER TABLE nl_cache ADD COLUMN entities TEXT;") # Caches written before entity matching
+        self._conn.commit()
+        # In-memory signatures for near-duplicate matching: normalized question -> (content, numbers, entities)
+        self._signatures: Dict[str, Tuple[FrozenSet[str], FrozenSet[str], Optional[FrozenSet[Tuple[str, str]]]]] = {}
+        for normalized, entities in self._conn.execute(
+                "SELECT normalized_question, entities FROM nl_cache WHERE context_hash = ? AND model_name = ?;", (context, model_name)):
+            entities = frozenset(map(tuple, json.loads(entities))) if entities is not None else None
+            self._signatures[normalized] = question_signature(normalized) + (entities,)
+        self._stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "stores": 0}
+        logger.info(f"NL query cache ready with {len(self._signatures)} entries ({self.path.name}).")
+
+    def _find_similar(self, normalized: str, entities: Optional[FrozenSet[Tuple[str, str]]]) -> Tuple[Optional[str], float]:
+        content, numbers = question_signature(normalized)
+        if not content or entities is None: return None, 0.0 # Without resolved entities only exact matches are safe
+        best, best_score = None, 0.0
+        for other, (other_content, other_numbers, other_entities) in self._signatures.items():
+            if other_numbers != numbers: continue # "top songs of 1978" must not answer "... of 1979"
+            if other_entities != entities: continue # "... in New Jersey" must not answer "... in New York"
+            union = len(content | other_content)
+            score = len(content & other_content) / union if union else 0.0
+            if score > best_score: best, best_score = other, score
+        return (best, best_score) if best_score >= self.similarity_threshold else (None, best_score)
+
+    def get(self, question: str, entities: Optional[List[Dict[str, Any]]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Returns {sql, explanation, match, matched_question, similarity} or None. entities are the question's
+        resolved mentions ([{kind, value, ...}]); without them only an exact match is returned.
+        """
+        normalized = normalize_question(question)
+        if not normalized: return None
+        with self._lock:
+            match, score = ("exact", 1.0) if normalized in self._signatures else ("similar", 0.0)
+            key = normalized
+            if match == "similar":
+                key, score = self._find_similar(normalized, entity_key(entities))
+                if key is None:
+                    self._stats["misses"] += 1
+                    return None
+            row = self._conn.execute(
+                "SELECT question, sql, explanation FROM nl_cache WHERE context_hash = ? AND model_name = ? AND normalized_question = ?;",
+                (self.context, self.model_name, key)).fetchone()
+            if row is None:
+                self._signatures.pop(key, None)
+                self._stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE nl_cache SET hits = hits + 1 WHERE context_hash = ? AND model_name = ? AND normalized_question = ?;",
+                               (self.context, self.model_name, key))
+            self._conn.commit()
+            self._stats["exact_hits" if match == "exact" else "similar_hits"] += 1
+        return {"sql": row[1], "explanation": row[2], "match": match,
+                "matched_question": row[0], "similarity": round(score, 3)}
+
+    def put(self, question: str, sql: str, explanation: Optional[str], entities: Optional[List[Dict[str, Any]]] = None):
+        normalized = normalize_question(question)
+        if not normalized or not sql: return
+        key = entity_key(entities)
+        stored_entities = json.dumps(sorted(key)) if key is not None else None
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO nl_cache (context_hash, model_name, normalized_question, question, sql, explanation, created_at, entities)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (context_hash, model_name, normalized_question)
+                DO UPDATE SET question = excluded.question, sql = excluded.sql, explanation = excluded.explanation,
+                              created_at = excluded.created_at, entities = excluded.entities;""",
+                (self.context, self.model_name, normalized, question, sql, explanation, datetime.now().isoformat(), stored_entities))
+            self._conn.commit()
+            self._signatures[normalized] = question_signature(normalized) + (key,)
+            self._stats["stores"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            result = dict(self._stats)
+            result.update(entries=len(self._signatures), model_name=self.model_name,
+                          context_hash=self.context[:12], similarity_threshold=self.similarity_threshold)
+        lookups = result["exact_hits"] + result["similar_hits"] + result["misses"]
+        result["hit_ratio"] = round((result["exact_hits"] + result["similar_hits"]) / lookups, 4) if lookups else 0.0
+        return result
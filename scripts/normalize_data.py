@@ -18,6 +18,7 @@ from config import (
     SCRIPT_DIR, BASE_PATH, INPUT_PATH, OUTPUT_PATH,
     SONGS_SESSIONS_FILENAME, SETLISTS_FILENAME,
     SONGS_OUTPUT_FILENAME, SHOWS_OUTPUT_FILENAME, SETLISTS_OUTPUT_FILENAME,
+    TOURS_OUTPUT_FILENAME, VENUES_OUTPUT_FILENAME, CITIES_OUTPUT_FILENAME,
     SCHEMA_SQL_FILE,
     MINIMAL_REPLACEMENTS, RE_WHITESPACE,
 )
@@ -329,6 +330,38 @@ def create_shows_setlists_tables(setlists_input_df: pd.DataFrame, songs_df_final
     return shows_df_final, setlists_df_final
 
 
+def create_dimension_tables(shows_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """ Splits tour, venue and city strings out of shows into integer-keyed dimension tables with first/last dates and show counts. """
+    logger.info("Creating tour, venue and city dimension tables...")
+    location_cols = ['city', 'state_name', 'state_code', 'country_name', 'country_code']
+    shows = shows_df.copy()
+    for col in ['tour', 'venue'] + location_cols:
+        shows[col] = shows[col].fillna('').astype(str).str.strip()
+    # Ids are assigned in chronological order of first appearance
+    shows['_sort_date'] = pd.to_datetime(shows['date'], errors='coerce')
+    shows = shows.sort_values(['_sort_date', 'show_id'], kind='stable')
+    stats = dict(first_show_date=('date', 'min'), last_show_date=('date', 'max'), show_count=('show_id', 'count'))
+
+    tours_df = shows.groupby('tour', sort=False).agg(**stats).reset_index().rename(columns={'tour': 'name'})
+    tours_df.insert(0, 'tour_id', range(1, len(tours_df) + 1))
+    shows = shows.merge(tours_df[['tour_id', 'name']].rename(columns={'name': 'tour'}), on='tour', how='left')
+
+    cities_df = shows.groupby(location_cols, sort=False).agg(**stats).reset_index().rename(columns={'city': 'name'})
+    cities_df.insert(0, 'city_id', range(1, len(cities_df) + 1))
+    shows = shows.merge(cities_df[['city_id', 'name'] + location_cols[1:]].rename(columns={'name': 'city'}), on=location_cols, how='left')
+
+    venues_df = shows.groupby(['venue', 'city_id'], sort=False).agg(**stats).reset_index().rename(columns={'venue': 'name'})
+    venues_df.insert(0, 'venue_id', range(1, len(venues_df) + 1))
+    shows = shows.merge(venues_df[['venue_id', 'name', 'city_id']].rename(columns={'name': 'venue'}), on=['venue', 'city_id'], how='left')
+
+    shows_df_final = shows.sort_values('show_id')[['show_id', 'date', 'tour_id', 'venue_id', 'city_id', 'show_notes']].reset_index(drop=True)
+    tours_df = tours_df[['tour_id', 'name', 'first_show_date', 'last_show_date', 'show_count']]
+    cities_df = cities_df[['city_id', 'name'] + location_cols[1:] + ['first_show_date', 'last_show_date', 'show_count']]
+    venues_df = venues_df[['venue_id', 'name', 'city_id', 'first_show_date', 'last_show_date', 'show_count']]
+    logger.info(f"Created {len(tours_df)} tours, {len(venues_df)} venues and {len(cities_df)} cities.")
+    return tours_df, venues_df, cities_df, shows_df_final
+
+
 # ============================================================================
 # Main Execution Logic
 # ============================================================================
@@ -340,6 +373,9 @@ def normalize_database_schema():
     songs_output_file = OUTPUT_PATH / SONGS_OUTPUT_FILENAME
     shows_output_file = OUTPUT_PATH / SHOWS_OUTPUT_FILENAME
     setlists_output_file = OUTPUT_PATH / SETLISTS_OUTPUT_FILENAME
+    tours_output_file = OUTPUT_PATH / TOURS_OUTPUT_FILENAME
+    venues_output_file = OUTPUT_PATH / VENUES_OUTPUT_FILENAME
+    cities_output_file = OUTPUT_PATH / CITIES_OUTPUT_FILENAME
 
     try:
         if not songs_sessions_file.exists(): raise FileNotFoundError(f"Songs/Sessions file not found: {songs_sessions_file}")
@@ -362,7 +398,8 @@ def normalize_database_schema():
         # ---
 
     songs_table_final, canonical_matching_map = create_final_songs_table(songs_sessions_df, setlists_input_df)
-    shows_table_normalized, setlists_table_normalized = create_shows_setlists_tables(setlists_input_df, songs_table_final, canonical_matching_map)
+    shows_table_with_names, setlists_table_normalized = create_shows_setlists_tables(setlists_input_df, songs_table_final, canonical_matching_map)
+    tours_table, venues_table, cities_table, shows_table_normalized = create_dimension_tables(shows_table_with_names)
 
     logger.info("Saving normalized CSV files...")
     try:
@@ -370,10 +407,16 @@ def normalize_database_schema():
         songs_table_final.to_csv(songs_output_file, index=False, encoding='utf-8-sig')
         shows_table_normalized.to_csv(shows_output_file, index=False, encoding='utf-8-sig')
         setlists_table_normalized.to_csv(setlists_output_file, index=False, encoding='utf-8-sig')
+        tours_table.to_csv(tours_output_file, index=False, encoding='utf-8-sig')
+        venues_table.to_csv(venues_output_file, index=False, encoding='utf-8-sig')
+        cities_table.to_csv(cities_output_file, index=False, encoding='utf-8-sig')
         logger.info("Normalized database schema created successfully:")
         logger.info(f"- Songs table ({songs_output_file.name}): {len(songs_table_final)} rows")
         logger.info(f"- Shows table ({shows_output_file.name}): {len(shows_table_normalized)} rows")
         logger.info(f"- Setlists table ({setlists_output_file.name}): {len(setlists_table_normalized)} rows")
+        logger.info(f"- Tours table ({tours_output_file.name}): {len(tours_table)} rows")
+        logger.info(f"- Venues table ({venues_output_file.name}): {len(venues_table)} rows")
+        logger.info(f"- Cities table ({cities_output_file.name}): {len(cities_table)} rows")
         logger.info(f"Files saved to {OUTPUT_PATH}")
     except Exception as e: logger.exception(f"Error saving normalized CSV files: {e}")
 
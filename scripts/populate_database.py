@@ -23,7 +23,8 @@ except ImportError:
 
 # Import path configuration
 try:
-    from config import OUTPUT_PATH, SCHEMA_SQL_FILE, SHOWS_OUTPUT_FILENAME, SONGS_OUTPUT_FILENAME, SETLISTS_OUTPUT_FILENAME
+    from config import (OUTPUT_PATH, SCHEMA_SQL_FILE, SHOWS_OUTPUT_FILENAME, SONGS_OUTPUT_FILENAME, SETLISTS_OUTPUT_FILENAME,
+                        TOURS_OUTPUT_FILENAME, VENUES_OUTPUT_FILENAME, CITIES_OUTPUT_FILENAME)
 except ImportError:
      # Fallback if config import fails (e.g., script moved)
      print("ERROR: config.py not found or missing required elements (OUTPUT_PATH, SCHEMA_SQL_FILE, etc.). Attempting relative paths.")
@@ -34,6 +35,9 @@ except ImportError:
      SHOWS_OUTPUT_FILENAME = "shows.csv"
      SONGS_OUTPUT_FILENAME = "songs.csv"
      SETLISTS_OUTPUT_FILENAME = "setlists.csv"
+     TOURS_OUTPUT_FILENAME = "tours.csv"
+     VENUES_OUTPUT_FILENAME = "venues.csv"
+     CITIES_OUTPUT_FILENAME = "cities.csv"
 
 
 # Set up logging
@@ -121,12 +125,86 @@ def update_statistics(conn: psycopg2.extensions.connection):
         notices = conn.notices; conn.notices.clear(); # Process notices if needed
         logger.info("Calling update_show_song_counts()..."); cursor.execute("SELECT update_show_song_counts();")
         notices = conn.notices; conn.notices.clear(); # Process notices if needed
+        logger.info("Calling update_dimension_stats()..."); cursor.execute("SELECT update_dimension_stats();")
+        notices = conn.notices; conn.notices.clear(); # Process notices if needed
+        logger.info("Calling update_show_numbers()..."); cursor.execute("SELECT update_show_numbers();")
+        notices = conn.notices; conn.notices.clear(); # Process notices if needed
+        logger.info("Calling rebuild_performance_gaps()..."); cursor.execute("SELECT rebuild_performance_gaps();")
+        notices = conn.notices; conn.notices.clear(); # Process notices if needed
+        logger.info("Refreshing song_timeline..."); cursor.execute("REFRESH MATERIALIZED VIEW song_timeline;")
+        logger.info("Calling rebuild_song_transitions()..."); cursor.execute("SELECT rebuild_song_transitions();")
+        notices = conn.notices; conn.notices.clear(); # Process notices if needed
         conn.commit(); logger.info("Statistics updated successfully.")
     except psycopg2.Error as e: logger.error(f"Stats update error: {e} (State: {e.pgcode})"); conn.rollback(); logger.critical("Failed. Exiting."); sys.exit(1)
     except Exception as e: logger.exception(f"Unexpected stats update error: {e}"); conn.rollback(); logger.critical("Failed. Exiting."); sys.exit(1)
     finally:
         if cursor: cursor.close()
 
+def build_performances_df(shows_df: pd.DataFrame, songs_df: pd.DataFrame, setlists_df: pd.DataFrame,
+                          tours_df: pd.DataFrame, venues_df: pd.DataFrame, cities_df: pd.DataFrame) -> pd.DataFrame:
+    """Joins the prepared setlists/shows/songs and dimension DataFrames into rows for the denormalized performances table."""
+    shows_numbered = shows_df.merge(tours_df[['tour_id', 'name']].rename(columns={'name': 'tour'}), on='tour_id', how='left') \
+        .merge(venues_df[['venue_id', 'name']].rename(columns={'name': 'venue'}), on='venue_id', how='left') \
+        .merge(cities_df[['city_id', 'name', 'state_name', 'state_code', 'country_name', 'country_code']].rename(columns={'name': 'city'}), on='city_id', how='left')
+    shows_numbered['_sort_date'] = pd.to_datetime(shows_numbered['date'], errors='coerce')
+    # Same ordering as update_show_numbers(): date, then show_id
+    shows_numbered = shows_numbered.sort_values(['_sort_date', 'show_id'])
+    shows_numbered['show_number'] = range(1, len(shows_numbered) + 1)
+    performances_df = setlists_df.merge(
+        shows_numbered[['show_id', 'date', 'show_number', 'tour', 'venue', 'city', 'state_name', 'state_code', 'country_name', 'country_code']],
+        on='show_id', how='inner'
+    ).merge(songs_df[['song_id', 'title', 'album', 'is_outtake']], on='song_id', how='inner')
+    performances_df = performances_df.rename(columns={'date': 'show_date', 'title': 'song_title'})
+    return performances_df
+
+def import_performances_by_partition(conn: psycopg2.extensions.connection, performances_df: pd.DataFrame, columns: Tuple[str, ...]) -> bool:
+    """COPYs performances rows straight into their era partitions (see performance_eras). Returns True on success."""
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT partition_name, start_date, end_date FROM performance_eras ORDER BY start_date;")
+        eras = cursor.fetchall()
+    except psycopg2.Error as e: logger.error(f"Could not read performance_eras: {e}"); conn.rollback(); return False
+    finally:
+        if cursor: cursor.close()
+
+    show_dates = pd.to_datetime(performances_df['show_date'], errors='coerce')
+    routed = pd.Series(False, index=performances_df.index)
+    for partition_name, start_date, end_date in eras:
+        in_era = (show_dates >= pd.Timestamp(start_date)) & (show_dates < pd.Timestamp(end_date))
+        routed |= in_era
+        if not bulk_import_via_copy(conn, performances_df[in_era], partition_name, columns): return False
+    if not bulk_import_via_copy(conn, performances_df[~routed], 'performances_default', columns): return False
+
+    cursor = None
+    try:
+        cursor = conn.cursor(); cursor.execute("ANALYZE performances;"); conn.commit()
+    except psycopg2.Error as e: logger.warning(f"ANALYZE performances failed: {e}"); conn.rollback()
+    finally:
+        if cursor: cursor.close()
+    return True
+
+def rebuild_similarity_index(conn: psycopg2.extensions.connection):
+    """Rebuilds and persists the MinHash/LSH setlist similarity index. Logs and continues on failure."""
+    try:
+        from setlist_similarity import rebuild_and_save
+        logger.info("Rebuilding setlist similarity index...")
+        rebuild_and_save(conn)
+    except Exception as e: logger.error(f"Failed to rebuild setlist similarity index: {e}"); conn.rollback()
+
+def bump_data_generation(conn: psycopg2.extensions.connection):
+    """Increments the data generation counter so the web app drops its cached query results."""
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT bump_data_generation();")
+        generation = cursor.fetchone()[0]
+        conn.notices.clear(); conn.commit()
+        logger.info(f"Data generation bumped to {generation}.")
+    except psycopg2.Error as e: logger.error(f"Failed to bump data generation: {e}"); conn.rollback()
+    finally:
+        if cursor: cursor.close()
+
 # --- Main Execution ---
 # MODIFIED: Removed clear_tables argument, clearing is now automatic
 def populate_database():
@@ -148,27 +226,38 @@ def populate_database():
             shows_file = OUTPUT_PATH / SHOWS_OUTPUT_FILENAME
             songs_file = OUTPUT_PATH / SONGS_OUTPUT_FILENAME
             setlists_file = OUTPUT_PATH / SETLISTS_OUTPUT_FILENAME
-            required_files = [shows_file, songs_file, setlists_file]
+            tours_file = OUTPUT_PATH / TOURS_OUTPUT_FILENAME
+            venues_file = OUTPUT_PATH / VENUES_OUTPUT_FILENAME
+            cities_file = OUTPUT_PATH / CITIES_OUTPUT_FILENAME
+            required_files = [shows_file, songs_file, setlists_file, tours_file, venues_file, cities_file]
             if not all(f.exists() for f in required_files):
                  missing = [f.name for f in required_files if not f.exists()]
                  raise FileNotFoundError(f"Required CSV file(s) not found in {OUTPUT_PATH}: {', '.join(missing)}")
             shows_df = pd.read_csv(shows_file, encoding='utf-8-sig', keep_default_na=False)
             songs_df = pd.read_csv(songs_file, encoding='utf-8-sig', keep_default_na=False)
             setlists_df = pd.read_csv(setlists_file, encoding='utf-8-sig', keep_default_na=False)
-            logger.info(f"Loaded {len(shows_df)} shows, {len(songs_df)} songs, {len(setlists_df)} setlist entries.")
+            tours_df = pd.read_csv(tours_file, encoding='utf-8-sig', keep_default_na=False)
+            venues_df = pd.read_csv(venues_file, encoding='utf-8-sig', keep_default_na=False)
+            cities_df = pd.read_csv(cities_file, encoding='utf-8-sig', keep_default_na=False)
+            logger.info(f"Loaded {len(shows_df)} shows, {len(songs_df)} songs, {len(setlists_df)} setlist entries, "
+                        f"{len(tours_df)} tours, {len(venues_df)} venues, {len(cities_df)} cities.")
 
             logger.info("Preparing DataFrames for database import...")
             # Prep logic unchanged...
             songs_df['song_id'] = songs_df['song_id'].astype(int)
             songs_df['is_outtake'] = songs_df['is_outtake'].astype(bool)
             for col in ['title', 'album']: songs_df[col] = songs_df[col].astype(str)
-            shows_copy_cols_list = ['show_id', 'date', 'tour', 'venue', 'city', 'state_name', 'state_code', 'country_name', 'country_code', 'show_notes']
+            for dim_df, id_col in ((tours_df, 'tour_id'), (venues_df, 'venue_id'), (cities_df, 'city_id')):
+                 dim_df[id_col] = dim_df[id_col].astype(int)
+                 dim_df['name'] = dim_df['name'].astype(str)
+                 dim_df['show_count'] = pd.to_numeric(dim_df['show_count'], errors='coerce').fillna(0).astype(int)
+            venues_df['city_id'] = venues_df['city_id'].astype(int)
+            for col in ['state_name', 'state_code', 'country_name', 'country_code']: cities_df[col] = cities_df[col].astype(str)
             shows_df['show_id'] = shows_df['show_id'].astype(int)
             shows_df['date'] = pd.to_datetime(shows_df['date'], errors='coerce').dt.strftime('%Y-%m-%d')
-            for col in shows_copy_cols_list:
-                 if col == 'show_id' or col == 'date': continue
-                 if col in shows_df.columns: shows_df[col] = shows_df[col].astype(str)
-                 else: logger.warning(f"Column '{col}' missing in shows_df, adding empty."); shows_df[col] = ""
+            for col in ['tour_id', 'venue_id', 'city_id']: shows_df[col] = shows_df[col].astype(int)
+            if 'show_notes' in shows_df.columns: shows_df['show_notes'] = shows_df['show_notes'].astype(str)
+            else: logger.warning("Column 'show_notes' missing in shows_df, adding empty."); shows_df['show_notes'] = ""
             setlists_df['setlist_entry_id'] = setlists_df['setlist_entry_id'].astype(int)
             setlists_df['show_id'] = setlists_df['show_id'].astype(int)
             setlists_df['song_id'] = setlists_df['song_id'].astype(int)
@@ -190,6 +279,10 @@ def populate_database():
             cursor.execute("TRUNCATE TABLE shows RESTART IDENTITY CASCADE;")
             logger.info(" Clearing songs...")
             cursor.execute("TRUNCATE TABLE songs RESTART IDENTITY CASCADE;")
+            logger.info(" Clearing tours, venues and cities...")
+            cursor.execute("TRUNCATE TABLE tours, venues, cities RESTART IDENTITY CASCADE;")
+            logger.info(" Clearing performances...")
+            cursor.execute("TRUNCATE TABLE performances;")
             conn.commit(); logger.info("Tables cleared.")
         except psycopg2.Error as e: logger.error(f"Error clearing tables: {e}"); conn.rollback(); logger.critical("Failed to clear tables. Exiting."); sys.exit(1)
         finally:
@@ -198,20 +291,36 @@ def populate_database():
 
         # Define columns for COPY
         songs_copy_cols = ('song_id', 'title', 'album', 'is_outtake')
-        shows_copy_cols = ('show_id', 'date', 'tour', 'venue', 'city',
-                           'state_name', 'state_code', 'country_name', 'country_code',
-                           'show_notes')
+        tours_copy_cols = ('tour_id', 'name', 'first_show_date', 'last_show_date', 'show_count')
+        cities_copy_cols = ('city_id', 'name', 'state_name', 'state_code', 'country_name', 'country_code',
+                            'first_show_date', 'last_show_date', 'show_count')
+        venues_copy_cols = ('venue_id', 'name', 'city_id', 'first_show_date', 'last_show_date', 'show_count')
+        shows_copy_cols = ('show_id', 'date', 'tour_id', 'venue_id', 'city_id', 'show_notes')
         setlists_copy_cols = ('setlist_entry_id', 'show_id', 'song_id', 'position', 'notes')
+        performances_copy_cols = ('setlist_entry_id', 'show_id', 'song_id', 'show_date', 'show_number',
+                                  'tour', 'venue', 'city', 'state_name', 'state_code', 'country_name', 'country_code',
+                                  'song_title', 'album', 'is_outtake', 'position', 'notes')
 
         logger.info("Starting data import...")
         if not bulk_import_via_copy(conn, songs_df, 'songs', songs_copy_cols): sys.exit(1)
+        if not bulk_import_via_copy(conn, tours_df, 'tours', tours_copy_cols): sys.exit(1)
+        if not bulk_import_via_copy(conn, cities_df, 'cities', cities_copy_cols): sys.exit(1)
+        if not bulk_import_via_copy(conn, venues_df, 'venues', venues_copy_cols): sys.exit(1)
         if not bulk_import_via_copy(conn, shows_df, 'shows', shows_copy_cols): sys.exit(1)
         if not bulk_import_via_copy(conn, setlists_df, 'setlists', setlists_copy_cols): sys.exit(1)
+        logger.info("Importing denormalized performances into era partitions...")
+        if not import_performances_by_partition(conn, build_performances_df(shows_df, songs_df, setlists_df, tours_df, venues_df, cities_df), performances_copy_cols): sys.exit(1)
         logger.info("Data import completed successfully.")
 
         # Update statistics
         update_statistics(conn)
 
+        # Rebuild derived in-memory indexes (non-fatal: the database itself is complete)
+        rebuild_similarity_index(conn)
+
+        # Last step, once every derived table and index is in place
+        bump_data_generation(conn)
+
         logger.info("--- Database Population Complete ---")
 
     except psycopg2.Error as e: logger.error(f"Database connection error: {e}"); sys.exit(1)
@@ -0,0 +1,134 @@
+# prompt_builder.py
+# Builds the compact schema digest pasted into NL->SQL prompts instead of the
+# raw schema.sql (which also carries DROP statements, index DDL and the
+# PL/pgSQL bodies of maintenance functions the model must never call).
+# The digest is read from the live catalog: tables and views with their
+# columns, types, keys and one-line notes (from COMMENT ON), plus the
+# signatures of documented set-returning functions the model may call.
+
+import re
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+_INTERNAL_TABLES = {'data_generation'} # Bookkeeping only; never useful in an answer
+_NOTE_MAX_CHARS = 240
+_TYPE_ABBREVIATIONS = [
+    (re.compile(r"^character varying(\(\d+\))?$"), "varchar"),
+    (re.compile(r"^character(\(\d+\))?$"), "char"),
+    (re.compile(r"^timestamp(\(\d+\))? without time zone$"), "timestamp"),
+    (re.compile(r"^timestamp(\(\d+\))? with time zone$"), "timestamptz"),
+    (re.compile(r"^integer$"), "int"),
+    (re.compile(r"^boolean$"), "bool"),
+    (re.compile(r"^double precision$"), "float8"),
+]
+
+_RELATIONS_SQL = """
+    SELECT c.oid, c.relname, c.relkind, obj_description(c.oid, 'pg_class')
+    FROM pg_class c
+    WHERE c.relnamespace = 'public'::regnamespace AND c.relkind IN ('r', 'p', 'v', 'm') AND NOT c.relispartition
+    ORDER BY c.relname;"""
+_COLUMNS_SQL = """
+    SELECT a.attrelid, a.attname, format_type(a.atttypid, a.atttypmod), col_description(a.attrelid, a.attnum)
+    FROM pg_attribute a JOIN pg_class c ON c.oid = a.attrelid
+    WHERE c.relnamespace = 'public'::regnamespace AND a.attnum > 0 AND NOT a.attisdropped
+    ORDER BY a.attrelid, a.attnum;"""
+_KEYS_SQL = """
+    SELECT con.conrelid, con.contype,
+           ARRAY(SELECT a.attname FROM unnest(con.conkey) WITH ORDINALITY k(attnum, i)
+                 JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum ORDER BY k.i),
+           con.confrelid::regclass::text,
+           ARRAY(SELECT a.attname FROM unnest(con.confkey) WITH ORDINALITY k(attnum, i)
+                 JOIN pg_attribute a ON a.attrelid = con.confrelid AND a.attnum = k.attnum ORDER BY k.i)
+    FROM pg_constraint con
+    WHERE con.connamespace = 'public'::regnamespace AND con.contype IN ('p', 'f');"""
+# Documented set-returning functions are the query helpers; void/counter functions are load-time maintenance
+_FUNCTIONS_SQL = """
+    SELECT p.proname, pg_get_function_arguments(p.oid), pg_get_function_result(p.oid), obj_description(p.oid, 'pg_proc')
+    FROM pg_proc p
+    WHERE p.pronamespace = 'public'::regnamespace AND p.proretset AND obj_description(p.oid, 'pg_proc') IS NOT NULL
+    ORDER BY p.proname;"""
+
+
+def short_type(type_name: str) -> str:
+    for pattern, short in _TYPE_ABBREVIATIONS:
+        if pattern.match(type_name): return short
+    return type_name
+
+
+def _note(text: Optional[str]) -> str:
+    text = ' '.join((text or '').split())
+    return text if len(text) <= _NOTE_MAX_CHARS else text[:_NOTE_MAX_CHARS - 3].rstrip() + '...'
+
+
+def build_schema_digest(cursor) -> str:
+    """Reads the public schema from the catalog and returns the compact prompt digest."""
+    cursor.execute(_RELATIONS_SQL)
+    relations = [row for row in cursor.fetchall() if row[1] not in _INTERNAL_TABLES]
+    cursor.execute(_COLUMNS_SQL)
+    columns: Dict[int, List[tuple]] = defaultdict(list)
+    for relid, name, type_name, comment in cursor.fetchall(): columns[relid].append((name, type_name, comment))
+    cursor.execute(_KEYS_SQL)
+    primary_keys: Dict[int, List[str]] = {}
+    foreign_keys: Dict[int, Dict[str, str]] = defaultdict(dict)
+    for relid, kind, cols, ref_table, ref_cols in cursor.fetchall():
+        if kind == 'p': primary_keys[relid] = cols
+        else:
+            for col, ref_col in zip(cols, ref_cols): foreign_keys[relid][col] = f"{ref_table}.{ref_col}"
+    cursor.execute(_FUNCTIONS_SQL)
+    functions = cursor.fetchall()
+
+    lines = ["Format: TABLE/VIEW name -- purpose; then 'column type' list (PK = primary key, -> = references);",
+             "then notes on specific columns. Only the functions listed at the end may be called.", ""]
+    kind_labels = {'r': 'TABLE', 'p': 'TABLE', 'v': 'VIEW', 'm': 'MATERIALIZED VIEW'}
+    for relid, name, kind, comment in relations:
+        lines.append(f"{kind_labels[kind]} {name}" + (f" -- {_note(comment)}" if comment else ""))
+        pk = primary_keys.get(relid, [])
+        parts = []
+        for col, type_name, _ in columns[relid]:
+            part = f"{col} {short_type(type_name)}"
+            if pk == [col]: part += " PK"
+            if col in foreign_keys[relid]: part += f" -> {foreign_keys[relid][col]}"
+            parts.append(part)
+        lines.append("  " + ", ".join(parts))
+        if len(pk) > 1: lines.append(f"  PK ({', '.join(pk)})")
+        for col, _, col_comment in columns[relid]:
+            if col_comment: lines.append(f"  {col}: {_note(col_comment)}")
+    if functions:
+        lines += ["", "CALLABLE FUNCTIONS"]
+        for name, args, result, comment in functions:
+            lines.append(f"{name}({args}) RETURNS {result} -- {_note(comment)}")
+    return "\n".join(lines)
+
+
+class SchemaDigestCache:
+    """Holds the digest and rebuilds it when the key (the data generation, bumped after every schema load) changes."""
+
+    def __init__(self):
+        self._digest: Optional[str] = None
+        self._key: Any = object() # Sentinel so the first get() always builds
+        self._lock = threading.Lock()
+
+    def get(self, get_pool: Callable, key: Any) -> Optional[str]:
+        """
+        Returns the digest for key, or the last good digest (None if none could be built) if the DB is unavailable.
+        get_pool returns the connection pool; it is only called when the digest has to be built.
+        """
+        with self._lock:
+            if key == self._key: return self._digest
+            if key is None and self._digest is not None: return self._digest # Generation unknown; keep the last digest
+            try:
+                with get_pool().connection() as conn:
+                    with conn.cursor() as cursor: digest = build_schema_digest(cursor)
+                if digest != self._digest and self._digest is not None: logger.info("Schema changed; rebuilt prompt schema digest.")
+                self._digest = digest
+                logger.info(f"Built prompt schema digest ({len(digest)} chars).")
+            except psycopg2.Error as e:
+                logger.warning(f"Could not build schema digest: {e}")
+            self._key = key # Failed builds are retried only when the key changes
+            return self._digest
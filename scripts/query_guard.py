@@ -0,0 +1,101 @@
+# query_guard.py
+# Pre-execution checks for user/LLM-supplied SQL run by /query.
+# Every query must be a single SELECT/WITH statement. Before it runs, the
+# transaction is made read-only with a statement_timeout, a LIMIT is added if
+# the query has none, and EXPLAIN (FORMAT JSON) is used to reject queries whose
+# estimated cost is too high (e.g. an accidental cross join).
+
+import re
+import json
+from typing import Any, Dict, List, Tuple
+
+# Quoted text and comments, so keywords, parentheses and semicolons inside them are ignored
+_QUOTED_OR_COMMENT_RE = re.compile(r"""
+    '(?:[^']|'')*'
+  | "(?:[^"]|"")*"
+  | \$(?P<tag>[A-Za-z_]*)\$.*?\$(?P=tag)\$
+  | (?P<comment>--[^\n]*|/\*.*?\*/)
+""", re.VERBOSE | re.DOTALL)
+_TOKEN_RE = re.compile(r"[()]|[A-Za-z0-9_][A-Za-z0-9_$]*")
+
+
+class QueryRejected(ValueError):
+    """Raised when a query is not allowed to run; the message is shown to the user."""
+
+
+def _mask(sql: str) -> str:
+    """Same-length copy of sql with comments blanked and quoted text replaced by underscores."""
+    def blank(match):
+        text = match.group(0)
+        return ' ' * len(text) if match.group('comment') else '_' * len(text)
+    return _QUOTED_OR_COMMENT_RE.sub(blank, sql)
+
+
+def _top_level_words(masked: str) -> List[str]:
+    """Upper-cased words outside any parentheses (subqueries, CTE bodies, function calls)."""
+    depth, words = 0, []
+    for token in _TOKEN_RE.findall(masked):
+        if token == '(': depth += 1
+        elif token == ')': depth -= 1
+        elif depth == 0: words.append(token.upper())
+    return words
+
+
+def prepare_statement(sql_query: str) -> Tuple[str, bool]:
+    """
+    Validates that sql_query is one SELECT/WITH statement. Returns (statement without the trailing
+    semicolon, has_top_level_limit). Raises QueryRejected.
+    """
+    masked = _mask(sql_query)
+    end = masked.find(';')
+    if end >= 0:
+        if masked[end:].strip('; \t\r\n'): raise QueryRejected("Only one statement per query is allowed.")
+        sql_query, masked = sql_query[:end], masked[:end]
+    words = _top_level_words(masked)
+    if not words or words[0] not in ("SELECT", "WITH"): raise QueryRejected("Only SELECT queries allowed.")
+    if "INTO" in words: raise QueryRejected("SELECT ... INTO is not allowed.")
+    has_limit = any((word == "LIMIT" and nxt != "ALL") or (word == "FETCH" and nxt in ("FIRST", "NEXT"))
+                    for word, nxt in zip(words, words[1:] + [""]))
+    return sql_query.rstrip(), has_limit
+
+
+def explain_estimate(cursor, sql_query: str) -> Tuple[float, int]:
+    """(total cost, row estimate) of the top plan node. Raises psycopg2.Error if the query is invalid."""
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {sql_query}")
+    plan = cursor.fetchone()[0]
+    plan = (plan if isinstance(plan, list) else json.loads(plan))[0]['Plan']
+    return float(plan['Total Cost']), int(plan['Plan Rows'])
+
+
+class QueryGuard:
+    """Applies the read-only transaction, timeout, row limit and cost ceiling to a query before it runs."""
+
+    def __init__(self, max_cost: float, row_limit: int, statement_timeout_ms: int):
+        self.max_cost = max_cost
+        self.row_limit = row_limit
+        self.statement_timeout_ms = statement_timeout_ms
+
+    def check(self, cursor, sql_query: str) -> Tuple[str, Dict[str, Any]]:
+        """
+        Must run first in the transaction that will execute the query. Returns (sql to execute,
+        guard info) or raises QueryRejected (too expensive) / psycopg2.Error (invalid SQL).
+        """
+        statement, has_limit = prepare_statement(sql_query)
+        # Session defaults already do this on pooled connections; setting it per transaction keeps
+        # the guarantee even if those were overridden (e.g. by a connection bouncer)
+        cursor.execute("SET TRANSACTION READ ONLY;")
+        cursor.execute("SET LOCAL statement_timeout = %s;", (self.statement_timeout_ms,))
+
+        limit_applied = None
+        if not has_limit:
+            statement, limit_applied = f"{statement}\nLIMIT {self.row_limit}", self.row_limit
+        cost, rows = explain_estimate(cursor, statement)
+        if has_limit and rows > self.row_limit:
+            # An explicit LIMIT larger than the cap: cap the outer result instead
+            statement = f"SELECT * FROM (\n{statement}\n) AS limited_result LIMIT {self.row_limit}"
+            limit_applied = self.row_limit
+            cost, rows = explain_estimate(cursor, statement)
+        if cost > self.max_cost:
+            raise QueryRejected(f"Query rejected: estimated cost {cost:,.0f} exceeds the limit of {self.max_cost:,.0f}. "
+                                "Add filters or aggregate before joining.")
+        return statement, {"estimated_cost": round(cost, 2), "estimated_rows": rows, "limit_applied": limit_applied}
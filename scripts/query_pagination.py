@@ -0,0 +1,209 @@
+# query_pagination.py
+# Paginated /query results backed by named (server-side) cursors.
+# The first page is returned immediately; if more rows remain, the cursor and
+# its pooled connection stay open under a continuation token until the client
+# fetches the rest, the cursor sits idle too long, or it is evicted.
+
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import psycopg2
+
+from request_metrics import span
+
+logger = logging.getLogger(__name__)
+
+
+class CursorSession:
+    """One open server-side cursor plus the pooled connection it lives on."""
+
+    def __init__(self, token: str, conn, cursor, columns: List[str], sql: str, row_estimate: Optional[int]):
+        self.token = token
+        self.conn = conn
+        self.cursor = cursor
+        self.columns = columns
+        self.type_codes: List[Optional[int]] = [] # PostgreSQL type OIDs, used to pick JSON converters
+        self.sql = sql
+        self.row_estimate = row_estimate
+        self.guard_info: Optional[Dict[str, Any]] = None # Cost/row estimates and applied LIMIT from the QueryGuard
+        self.rows_fetched = 0
+        self.pending: List[tuple] = [] # Look-ahead row(s) read to detect whether another page exists
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock() # Held while the cursor is read or closed
+        self.closed = False
+
+
+def estimate_rows(cursor, sql_query: str) -> Optional[int]:
+    """Planner row estimate for the query (cheap: EXPLAIN without ANALYZE)."""
+    try:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql_query}")
+        plan = cursor.fetchone()[0]
+        plan = plan if isinstance(plan, list) else json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    except (psycopg2.Error, KeyError, IndexError, TypeError, ValueError) as e:
+        logger.debug(f"Row estimate unavailable: {e}")
+        return None
+
+
+class CursorRegistry:
+    """Opens paginated queries and serves their later pages by continuation token."""
+
+    def __init__(self, pool, max_open: int, idle_seconds: float, guard=None):
+        self.pool = pool
+        self.guard = guard # Optional QueryGuard run before each query is opened
+        self.max_open = max_open
+        self.idle_seconds = idle_seconds
+        self._sessions: "OrderedDict[str, CursorSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"opened": 0, "completed": 0, "expired": 0, "evicted": 0}
+
+    # --- Session lifecycle ---
+    def _close(self, session: CursorSession, reason: str):
+        """Closes the cursor and returns its connection (once); the caller holds session.lock."""
+        if session.closed: return
+        session.closed = True
+        try: session.cursor.close()
+        except psycopg2.Error: pass
+        self.pool.putconn(session.conn) # Rolls back the cursor's transaction
+        with self._lock: self._stats[reason] += 1
+        logger.info(f"Closed cursor {session.token[:8]} ({reason}) after {session.rows_fetched} rows.")
+
+    def expire_idle(self):
+        """Closes cursors that have not been read for idle_seconds."""
+        now = time.monotonic()
+        with self._lock:
+            stale = [s for s in self._sessions.values() if now - s.last_used > self.idle_seconds and not s.lock.locked()]
+            for session in stale: del self._sessions[session.token]
+        for session in stale:
+            with session.lock: self._close(session, "expired")
+
+    def _register(self, session: CursorSession):
+        evicted = []
+        with self._lock:
+            self._sessions[session.token] = session
+            excess = len(self._sessions) - self.max_open
+            if excess > 0:
+                # Least recently used first; cursors being read right now are skipped, as in expire_idle
+                evicted = [s for s in self._sessions.values() if s is not session and not s.lock.locked()][:excess]
+                for old in evicted: del self._sessions[old.token]
+        for old in evicted:
+            with old.lock: self._close(old, "evicted")
+
+    # --- Paging ---
+    def _read_page(self, session: CursorSession, page_size: int) -> Tuple[List[tuple], bool]:
+        with span("db_fetch"): rows = session.pending + session.cursor.fetchmany(page_size + 1 - len(session.pending))
+        session.pending = rows[page_size:]
+        rows = rows[:page_size]
+        session.rows_fetched += len(rows)
+        session.last_used = time.monotonic()
+        return rows, bool(session.pending)
+
+    def _page_result(self, session: CursorSession, rows: List[tuple], has_more: bool, page_size: int) -> Dict[str, Any]:
+        limit = (session.guard_info or {}).get("limit_applied")
+        note = " (more available)." if has_more else "."
+        if not has_more and limit and session.rows_fetched >= limit: note = f" (stopped at the {limit}-row limit)."
+        return {
+            "columns": session.columns, "data": rows, "error": None,
+            "message": f"Success. Fetched {session.rows_fetched} rows" + note,
+            "page_size": page_size, "rows_fetched": session.rows_fetched, "has_more": has_more,
+            "continuation": session.token if has_more else None,
+            "row_estimate": session.row_estimate if has_more else session.rows_fetched,
+            "guard": session.guard_info,
+        }
+
+    def open(self, sql_query: str, page_size: int) -> Tuple[Dict[str, Any], List[Optional[int]]]:
+        """
+        Executes the query through a named cursor; returns (first page, column type codes).
+        Raises psycopg2.Error, or QueryRejected if the guard refuses the query.
+        """
+        self.expire_idle()
+        with span("db_connect"): conn = self.pool.getconn()
+        token = uuid.uuid4().hex
+        try:
+            guard_info, run_sql = None, sql_query
+            if self.guard:
+                with span("query_guard"), conn.cursor() as plain_cursor: run_sql, guard_info = self.guard.check(plain_cursor, sql_query)
+            cursor = conn.cursor(name=f"page_{token}")
+            cursor.itersize = page_size
+            with span("db_execute"): cursor.execute(run_sql)
+            session = CursorSession(token, conn, cursor, [], sql_query, None)
+            session.guard_info = guard_info
+            rows, has_more = self._read_page(session, page_size)
+            session.columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            session.type_codes = [desc[1] for desc in cursor.description] if cursor.description else []
+        except BaseException:
+            self.pool.putconn(conn)
+            raise
+        with self._lock: self._stats["opened"] += 1
+        if not has_more:
+            with session.lock: self._close(session, "completed")
+            return self._page_result(session, rows, False, page_size), session.type_codes
+        if guard_info:
+            session.row_estimate = guard_info["estimated_rows"] # The guard already ran EXPLAIN on the executed SQL
+        else:
+            # Only queries with more than one page pay for the estimate (same transaction, so it's consistent)
+            with conn.cursor() as plain_cursor: session.row_estimate = estimate_rows(plain_cursor, sql_query)
+        self._register(session)
+        return self._page_result(session, rows, True, page_size), session.type_codes
+
+    def fetch(self, token: str, page_size: int) -> Tuple[Dict[str, Any], List[Optional[int]]]:
+        """Returns (next page, column type codes) for a continuation token. Raises KeyError if it expired or is unknown."""
+        self.expire_idle()
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None: raise KeyError(token)
+            self._sessions.move_to_end(token)
+        with session.lock:
+            if session.closed: raise KeyError(token) # Evicted or expired after the lookup
+            try:
+                rows, has_more = self._read_page(session, page_size)
+            except psycopg2.Error:
+                with self._lock: self._sessions.pop(token, None)
+                self._close(session, "completed")
+                raise
+            if not has_more:
+                with self._lock: self._sessions.pop(token, None)
+                self._close(session, "completed")
+        return self._page_result(session, rows, has_more, page_size), session.type_codes
+
+    def cancel(self, token: str) -> bool:
+        with self._lock: session = self._sessions.pop(token, None)
+        if session is None: return False
+        with session.lock: self._close(session, "completed")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            result = dict(self._stats)
+            result.update(open=len(self._sessions), max_open=self.max_open, idle_seconds=self.idle_seconds)
+        return result
+
+
+def iter_query_chunks(pool, sql_query: str, chunk_rows: int, guard=None):
+    """
+    Runs a query through a named cursor (after the optional QueryGuard) and yields
+    (columns, type_codes, rows, guard_info) chunks until exhausted.
+    The pooled connection is held only while the generator is being consumed.
+    """
+    with span("db_connect"): conn = pool.getconn()
+    try:
+        guard_info = None
+        if guard:
+            with span("query_guard"), conn.cursor() as plain_cursor: sql_query, guard_info = guard.check(plain_cursor, sql_query)
+        with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cursor:
+            cursor.itersize = chunk_rows
+            with span("db_execute"): cursor.execute(sql_query)
+            with span("db_fetch"): rows = cursor.fetchmany(chunk_rows)
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            type_codes = [desc[1] for desc in cursor.description] if cursor.description else []
+            while True:
+                yield columns, type_codes, rows, guard_info
+                if len(rows) < chunk_rows: break
+                with span("db_fetch"): rows = cursor.fetchmany(chunk_rows)
+    finally:
+        pool.putconn(conn)
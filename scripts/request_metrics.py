@@ -0,0 +1,192 @@
+# request_metrics.py
+# Per-request timing spans and Prometheus-style metrics for app.py.
+# Each request gets a trace (thread-local); code wraps its phases in
+# `with span("phase"):` and the durations go both into the trace (for the
+# Server-Timing header and the slow-request log) and into a histogram per phase.
+# Counters and histograms are kept in memory and rendered in the Prometheus
+# text exposition format by the /metrics endpoint (no client library needed).
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra: parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonic counter with a fixed set of label names."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name, self.help_text, self.label_names = name, help_text, label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock: self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock: values = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in values]
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram (plus sum and count) with a fixed set of label names."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name, self.help_text, self.label_names = name, help_text, label_names
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {} # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound: series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock: series = sorted((key, list(values)) for key, values in self._series.items())
+        inf = 'le="+Inf"'
+        for key, values in series:
+            for bound, count in zip(self.buckets, values):
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {count}")
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, key, inf)} {values[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(round(values[-2], 6))}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {values[-1]}")
+        return lines
+
+
+class Gauge:
+    """
+    Value read from a callback at scrape time (None = not available yet, omitted). metric_type='counter'
+    exposes a running total kept elsewhere (e.g. the pool's wait time) as a counter.
+    """
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], Optional[float]], metric_type: str = "gauge"):
+        self.name, self.help_text, self.read, self.metric_type = name, help_text, read, metric_type
+
+    def render(self) -> List[str]:
+        try: value = self.read()
+        except Exception as e:
+            logger.warning(f"Gauge {self.name} unavailable: {e}")
+            value = None
+        if value is None: return []
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}", f"{self.name} {_number(value)}"]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(name, help_text, label_names))
+
+    def histogram(self, name: str, help_text: str, label_names: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help_text, label_names, buckets))
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], Optional[float]], metric_type: str = "gauge") -> Gauge:
+        return self._add(Gauge(name, help_text, read, metric_type))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics: lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+# --- Metrics shared by app.py and the query helpers ---
+metrics = MetricsRegistry()
+request_seconds = metrics.histogram("app_request_duration_seconds", "Time to produce the response (streamed bodies excluded).",
+                                    ("route", "method", "status"))
+phase_seconds = metrics.histogram("app_phase_duration_seconds", "Time spent in each traced phase of a request.", ("phase",))
+llm_tokens = metrics.counter("app_llm_tokens_total", "Gemini tokens used, by prompt or response.", ("kind",))
+cache_lookups = metrics.counter("app_cache_lookups_total", "Cache and fast-path lookups by outcome.", ("cache", "result"))
+query_rows = metrics.counter("app_query_rows_total", "Rows returned to clients by /query and /ask_and_run.", ("format",))
+errors = metrics.counter("app_errors_total", "Errors returned to clients, by type.", ("type",))
+sql_validations = metrics.counter("app_sql_validations_total", "Generated SQL checked with EXPLAIN before it is returned, by outcome.", ("result",))
+
+
+# --- Request tracing ---
+class RequestTrace:
+    """Phase durations of one request, in the order they finished."""
+
+    def __init__(self, route: str, method: str):
+        self.route, self.method = route, method
+        self.start = time.perf_counter()
+        self.spans: List[Tuple[str, float]] = []
+        self.elapsed: Optional[float] = None # Set when the trace finishes
+
+    def server_timing(self) -> str:
+        """Server-Timing header value (durations in milliseconds, as browsers' dev tools expect)."""
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.spans]
+        total = self.elapsed if self.elapsed is not None else time.perf_counter() - self.start
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_local = threading.local()
+
+
+def start_trace(route: str, method: str) -> RequestTrace:
+    _local.trace = RequestTrace(route, method)
+    return _local.trace
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return getattr(_local, 'trace', None)
+
+
+def finish_trace(status: int, slow_seconds: Optional[float] = None) -> Optional[RequestTrace]:
+    """Records the request duration and logs slow requests with their span breakdown; returns the finished trace."""
+    trace = current_trace()
+    if trace is None: return None
+    _local.trace = None
+    elapsed = trace.elapsed = time.perf_counter() - trace.start
+    request_seconds.observe(elapsed, route=trace.route, method=trace.method, status=status)
+    if slow_seconds is not None and elapsed >= slow_seconds:
+        breakdown = ", ".join(f"{name}={seconds:.3f}s" for name, seconds in trace.spans) or "no spans"
+        logger.warning(f"Slow request {trace.method} {trace.route} -> {status} in {elapsed:.3f}s ({breakdown})")
+    return trace
+
+
+@contextmanager
+def span(phase: str):
+    """Times the enclosed block as one phase of the current request (also outside requests, e.g. in streamed bodies)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        phase_seconds.observe(elapsed, phase=phase)
+        trace = current_trace()
+        if trace is not None: trace.spans.append((phase, elapsed))
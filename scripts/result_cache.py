@@ -0,0 +1,138 @@
+# result_cache.py
+# In-process LRU cache for /query results with a TTL and a total byte cap.
+# Keys are comment/whitespace-normalized SQL; the whole cache is dropped when
+# the database's data generation (bumped by populate_database) changes. Queries
+# that read the clock or random() are not cached (see is_volatile).
+
+import re
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Quoted literals/identifiers are kept verbatim; comments are dropped; whitespace runs collapse
+_SQL_TOKEN_RE = re.compile(r"""
+    (?P<string>'(?:[^']|'')*')
+  | (?P<ident>"(?:[^"]|"")*")
+  | (?P<dollar>\$(?P<tag>[A-Za-z_]*)\$.*?\$(?P=tag)\$)
+  | (?P<line_comment>--[^\n]*)
+  | (?P<block_comment>/\*.*?\*/)
+  | (?P<space>\s+)
+""", re.VERBOSE | re.DOTALL)
+
+# Functions whose result changes without a data generation bump
+_VOLATILE_RE = re.compile(r"""\b(?:current_date|current_time|current_timestamp|localtime|localtimestamp
+    |(?:now|random|clock_timestamp|statement_timestamp|transaction_timestamp|timeofday|gen_random_uuid)\s*\()""",
+    re.IGNORECASE | re.VERBOSE)
+_RELATIVE_DATE_LITERALS = frozenset(('now', 'today', 'tomorrow', 'yesterday'))
+# A relative literal only means a date when typed: DATE 'today', 'today'::date, CAST('today' AS date)
+_DATE_TYPE = r"(?:date|time|timestamp|timestamptz|timestamp\s+with(?:out)?\s+time\s+zone)\b"
+_TYPED_BEFORE_RE = re.compile(r"\b(?:date|timestamp|timestamptz)\s*$", re.IGNORECASE)
+_TYPED_AFTER_RE = re.compile(r"\s*(?:::|\s+as\s+)\s*" + _DATE_TYPE, re.IGNORECASE)
+
+
+def normalize_sql(sql: str) -> str:
+    """Removes comments, collapses whitespace outside quotes and strips trailing semicolons."""
+    parts = []
+    pos = 0
+    for match in _SQL_TOKEN_RE.finditer(sql):
+        if match.start() > pos: parts.append(sql[pos:match.start()])
+        if match.lastgroup in ('string', 'ident', 'dollar'): parts.append(match.group(0))
+        elif not parts or parts[-1] != ' ': parts.append(' ') # Comments and whitespace act as one separator
+        pos = match.end()
+    parts.append(sql[pos:])
+    return ''.join(parts).strip().rstrip('; ')
+
+
+def is_volatile(sql: str) -> bool:
+    """True if the query's result depends on when it runs (now(), CURRENT_DATE, 'today', ...) or on random()."""
+    code, pos = [], 0
+    for match in _SQL_TOKEN_RE.finditer(sql):
+        code.append(sql[pos:match.start()])
+        if (match.lastgroup == 'string' and match.group(0)[1:-1].strip().lower() in _RELATIVE_DATE_LITERALS
+                and (_TYPED_BEFORE_RE.search(sql, 0, match.start()) or _TYPED_AFTER_RE.match(sql, match.end()))): return True
+        code.append(' ') # Only code outside literals and comments is searched
+        pos = match.end()
+    code.append(sql[pos:])
+    return bool(_VOLATILE_RE.search(''.join(code)))
+
+
+class QueryResultCache:
+    """Thread-safe LRU of serialized query results, bounded by entry count, total bytes and age."""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict() # (variant, sql) -> (value, size, stored_at)
+        self._bytes = 0
+        self._generation: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0,
+                       "expirations": 0, "invalidations": 0, "oversize_skips": 0}
+
+    def set_generation(self, generation: Optional[int]):
+        """Clears the cache if the data generation changed since the entries were stored."""
+        with self._lock:
+            if generation == self._generation: return
+            if self._entries:
+                logger.info(f"Data generation changed ({self._generation} -> {generation}); dropping {len(self._entries)} cached results.")
+                self._stats["invalidations"] += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._generation = generation
+
+    def get(self, sql: str, variant: str = "") -> Optional[str]:
+        """variant separates results of the same SQL fetched differently (e.g. page size)."""
+        key = (variant, normalize_sql(sql))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            value, size, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self._bytes -= size
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def put(self, sql: str, value: str, generation: Optional[int], variant: str = ""):
+        """Stores a result computed under the given data generation (ignored if the generation has moved on)."""
+        key = (variant, normalize_sql(sql))
+        size = len(value.encode('utf-8')) + len(key[1])
+        with self._lock:
+            if generation is None or generation != self._generation: return
+            if size > self.max_bytes:
+                self._stats["oversize_skips"] += 1
+                return
+            old = self._entries.pop(key, None)
+            if old is not None: self._bytes -= old[1]
+            self._entries[key] = (value, size, time.monotonic())
+            self._bytes += size
+            self._stats["stores"] += 1
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            result = dict(self._stats)
+            result.update(entries=len(self._entries), bytes=self._bytes, max_entries=self.max_entries,
+                          max_bytes=self.max_bytes, ttl_seconds=self.ttl_seconds, data_generation=self._generation)
+        lookups = result["hits"] + result["misses"]
+        result["hit_ratio"] = round(result["hits"] / lookups, 4) if lookups else 0.0
+        return result
@@ -0,0 +1,149 @@
+# result_encoding.py
+# Wire formats for /query results: row arrays (the original shape), columnar
+# JSON (one array per column) and NDJSON lines for streaming, plus gzip/br
+# compression negotiated from Accept-Encoding.
+# Values are converted a whole column at a time, picked by the column's
+# PostgreSQL type, instead of calling a json default= hook for every cell.
+
+import json
+import zlib
+import decimal
+from datetime import date, datetime, time, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import brotli # Optional dependency: enables Content-Encoding: br
+except ImportError:
+    brotli = None
+
+FORMATS = ('rows', 'columnar', 'ndjson')
+COMPRESSION_MIN_BYTES = 1024 # Smaller bodies are sent uncompressed
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 5
+
+# PostgreSQL type OIDs that need converting for JSON
+_DATE_TIME_OIDS = {1082, 1083, 1114, 1184, 1266} # date, time, timestamp, timestamptz, timetz
+_NUMERIC_OIDS = {1700}
+_INTERVAL_OIDS = {1186}
+
+
+def json_default(obj):
+    """Fallback for values the per-column converters don't cover (e.g. arrays of dates)."""
+    if isinstance(obj, (datetime, date, time)): return obj.isoformat()
+    if isinstance(obj, decimal.Decimal): return float(obj)
+    if isinstance(obj, timedelta): return str(obj)
+    raise TypeError(f"Type {type(obj)} not serializable")
+
+
+def _dictionary_converter(convert: Callable[[Any], Any]) -> Callable[[Sequence[Any]], List[Any]]:
+    """
+    Converts each distinct value once, then maps the whole column through the lookup table in C.
+    Result columns repeat values heavily (show dates, rounded numerics), so this beats per-cell calls.
+    """
+    def convert_column(values: Sequence[Any]) -> List[Any]:
+        lookup = {v: (convert(v) if v is not None else None) for v in set(values)}
+        return list(map(lookup.__getitem__, values))
+    return convert_column
+
+
+_CONVERTERS = {}
+for _oid in _DATE_TIME_OIDS: _CONVERTERS[_oid] = _dictionary_converter(lambda v: v.isoformat())
+for _oid in _NUMERIC_OIDS: _CONVERTERS[_oid] = _dictionary_converter(float)
+for _oid in _INTERVAL_OIDS: _CONVERTERS[_oid] = _dictionary_converter(str)
+
+
+def _column_converter(type_code: Optional[int]) -> Optional[Callable[[Sequence[Any]], List[Any]]]:
+    return _CONVERTERS.get(type_code) # None: JSON-native already (int, text, bool, float, json)
+
+
+def to_columns(rows: Sequence[tuple], type_codes: Sequence[Optional[int]]) -> List[List[Any]]:
+    """Transposes rows into per-column lists, converting each column in one pass."""
+    if not rows: return [[] for _ in type_codes]
+    columns = []
+    for values, type_code in zip(zip(*rows), type_codes):
+        converter = _column_converter(type_code)
+        columns.append(converter(values) if converter else list(values))
+    return columns
+
+
+def convert_rows(rows: Sequence[tuple], type_codes: Sequence[Optional[int]]) -> List[tuple]:
+    """Row arrays with JSON-ready values (column-wise conversion, then transposed back)."""
+    if not any(_column_converter(t) for t in type_codes): return list(rows)
+    return list(zip(*to_columns(rows, type_codes)))
+
+
+def encode_result(result: Dict[str, Any], type_codes: Sequence[Optional[int]], fmt: str = 'rows') -> str:
+    """Serializes a /query result dict ('data' holds raw rows) in the rows or columnar format."""
+    rows = result.pop('data')
+    if fmt == 'columnar':
+        result['format'] = 'columnar'
+        result['data_columns'] = to_columns(rows, type_codes)
+    else:
+        result['data'] = convert_rows(rows, type_codes)
+    return json.dumps(result, default=json_default, separators=(',', ':'))
+
+
+def iter_ndjson(header: Dict[str, Any], chunks: Iterable[Tuple[Sequence[tuple], Sequence[Optional[int]]]]) -> Iterator[str]:
+    """
+    Yields a header object line, one JSON array line per row (a chunk of rows at a time), then a
+    trailer object line: {"done": true, "rows_fetched": N}, or {"error": ...} if the query fails mid-stream.
+    """
+    yield json.dumps(header, default=json_default, separators=(',', ':')) + '\n'
+    dumps = json.JSONEncoder(default=json_default, separators=(',', ':')).encode
+    row_count = 0
+    try:
+        for rows, type_codes in chunks:
+            row_count += len(rows)
+            yield ''.join(dumps(row) + '\n' for row in convert_rows(rows, type_codes))
+    except Exception as e:
+        yield json.dumps({"error": str(e).split('\n')[0], "rows_fetched": row_count}) + '\n'
+        return
+    yield json.dumps({"done": True, "rows_fetched": row_count}) + '\n'
+
+
+# --- Compression ---
+def accepted_encodings(accept_encoding: Optional[str]) -> Dict[str, float]:
+    """Content codings of an Accept-Encoding header with their q-values (lower-cased names)."""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try: q = float(params.strip()[2:])
+            except ValueError: q = 0.0
+        if name: accepted[name.strip().lower()] = q
+    return accepted
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Picks 'br' (if the brotli module is installed) or 'gzip' from an Accept-Encoding header."""
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and accepted.get('br', 0) > 0: return 'br'
+    if accepted.get('gzip', 0) > 0 or accepted.get('*', 0) > 0: return 'gzip'
+    return None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """Compresses a whole body; returns (body, applied_encoding or None)."""
+    if not encoding or len(body) < COMPRESSION_MIN_BYTES: return body, None
+    if encoding == 'br': return brotli.compress(body, quality=BROTLI_QUALITY), 'br'
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) # wbits=31 -> gzip container
+    return compressor.compress(body) + compressor.flush(), 'gzip'
+
+
+def compress_stream(chunks: Iterable[str], encoding: Optional[str]) -> Iterator[bytes]:
+    """Compresses a streamed body chunk by chunk, flushing after each so the client can decode progressively."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            data = compressor.process(chunk.encode('utf-8')) + compressor.flush()
+            if data: yield data
+        yield compressor.finish()
+    elif encoding == 'gzip':
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode('utf-8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data: yield data
+        yield compressor.flush()
+    else:
+        for chunk in chunks: yield chunk.encode('utf-8')
@@ -7,7 +7,8 @@ import pandas as pd # Added for reading CSVs for summary
 
 # Import config for paths and filenames
 try:
-    from config import OUTPUT_PATH, SONGS_OUTPUT_FILENAME, SHOWS_OUTPUT_FILENAME, SETLISTS_OUTPUT_FILENAME
+    from config import (OUTPUT_PATH, SONGS_OUTPUT_FILENAME, SHOWS_OUTPUT_FILENAME, SETLISTS_OUTPUT_FILENAME,
+                        TOURS_OUTPUT_FILENAME, VENUES_OUTPUT_FILENAME, CITIES_OUTPUT_FILENAME)
 except ImportError:
     logging.warning("Could not import from config. Attempting relative path for OUTPUT_PATH.")
     SCRIPT_DIR_FOR_PATH = Path(__file__).resolve().parent
@@ -16,6 +17,9 @@ except ImportError:
     SONGS_OUTPUT_FILENAME = "songs.csv"
     SHOWS_OUTPUT_FILENAME = "shows.csv"
     SETLISTS_OUTPUT_FILENAME = "setlists.csv"
+    TOURS_OUTPUT_FILENAME = "tours.csv"
+    VENUES_OUTPUT_FILENAME = "venues.csv"
+    CITIES_OUTPUT_FILENAME = "cities.csv"
 
 
 # Set up logging
@@ -107,6 +111,14 @@ if __name__ == "__main__":
         except FileNotFoundError: logger.error(f"- Error: Could not find {shows_file}")
         except Exception as e: logger.error(f"- Error reading {shows_file}: {e}")
 
+        for label, filename in (("Tours", TOURS_OUTPUT_FILENAME), ("Venues", VENUES_OUTPUT_FILENAME), ("Cities", CITIES_OUTPUT_FILENAME)):
+            dimension_file = OUTPUT_PATH / filename
+            try:
+                dimension_df = pd.read_csv(dimension_file)
+                logger.info(f"- {label} ({filename}): {len(dimension_df)} entries")
+            except FileNotFoundError: logger.error(f"- Error: Could not find {dimension_file}")
+            except Exception as e: logger.error(f"- Error reading {dimension_file}: {e}")
+
         try:
             setlists_df = pd.read_csv(setlists_file)
             logger.info(f"- Setlist Entries ({SETLISTS_OUTPUT_FILENAME}): {len(setlists_df)} entries")
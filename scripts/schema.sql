@@ -1,7 +1,10 @@
 -- Springsteen Setlists Database Schema for PostgreSQL
--- Final Version: Includes detailed location, show notes, song count,
+-- Final Version: Includes tour/venue/city dimension tables, show notes, song count,
 -- and full definitions for all stored functions.
 
+-- Trigram matching for fuzzy lookups on titles, venues and cities
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- Drop existing functions and tables if they exist to ensure a clean setup
 -- Use CASCADE to handle dependencies automatically
 DROP FUNCTION IF EXISTS get_subset_song_stats(VARCHAR, DATE, DATE) CASCADE; -- Drop old name
@@ -10,9 +13,30 @@ DROP FUNCTION IF EXISTS get_stats_for_show_ids(INT[]) CASCADE; -- Drop new funct
 DROP FUNCTION IF EXISTS update_song_rarity_levels() CASCADE;
 DROP FUNCTION IF EXISTS update_song_play_counts() CASCADE;
 DROP FUNCTION IF EXISTS update_show_song_counts() CASCADE;
+DROP FUNCTION IF EXISTS rebuild_song_transitions() CASCADE;
+DROP FUNCTION IF EXISTS add_show_transitions(INT) CASCADE;
+DROP FUNCTION IF EXISTS update_show_numbers() CASCADE;
+DROP FUNCTION IF EXISTS rebuild_performance_gaps() CASCADE;
+DROP FUNCTION IF EXISTS add_show_gaps(INT) CASCADE;
+DROP FUNCTION IF EXISTS lookup_entities(TEXT, TEXT, INT) CASCADE;
+DROP FUNCTION IF EXISTS refresh_performances() CASCADE;
+DROP FUNCTION IF EXISTS update_dimension_stats() CASCADE;
+DROP FUNCTION IF EXISTS bump_data_generation() CASCADE;
 
+DROP TABLE IF EXISTS performances CASCADE;
+DROP TABLE IF EXISTS performance_eras CASCADE;
+DROP MATERIALIZED VIEW IF EXISTS song_timeline CASCADE;
+DROP VIEW IF EXISTS song_current_gaps CASCADE;
+DROP TABLE IF EXISTS song_gaps CASCADE;
+DROP TABLE IF EXISTS performance_gaps CASCADE;
+DROP TABLE IF EXISTS song_trigrams CASCADE;
+DROP TABLE IF EXISTS song_transitions CASCADE;
 DROP TABLE IF EXISTS setlists CASCADE;
+DROP VIEW IF EXISTS show_details CASCADE;
 DROP TABLE IF EXISTS shows CASCADE;
+DROP TABLE IF EXISTS venues CASCADE;
+DROP TABLE IF EXISTS cities CASCADE;
+DROP TABLE IF EXISTS tours CASCADE;
 DROP TABLE IF EXISTS songs CASCADE;
 
 -- Songs table
@@ -32,29 +56,82 @@ COMMENT ON COLUMN songs.times_played IS 'Total number of times the song appears
 COMMENT ON COLUMN songs.rarity_level IS 'Calculated logarithmic rarity score (1-100 scale, higher is more common globally). Null if not calculated or never played.';
 
 
--- Shows table
-CREATE TABLE shows (
-    show_id SERIAL PRIMARY KEY,
-    date DATE NOT NULL,
-    tour VARCHAR(255),
-    venue VARCHAR(255) NOT NULL,
-    city VARCHAR(100),
+-- Tours dimension table
+CREATE TABLE tours (
+    tour_id SERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL UNIQUE,
+    first_show_date DATE NULL,
+    last_show_date DATE NULL,
+    show_count INTEGER DEFAULT 0
+);
+COMMENT ON TABLE tours IS 'One row per tour with precomputed first/last show dates and show count. Use instead of aggregating shows.';
+COMMENT ON COLUMN tours.name IS 'Raw tour name from source data, or Year if missing.';
+
+
+-- Cities dimension table
+CREATE TABLE cities (
+    city_id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
     state_name VARCHAR(100) NULL,
     state_code VARCHAR(10) NULL,
     country_name VARCHAR(100) NULL,
     country_code VARCHAR(2) NULL,
+    first_show_date DATE NULL,
+    last_show_date DATE NULL,
+    show_count INTEGER DEFAULT 0
+);
+COMMENT ON TABLE cities IS 'One row per distinct city/state/country combination, with precomputed first/last show dates and show count.';
+COMMENT ON COLUMN cities.state_name IS 'State/Province name (e.g., New Jersey), if applicable.';
+COMMENT ON COLUMN cities.state_code IS 'State/Province code (e.g., NJ, CA), if applicable.';
+COMMENT ON COLUMN cities.country_name IS 'Country name (e.g., United States).';
+COMMENT ON COLUMN cities.country_code IS 'ISO 3166-1 alpha-2 country code (e.g., US, GB).';
+
+
+-- Venues dimension table
+CREATE TABLE venues (
+    venue_id SERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    city_id INTEGER NOT NULL REFERENCES cities(city_id) ON DELETE CASCADE,
+    first_show_date DATE NULL,
+    last_show_date DATE NULL,
+    show_count INTEGER DEFAULT 0,
+    CONSTRAINT venues_name_city_unique UNIQUE (name, city_id)
+);
+COMMENT ON TABLE venues IS 'One row per venue (name within a city), with precomputed first/last show dates and show count.';
+
+
+-- Shows table
+CREATE TABLE shows (
+    show_id SERIAL PRIMARY KEY,
+    date DATE NOT NULL,
+    tour_id INTEGER NOT NULL REFERENCES tours(tour_id),
+    venue_id INTEGER NOT NULL REFERENCES venues(venue_id),
+    city_id INTEGER NOT NULL REFERENCES cities(city_id),
     show_notes TEXT NULL,
     song_count INTEGER DEFAULT 0 NULL,
-    CONSTRAINT shows_date_venue_unique UNIQUE (date, venue)
+    show_number INTEGER NULL,
+    show_notes_tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', COALESCE(show_notes, ''))) STORED,
+    CONSTRAINT shows_date_venue_unique UNIQUE (date, venue_id)
 );
-COMMENT ON TABLE shows IS 'Stores information about each unique concert/show, including detailed location and song count.';
-COMMENT ON COLUMN shows.tour IS 'Raw tour name from source data, or Year if missing.';
-COMMENT ON COLUMN shows.state_name IS 'State/Province name (e.g., New Jersey), if applicable.';
-COMMENT ON COLUMN shows.state_code IS 'State/Province code (e.g., NJ, CA), if applicable.';
-COMMENT ON COLUMN shows.country_name IS 'Country name (e.g., United States).';
-COMMENT ON COLUMN shows.country_code IS 'ISO 3166-1 alpha-2 country code (e.g., US, GB).';
+COMMENT ON TABLE shows IS 'Stores information about each unique concert/show. Tour, venue and city are referenced by id; the show_details view joins their names back in.';
+COMMENT ON COLUMN shows.city_id IS 'City of the venue (same as venues.city_id), kept on shows for direct location filters.';
 COMMENT ON COLUMN shows.show_notes IS 'General notes pertaining to the entire show from setlist.fm.';
 COMMENT ON COLUMN shows.song_count IS 'Number of songs recorded in the setlist for this show (updated by function).';
+COMMENT ON COLUMN shows.show_notes_tsv IS 'Full-text search vector of show_notes. Query with show_notes_tsv @@ websearch_to_tsquery(''english'', ''...'') instead of ILIKE.';
+COMMENT ON COLUMN shows.show_number IS 'Chronological sequence number of the show across the whole career (1 = earliest; ties on date broken by show_id). Updated by function.';
+
+
+-- Shows joined with their tour, venue and city names
+CREATE VIEW show_details AS
+SELECT sh.show_id, sh.date, t.name AS tour, v.name AS venue, c.name AS city,
+       c.state_name, c.state_code, c.country_name, c.country_code,
+       sh.show_notes, sh.song_count, sh.show_number,
+       sh.tour_id, sh.venue_id, sh.city_id
+FROM shows sh
+JOIN tours t ON t.tour_id = sh.tour_id
+JOIN venues v ON v.venue_id = sh.venue_id
+JOIN cities c ON c.city_id = sh.city_id;
+COMMENT ON VIEW show_details IS 'One row per show with tour, venue, city, state and country names resolved from the dimension tables.';
 
 
 -- Setlists table
@@ -64,23 +141,214 @@ CREATE TABLE setlists (
     song_id INTEGER NOT NULL REFERENCES songs(song_id) ON DELETE CASCADE,
     position INTEGER NOT NULL,
     notes TEXT,
+    notes_tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', COALESCE(notes, ''))) STORED,
     CONSTRAINT setlists_show_song_position_unique UNIQUE (show_id, song_id, position)
 );
 COMMENT ON TABLE setlists IS 'Junction table linking songs to shows, representing the order songs were played.';
 COMMENT ON COLUMN setlists.notes IS 'Optional notes about this specific song performance (e.g., acoustic, guest). From setlist.fm song.info.';
+COMMENT ON COLUMN setlists.notes_tsv IS 'Full-text search vector of notes. Query with notes_tsv @@ websearch_to_tsquery(''english'', ''...'') instead of ILIKE.';
+
+
+-- Eras used to range-partition the performances table by show date
+CREATE TABLE performance_eras (
+    partition_name VARCHAR(63) PRIMARY KEY,
+    era_name VARCHAR(100) NOT NULL,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL, -- Exclusive
+    CONSTRAINT performance_eras_range_check CHECK (start_date < end_date)
+);
+COMMENT ON TABLE performance_eras IS 'Date ranges (start inclusive, end exclusive) of the performances partitions. Shows outside every range go to performances_default.';
+
+INSERT INTO performance_eras (partition_name, era_name, start_date, end_date) VALUES
+    ('performances_1960s', 'Early Years (1960s)', '1960-01-01', '1970-01-01'),
+    ('performances_1970s', '1970s', '1970-01-01', '1980-01-01'),
+    ('performances_1980s', '1980s', '1980-01-01', '1990-01-01'),
+    ('performances_1990s', '1990s', '1990-01-01', '2000-01-01'),
+    ('performances_2000s', '2000s', '2000-01-01', '2010-01-01'),
+    ('performances_2010s', '2010s', '2010-01-01', '2020-01-01'),
+    ('performances_2020s', '2020s', '2020-01-01', '2030-01-01');
+
+-- Denormalized performances table: one row per setlist entry with show and song attributes
+-- Range-partitioned by show_date (see performance_eras); date-bounded queries only scan matching eras
+CREATE TABLE performances (
+    setlist_entry_id INTEGER NOT NULL,
+    show_id INTEGER NOT NULL,
+    song_id INTEGER NOT NULL,
+    show_date DATE NOT NULL,
+    show_number INTEGER,
+    tour VARCHAR(255),
+    venue VARCHAR(255) NOT NULL,
+    city VARCHAR(100),
+    state_name VARCHAR(100),
+    state_code VARCHAR(10),
+    country_name VARCHAR(100),
+    country_code VARCHAR(2),
+    song_title VARCHAR(255) NOT NULL,
+    album VARCHAR(255),
+    is_outtake BOOLEAN,
+    position INTEGER NOT NULL,
+    notes TEXT,
+    PRIMARY KEY (setlist_entry_id, show_date)
+) PARTITION BY RANGE (show_date);
+COMMENT ON TABLE performances IS 'PREFERRED for most questions: one row per song performance (setlists joined with shows and songs), so no joins are needed. Rebuilt from setlists/shows/songs after every load.';
+COMMENT ON COLUMN performances.position IS 'Order of the song within the show (1 = opener). 0 means the order is unknown.';
+COMMENT ON COLUMN performances.notes IS 'Per-performance notes from setlists.notes (e.g., acoustic, guest).';
+
+-- Create one partition per era plus a default partition (the app's pooled connections turn on
+-- partition-wise aggregates and joins per session; see database_config.py)
+DO $$
+DECLARE
+    era RECORD;
+BEGIN
+    FOR era IN SELECT partition_name, start_date, end_date FROM performance_eras ORDER BY start_date LOOP
+        EXECUTE format('CREATE TABLE %I PARTITION OF performances FOR VALUES FROM (%L) TO (%L)',
+                       era.partition_name, era.start_date, era.end_date);
+    END LOOP;
+    CREATE TABLE performances_default PARTITION OF performances DEFAULT;
+END;
+$$;
+
+
+-- Song transition (segue) tables, derived from setlists.position order
+CREATE TABLE song_transitions (
+    tour_id INTEGER NULL REFERENCES tours(tour_id) ON DELETE CASCADE,
+    from_song_id INTEGER NOT NULL REFERENCES songs(song_id) ON DELETE CASCADE,
+    to_song_id INTEGER NOT NULL REFERENCES songs(song_id) ON DELETE CASCADE,
+    transition_count INTEGER NOT NULL DEFAULT 0,
+    probability NUMERIC(6,5),
+    CONSTRAINT song_transitions_scope_unique UNIQUE NULLS NOT DISTINCT (tour_id, from_song_id, to_song_id)
+);
+COMMENT ON TABLE song_transitions IS 'Bigram counts: how often to_song_id was played directly after from_song_id. Rows with tour_id IS NULL aggregate every tour.';
+COMMENT ON COLUMN song_transitions.tour_id IS 'Tour (join tours.tour_id, or filter show_details.tour_id); NULL for the overall counts across all tours.';
+COMMENT ON COLUMN song_transitions.probability IS 'transition_count divided by all transitions out of from_song_id within the same tour_id (P(next = to_song | current = from_song)).';
+
+CREATE TABLE song_trigrams (
+    tour_id INTEGER NULL REFERENCES tours(tour_id) ON DELETE CASCADE,
+    first_song_id INTEGER NOT NULL REFERENCES songs(song_id) ON DELETE CASCADE,
+    second_song_id INTEGER NOT NULL REFERENCES songs(song_id) ON DELETE CASCADE,
+    third_song_id INTEGER NOT NULL REFERENCES songs(song_id) ON DELETE CASCADE,
+    trigram_count INTEGER NOT NULL DEFAULT 0,
+    probability NUMERIC(6,5),
+    CONSTRAINT song_trigrams_scope_unique UNIQUE NULLS NOT DISTINCT (tour_id, first_song_id, second_song_id, third_song_id)
+);
+COMMENT ON TABLE song_trigrams IS 'Trigram counts: three songs played consecutively in this order. Rows with tour_id IS NULL aggregate every tour.';
+COMMENT ON COLUMN song_trigrams.tour_id IS 'Tour (join tours.tour_id); NULL for the overall counts across all tours.';
+COMMENT ON COLUMN song_trigrams.probability IS 'trigram_count divided by all trigrams starting with (first_song_id, second_song_id) within the same tour_id.';
+
+
+-- Gap (shows/days since previous play) for every performance
+CREATE TABLE performance_gaps (
+    setlist_entry_id INTEGER PRIMARY KEY REFERENCES setlists(setlist_entry_id) ON DELETE CASCADE,
+    song_id INTEGER NOT NULL REFERENCES songs(song_id) ON DELETE CASCADE,
+    show_id INTEGER NOT NULL REFERENCES shows(show_id) ON DELETE CASCADE,
+    show_date DATE NOT NULL,
+    show_number INTEGER NOT NULL,
+    previous_show_id INTEGER NULL,
+    shows_since_previous INTEGER NULL,
+    days_since_previous INTEGER NULL
+);
+COMMENT ON TABLE performance_gaps IS 'One row per setlist entry with the gap since the same song was previously played. Use for bust-out questions (large shows_since_previous).';
+COMMENT ON COLUMN performance_gaps.shows_since_previous IS 'show_number difference to the previous performance of the song (1 = played at the previous show, 0 = repeated within the same show). NULL for the debut.';
+COMMENT ON COLUMN performance_gaps.days_since_previous IS 'Days between this performance and the previous performance of the song. NULL for the debut.';
+
+-- Per-song summary of the latest performance
+CREATE TABLE song_gaps (
+    song_id INTEGER PRIMARY KEY REFERENCES songs(song_id) ON DELETE CASCADE,
+    first_played DATE NOT NULL,
+    last_played DATE NOT NULL,
+    last_show_id INTEGER NOT NULL,
+    last_show_number INTEGER NOT NULL,
+    longest_gap_shows INTEGER NULL
+);
+COMMENT ON TABLE song_gaps IS 'Per-song first/last performance and longest gap. Prefer the song_current_gaps view for "not played in N shows" questions.';
+COMMENT ON COLUMN song_gaps.longest_gap_shows IS 'Largest shows_since_previous over all performances of the song. NULL if played only once.';
+
+CREATE VIEW song_current_gaps AS
+SELECT sg.song_id, s.title, s.album, s.is_outtake,
+       sg.first_played, sg.last_played, sg.last_show_id,
+       latest.max_show_number - sg.last_show_number AS shows_since_last,
+       (CURRENT_DATE - sg.last_played) AS days_since_last,
+       sg.longest_gap_shows
+FROM song_gaps sg
+JOIN songs s ON s.song_id = sg.song_id
+CROSS JOIN (SELECT MAX(show_number) AS max_show_number FROM shows) latest;
+COMMENT ON VIEW song_current_gaps IS 'Current gap per played song: shows played since its last performance (shows_since_last) and days since (days_since_last).';
+
+-- Per-song performance timeline with cumulative play counts (refreshed after each load)
+CREATE MATERIALIZED VIEW song_timeline AS
+SELECT sl.song_id, sh.show_id, sh.date AS show_date, sh.show_number,
+       COUNT(*)::INTEGER AS plays_in_show,
+       (SUM(COUNT(*)) OVER (PARTITION BY sl.song_id ORDER BY sh.show_number))::INTEGER AS cumulative_plays
+FROM setlists sl
+JOIN shows sh ON sh.show_id = sl.show_id
+GROUP BY sl.song_id, sh.show_id, sh.date, sh.show_number
+WITH NO DATA;
+COMMENT ON MATERIALIZED VIEW song_timeline IS 'One row per (song, show) in chronological order. cumulative_plays = plays of the song up to and including that show; use for "as of date" and "plays between dates" questions.';
+
+-- Data generation counter (single row). Deliberately NOT dropped above so the
+-- counter keeps increasing across schema re-applies; bumped after every load.
+CREATE TABLE IF NOT EXISTS data_generation (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    generation BIGINT NOT NULL DEFAULT 0,
+    loaded_at TIMESTAMPTZ NULL
+);
+INSERT INTO data_generation (id, generation) VALUES (TRUE, 0) ON CONFLICT (id) DO NOTHING;
+COMMENT ON TABLE data_generation IS 'Single-row counter incremented by populate_database after each data load. Caches of query results are keyed on it.';
 
 
 -- === Indexes ===
 CREATE INDEX idx_setlists_show_id ON setlists(show_id);
 CREATE INDEX idx_setlists_song_id ON setlists(song_id);
 CREATE INDEX idx_shows_date ON shows(date);
-CREATE INDEX idx_shows_tour ON shows(tour);
-CREATE INDEX idx_shows_country_code ON shows(country_code);
-CREATE INDEX idx_shows_state_code ON shows(state_code);
+CREATE INDEX idx_shows_tour_id ON shows(tour_id);
+CREATE INDEX idx_shows_venue_id ON shows(venue_id);
+CREATE INDEX idx_shows_city_id ON shows(city_id);
+CREATE INDEX idx_cities_country_code ON cities(country_code);
+CREATE INDEX idx_cities_state_code ON cities(state_code);
+CREATE INDEX idx_venues_city_id ON venues(city_id);
+CREATE INDEX idx_songs_title_trgm ON songs USING GIN (title gin_trgm_ops);
+CREATE INDEX idx_tours_name_trgm ON tours USING GIN (name gin_trgm_ops);
+CREATE INDEX idx_venues_name_trgm ON venues USING GIN (name gin_trgm_ops);
+CREATE INDEX idx_cities_name_trgm ON cities USING GIN (name gin_trgm_ops);
+CREATE INDEX idx_shows_notes_tsv ON shows USING GIN (show_notes_tsv);
+CREATE INDEX idx_setlists_notes_tsv ON setlists USING GIN (notes_tsv);
+CREATE INDEX idx_performances_song_title ON performances(song_title, show_date) INCLUDE (tour, venue, city, state_code);
+CREATE INDEX idx_performances_show_date ON performances(show_date) INCLUDE (song_title, tour, venue, city);
+CREATE INDEX idx_performances_tour ON performances(tour, song_title) INCLUDE (show_date);
+CREATE INDEX idx_performances_city ON performances(city, state_code, song_title) INCLUDE (show_date);
+CREATE INDEX idx_performances_venue ON performances(venue, song_title) INCLUDE (show_date);
+CREATE INDEX idx_performances_country ON performances(country_code, song_title) INCLUDE (show_date);
+CREATE INDEX idx_performances_album ON performances(album, song_title) INCLUDE (show_date, is_outtake);
+CREATE INDEX idx_performances_show_position ON performances(show_id, position) INCLUDE (song_title);
+CREATE INDEX idx_song_transitions_next ON song_transitions(tour_id, from_song_id, transition_count DESC);
+CREATE INDEX idx_song_transitions_prev ON song_transitions(tour_id, to_song_id, transition_count DESC);
+CREATE INDEX idx_song_trigrams_next ON song_trigrams(tour_id, first_song_id, second_song_id, trigram_count DESC);
+CREATE INDEX idx_song_trigrams_prev ON song_trigrams(tour_id, third_song_id, trigram_count DESC);
+CREATE INDEX idx_shows_show_number ON shows(show_number);
+CREATE INDEX idx_performance_gaps_song ON performance_gaps(song_id, show_number DESC);
+CREATE INDEX idx_performance_gaps_shows_since ON performance_gaps(shows_since_previous DESC NULLS LAST);
+CREATE INDEX idx_performance_gaps_date_shows_since ON performance_gaps(show_date, shows_since_previous DESC NULLS LAST);
+CREATE INDEX idx_song_gaps_last_show_number ON song_gaps(last_show_number);
+CREATE UNIQUE INDEX idx_song_timeline_song_show_number ON song_timeline(song_id, show_number);
+CREATE INDEX idx_song_timeline_song_date ON song_timeline(song_id, show_date);
 
 
 -- === Stored Functions ===
 
+-- Function to mark a completed data load (invalidates cached query results)
+CREATE OR REPLACE FUNCTION bump_data_generation()
+RETURNS BIGINT AS $$
+DECLARE
+    new_generation BIGINT;
+BEGIN
+    UPDATE data_generation SET generation = generation + 1, loaded_at = NOW()
+    RETURNING generation INTO new_generation;
+    RAISE NOTICE 'Data generation is now %.', new_generation;
+    RETURN new_generation;
+END;
+$$ LANGUAGE plpgsql;
+COMMENT ON FUNCTION bump_data_generation() IS 'Increments data_generation.generation and returns the new value. Called once at the end of each load.';
+
 -- Function to update GLOBAL play counts in the songs table
 CREATE OR REPLACE FUNCTION update_song_play_counts()
 RETURNS VOID AS $$
@@ -165,6 +433,335 @@ $$ LANGUAGE plpgsql;
 COMMENT ON FUNCTION update_show_song_counts() IS 'Updates the song_count column in the shows table based on counts from the setlists table.';
 
 
+-- Function to rebuild the denormalized performances table
+CREATE OR REPLACE FUNCTION refresh_performances()
+RETURNS VOID AS $$
+DECLARE
+    rows_inserted INTEGER := 0;
+BEGIN
+    RAISE NOTICE 'Refreshing performances table...';
+    TRUNCATE performances;
+    INSERT INTO performances (setlist_entry_id, show_id, song_id, show_date, show_number, tour, venue, city,
+                              state_name, state_code, country_name, country_code,
+                              song_title, album, is_outtake, position, notes)
+    SELECT sl.setlist_entry_id, sl.show_id, sl.song_id, sd.date, sd.show_number, sd.tour, sd.venue, sd.city,
+           sd.state_name, sd.state_code, sd.country_name, sd.country_code,
+           sg.title, sg.album, sg.is_outtake, sl.position, sl.notes
+    FROM setlists sl
+    JOIN show_details sd ON sd.show_id = sl.show_id
+    JOIN songs sg ON sg.song_id = sl.song_id;
+    GET DIAGNOSTICS rows_inserted = ROW_COUNT;
+    ANALYZE performances;
+    RAISE NOTICE 'Inserted % performance rows.', rows_inserted;
+END;
+$$ LANGUAGE plpgsql;
+COMMENT ON FUNCTION refresh_performances() IS 'Truncates and rebuilds the denormalized performances table from setlists, shows and songs (rows are routed to their era partitions). populate_database COPYs straight into the partitions instead.';
+
+
+-- Function to rebuild the transition (bigram/trigram) tables in one ordered pass over setlists
+CREATE OR REPLACE FUNCTION rebuild_song_transitions()
+RETURNS VOID AS $$
+DECLARE
+    bigrams_inserted INTEGER := 0; trigrams_inserted INTEGER := 0;
+BEGIN
+    RAISE NOTICE 'Rebuilding song transition tables...';
+    TRUNCATE song_transitions, song_trigrams;
+
+    -- Single ordered pass: each setlist entry with the next two songs of the same show
+    CREATE TEMP TABLE _ordered_ngrams ON COMMIT DROP AS
+    SELECT sh.tour_id, sl.song_id AS s1,
+           LEAD(sl.song_id, 1) OVER w AS s2,
+           LEAD(sl.song_id, 2) OVER w AS s3
+    FROM setlists sl
+    JOIN shows sh ON sh.show_id = sl.show_id
+    WHERE sl.position > 0 -- Position 0 means the order is unknown
+    WINDOW w AS (PARTITION BY sl.show_id ORDER BY sl.position, sl.setlist_entry_id);
+
+    -- The (s1, s2) grouping set leaves tour_id NULL: the overall counts
+    INSERT INTO song_transitions (tour_id, from_song_id, to_song_id, transition_count, probability)
+    SELECT g.tour_id, g.s1, g.s2, g.cnt,
+           ROUND(g.cnt::NUMERIC / SUM(g.cnt) OVER (PARTITION BY g.tour_id, g.s1), 5)
+    FROM (
+        SELECT o.tour_id, o.s1, o.s2, COUNT(*)::INTEGER AS cnt
+        FROM _ordered_ngrams o
+        WHERE o.s2 IS NOT NULL
+        GROUP BY GROUPING SETS ((o.tour_id, o.s1, o.s2), (o.s1, o.s2))
+    ) g;
+    GET DIAGNOSTICS bigrams_inserted = ROW_COUNT;
+
+    INSERT INTO song_trigrams (tour_id, first_song_id, second_song_id, third_song_id, trigram_count, probability)
+    SELECT g.tour_id, g.s1, g.s2, g.s3, g.cnt,
+           ROUND(g.cnt::NUMERIC / SUM(g.cnt) OVER (PARTITION BY g.tour_id, g.s1, g.s2), 5)
+    FROM (
+        SELECT o.tour_id, o.s1, o.s2, o.s3, COUNT(*)::INTEGER AS cnt
+        FROM _ordered_ngrams o
+        WHERE o.s3 IS NOT NULL
+        GROUP BY GROUPING SETS ((o.tour_id, o.s1, o.s2, o.s3), (o.s1, o.s2, o.s3))
+    ) g;
+    GET DIAGNOSTICS trigrams_inserted = ROW_COUNT;
+
+    DROP TABLE _ordered_ngrams;
+    RAISE NOTICE 'Inserted % bigram rows and % trigram rows.', bigrams_inserted, trigrams_inserted;
+END;
+$$ LANGUAGE plpgsql;
+COMMENT ON FUNCTION rebuild_song_transitions() IS 'Truncates and rebuilds song_transitions and song_trigrams (per tour_id, and overall with tour_id NULL) from setlists ordered by position.';
+
+
+-- Function to add the transitions of one newly loaded show (incremental maintenance)
+CREATE OR REPLACE FUNCTION add_show_transitions(
+    p_show_id INT -- Input: show whose setlist rows were just inserted
+)
+RETURNS VOID AS $$
+BEGIN
+    CREATE TEMP TABLE _show_ngrams ON COMMIT DROP AS
+    SELECT scope.tour_id, o.s1, o.s2, o.s3
+    FROM (
+        SELECT sh.tour_id AS show_tour_id, sl.song_id AS s1,
+               LEAD(sl.song_id, 1) OVER w AS s2,
+               LEAD(sl.song_id, 2) OVER w AS s3
+        FROM setlists sl
+        JOIN shows sh ON sh.show_id = sl.show_id
+        WHERE sl.show_id = p_show_id AND sl.position > 0
+        WINDOW w AS (ORDER BY sl.position, sl.setlist_entry_id)
+    ) o
+    CROSS JOIN LATERAL (VALUES (o.show_tour_id), (NULL::INTEGER)) AS scope(tour_id); -- The show's tour and the overall (NULL) rows
+
+    INSERT INTO song_transitions AS st (tour_id, from_song_id, to_song_id, transition_count)
+    SELECT tour_id, s1, s2, COUNT(*) FROM _show_ngrams WHERE s2 IS NOT NULL GROUP BY tour_id, s1, s2
+    ON CONFLICT (tour_id, from_song_id, to_song_id)
+    DO UPDATE SET transition_count = st.transition_count + EXCLUDED.transition_count;
+
+    INSERT INTO song_trigrams AS tg (tour_id, first_song_id, second_song_id, third_song_id, trigram_count)
+    SELECT tour_id, s1, s2, s3, COUNT(*) FROM _show_ngrams WHERE s3 IS NOT NULL GROUP BY tour_id, s1, s2, s3
+    ON CONFLICT (tour_id, first_song_id, second_song_id, third_song_id)
+    DO UPDATE SET trigram_count = tg.trigram_count + EXCLUDED.trigram_count;
+
+    -- Re-normalize probabilities only for the groups this show touched (IS NOT DISTINCT FROM matches the NULL scope)
+    UPDATE song_transitions st
+    SET probability = ROUND(st.transition_count::NUMERIC / totals.total, 5)
+    FROM (
+        SELECT t.tour_id, t.from_song_id, SUM(t.transition_count) AS total
+        FROM song_transitions t
+        WHERE EXISTS (SELECT 1 FROM _show_ngrams n
+                      WHERE n.s2 IS NOT NULL AND n.tour_id IS NOT DISTINCT FROM t.tour_id AND n.s1 = t.from_song_id)
+        GROUP BY t.tour_id, t.from_song_id
+    ) totals
+    WHERE st.tour_id IS NOT DISTINCT FROM totals.tour_id AND st.from_song_id = totals.from_song_id;
+
+    UPDATE song_trigrams tg
+    SET probability = ROUND(tg.trigram_count::NUMERIC / totals.total, 5)
+    FROM (
+        SELECT t.tour_id, t.first_song_id, t.second_song_id, SUM(t.trigram_count) AS total
+        FROM song_trigrams t
+        WHERE EXISTS (SELECT 1 FROM _show_ngrams n
+                      WHERE n.s3 IS NOT NULL AND n.tour_id IS NOT DISTINCT FROM t.tour_id
+                        AND n.s1 = t.first_song_id AND n.s2 = t.second_song_id)
+        GROUP BY t.tour_id, t.first_song_id, t.second_song_id
+    ) totals
+    WHERE tg.tour_id IS NOT DISTINCT FROM totals.tour_id AND tg.first_song_id = totals.first_song_id AND tg.second_song_id = totals.second_song_id;
+
+    DROP TABLE _show_ngrams;
+END;
+$$ LANGUAGE plpgsql;
+COMMENT ON FUNCTION add_show_transitions(INT) IS 'Adds one show''s bigrams/trigrams to song_transitions and song_trigrams and re-normalizes the affected probabilities. Call exactly once per newly inserted show.';
+
+
+-- Function to update first/last show dates and show counts of the tour, venue and city dimensions
+CREATE OR REPLACE FUNCTION update_dimension_stats()
+RETURNS VOID AS $$
+BEGIN
+    RAISE NOTICE 'Updating tour, venue and city statistics...';
+    UPDATE tours t
+    SET first_show_date = agg.first_date, last_show_date = agg.last_date, show_count = agg.cnt
+    FROM (
+        SELECT tour_id, MIN(date) AS first_date, MAX(date) AS last_date, COUNT(*)::INTEGER AS cnt
+        FROM shows
+        GROUP BY tour_id
+    ) AS agg
+    WHERE t.tour_id = agg.tour_id;
+    UPDATE tours t
+    SET first_show_date = NULL, last_show_date = NULL, show_count = 0
+    WHERE NOT EXISTS (SELECT 1 FROM shows sh WHERE sh.tour_id = t.tour_id);
+
+    UPDATE venues v
+    SET first_show_date = agg.first_date, last_show_date = agg.last_date, show_count = agg.cnt
+    FROM (
+        SELECT venue_id, MIN(date) AS first_date, MAX(date) AS last_date, COUNT(*)::INTEGER AS cnt
+        FROM shows
+        GROUP BY venue_id
+    ) AS agg
+    WHERE v.venue_id = agg.venue_id;
+    UPDATE venues v
+    SET first_show_date = NULL, last_show_date = NULL, show_count = 0
+    WHERE NOT EXISTS (SELECT 1 FROM shows sh WHERE sh.venue_id = v.venue_id);
+
+    UPDATE cities c
+    SET first_show_date = agg.first_date, last_show_date = agg.last_date, show_count = agg.cnt
+    FROM (
+        SELECT city_id, MIN(date) AS first_date, MAX(date) AS last_date, COUNT(*)::INTEGER AS cnt
+        FROM shows
+        GROUP BY city_id
+    ) AS agg
+    WHERE c.city_id = agg.city_id;
+    UPDATE cities c
+    SET first_show_date = NULL, last_show_date = NULL, show_count = 0
+    WHERE NOT EXISTS (SELECT 1 FROM shows sh WHERE sh.city_id = c.city_id);
+    RAISE NOTICE 'Finished updating dimension statistics.';
+END;
+$$ LANGUAGE plpgsql;
+COMMENT ON FUNCTION update_dimension_stats() IS 'Updates first_show_date, last_show_date and show_count on tours, venues and cities from the shows table.';
+
+
+-- Function to number shows chronologically
+CREATE OR REPLACE FUNCTION update_show_numbers()
+RETURNS VOID AS $$
+BEGIN
+    RAISE NOTICE 'Updating chronological show numbers...';
+    UPDATE shows sh
+    SET show_number = numbered.rn
+    FROM (
+        SELECT show_id, ROW_NUMBER() OVER (ORDER BY date, show_id)::INTEGER AS rn
+        FROM shows
+    ) AS numbered
+    WHERE sh.show_id = numbered.show_id
+      AND sh.show_number IS DISTINCT FROM numbered.rn;
+    RAISE NOTICE 'Finished updating show numbers.';
+END;
+$$ LANGUAGE plpgsql;
+COMMENT ON FUNCTION update_show_numbers() IS 'Sets shows.show_number to the chronological position of each show (ordered by date, then show_id).';
+
+
+-- Function to rebuild performance_gaps and song_gaps in one window pass
+CREATE OR REPLACE FUNCTION rebuild_performance_gaps()
+RETURNS VOID AS $$
+DECLARE
+    gaps_inserted INTEGER := 0;
+BEGIN
+    RAISE NOTICE 'Rebuilding performance gap tables...';
+    TRUNCATE performance_gaps, song_gaps;
+
+    INSERT INTO performance_gaps (setlist_entry_id, song_id, show_id, show_date, show_number,
+                                  previous_show_id, shows_since_previous, days_since_previous)
+    SELECT sl.setlist_entry_id, sl.song_id, sl.show_id, sh.date, sh.show_number,
+           LAG(sl.show_id) OVER w,
+           sh.show_number - LAG(sh.show_number) OVER w,
+           sh.date - LAG(sh.date) OVER w
+    FROM setlists sl
+    JOIN shows sh ON sh.show_id = sl.show_id
+    WINDOW w AS (PARTITION BY sl.song_id ORDER BY sh.show_number, sl.position, sl.setlist_entry_id);
+    GET DIAGNOSTICS gaps_inserted = ROW_COUNT;
+
+    INSERT INTO song_gaps (song_id, first_played, last_played, last_show_id, last_show_number, longest_gap_shows)
+    SELECT pg.song_id, MIN(pg.show_date), MAX(pg.show_date),
+           (ARRAY_AGG(pg.show_id ORDER BY pg.show_number DESC))[1],
+           MAX(pg.show_number), MAX(pg.shows_since_previous)
+    FROM performance_gaps pg
+    GROUP BY pg.song_id;
+
+    RAISE NOTICE 'Inserted % performance gap rows.', gaps_inserted;
+END;
+$$ LANGUAGE plpgsql;
+COMMENT ON FUNCTION rebuild_performance_gaps() IS 'Truncates and rebuilds performance_gaps and song_gaps from setlists and shows. Requires shows.show_number (see update_show_numbers).';
+
+
+-- Function to add the gaps of one newly loaded show (incremental maintenance)
+CREATE OR REPLACE FUNCTION add_show_gaps(
+    p_show_id INT -- Input: show whose setlist rows were just inserted
+)
+RETURNS VOID AS $$
+DECLARE
+    v_date DATE; v_show_number INTEGER;
+BEGIN
+    SELECT date INTO v_date FROM shows WHERE show_id = p_show_id;
+    IF v_date IS NULL THEN
+        RAISE NOTICE 'Show % not found. Nothing to do.', p_show_id; RETURN;
+    END IF;
+
+    -- A show older than the latest one shifts every later show_number: fall back to a full rebuild
+    IF EXISTS (SELECT 1 FROM shows WHERE show_id <> p_show_id AND (date > v_date OR (date = v_date AND show_id > p_show_id))) THEN
+        RAISE NOTICE 'Show % is not the latest show. Rebuilding gap tables.', p_show_id;
+        PERFORM update_show_numbers();
+        PERFORM rebuild_performance_gaps();
+        RETURN;
+    END IF;
+
+    SELECT COALESCE(MAX(show_number), 0) + 1 INTO v_show_number FROM shows WHERE show_id <> p_show_id;
+    UPDATE shows SET show_number = v_show_number WHERE show_id = p_show_id;
+
+    INSERT INTO performance_gaps (setlist_entry_id, song_id, show_id, show_date, show_number,
+                                  previous_show_id, shows_since_previous, days_since_previous)
+    SELECT sl.setlist_entry_id, sl.song_id, sl.show_id, v_date, v_show_number,
+           CASE WHEN ROW_NUMBER() OVER w = 1 THEN g.last_show_id ELSE p_show_id END,
+           CASE WHEN ROW_NUMBER() OVER w = 1 THEN v_show_number - g.last_show_number ELSE 0 END,
+           CASE WHEN ROW_NUMBER() OVER w = 1 THEN v_date - g.last_played ELSE 0 END
+    FROM setlists sl
+    LEFT JOIN song_gaps g ON g.song_id = sl.song_id
+    WHERE sl.show_id = p_show_id
+    WINDOW w AS (PARTITION BY sl.song_id ORDER BY sl.position, sl.setlist_entry_id);
+
+    INSERT INTO song_gaps AS sg (song_id, first_played, last_played, last_show_id, last_show_number, longest_gap_shows)
+    SELECT pg.song_id, v_date, v_date, p_show_id, v_show_number, MAX(pg.shows_since_previous)
+    FROM performance_gaps pg
+    WHERE pg.show_id = p_show_id
+    GROUP BY pg.song_id
+    ON CONFLICT (song_id) DO UPDATE
+    SET last_played = EXCLUDED.last_played,
+        last_show_id = EXCLUDED.last_show_id,
+        last_show_number = EXCLUDED.last_show_number,
+        longest_gap_shows = GREATEST(sg.longest_gap_shows, EXCLUDED.longest_gap_shows);
+END;
+$$ LANGUAGE plpgsql;
+COMMENT ON FUNCTION add_show_gaps(INT) IS 'Numbers one newly inserted show and appends its performance gaps, updating song_gaps. Falls back to a full rebuild if the show is not the latest. Call exactly once per new show.';
+
+
+-- Function for fuzzy lookup of canonical song, album, tour, venue and city names
+CREATE OR REPLACE FUNCTION lookup_entities(
+    p_search TEXT,             -- Input: user-typed name, possibly misspelled
+    p_kind TEXT DEFAULT NULL,  -- Optional: 'song', 'album', 'tour', 'venue' or 'city' (NULL = all kinds)
+    p_limit INT DEFAULT 10
+)
+RETURNS TABLE (
+    kind TEXT,
+    value TEXT,
+    score REAL
+)
+AS $$
+BEGIN
+    IF p_search IS NULL OR btrim(p_search) = '' THEN
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    WITH candidates AS (
+        SELECT 'song'::TEXT AS kind, s.title::TEXT AS value
+        FROM songs s
+        WHERE (p_kind IS NULL OR p_kind = 'song') AND (s.title % p_search OR p_search <% s.title)
+        UNION
+        SELECT 'album', s.album::TEXT
+        FROM songs s
+        WHERE (p_kind IS NULL OR p_kind = 'album') AND s.album IS NOT NULL AND (s.album % p_search OR p_search <% s.album)
+        UNION
+        SELECT 'tour', t.name::TEXT
+        FROM tours t
+        WHERE (p_kind IS NULL OR p_kind = 'tour') AND (t.name % p_search OR p_search <% t.name)
+        UNION
+        SELECT 'venue', v.name::TEXT
+        FROM venues v
+        WHERE (p_kind IS NULL OR p_kind = 'venue') AND (v.name % p_search OR p_search <% v.name)
+        UNION
+        SELECT 'city', c.name::TEXT
+        FROM cities c
+        WHERE (p_kind IS NULL OR p_kind = 'city') AND (c.name % p_search OR p_search <% c.name)
+    )
+    SELECT c.kind, c.value, GREATEST(similarity(c.value, p_search), word_similarity(p_search, c.value))::REAL AS score
+    FROM candidates c
+    ORDER BY score DESC, c.value ASC
+    LIMIT p_limit;
+END;
+$$ LANGUAGE plpgsql STABLE;
+COMMENT ON FUNCTION lookup_entities(TEXT, TEXT, INT) IS 'Returns canonical song titles, albums, tours, venues or cities ranked by trigram similarity to p_search (handles typos and partial names). Example: SELECT * FROM lookup_entities(''thunder rd'', ''song'', 5).';
+
+
 -- Function to calculate subset-specific stats based on Show IDs
 CREATE OR REPLACE FUNCTION get_stats_for_show_ids(
     p_show_ids INT[] -- Input: An array of show IDs to include
@@ -0,0 +1,251 @@
+# setlist_similarity.py
+# MinHash signatures per show plus an LSH (banding) index for fast
+# "which shows had the most similar setlist" lookups.
+# Built from the setlists table and persisted next to the normalized CSVs.
+
+import sys
+import pickle
+import logging
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple, Any
+
+import numpy as np
+import psycopg2
+
+try:
+    from config import (OUTPUT_PATH, SIMILARITY_INDEX_FILENAME, MINHASH_NUM_PERM,
+                        MINHASH_LSH_BANDS, MINHASH_SEED)
+except ImportError:
+    SCRIPT_DIR_FOR_PATH = Path(__file__).resolve().parent
+    OUTPUT_PATH = SCRIPT_DIR_FOR_PATH.parent / "3 - Schema Creation"
+    SIMILARITY_INDEX_FILENAME = "setlist_minhash_index.pkl"
+    MINHASH_NUM_PERM = 128
+    MINHASH_LSH_BANDS = 32
+    MINHASH_SEED = 42
+
+logger = logging.getLogger(__name__)
+
+# Mersenne prime used by the universal hash family h(x) = (a*x + b) mod p
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+class SetlistSimilarityIndex:
+    """MinHash signatures for every show's song set, bucketed by LSH bands."""
+
+    def __init__(self, num_perm: int = MINHASH_NUM_PERM, bands: int = MINHASH_LSH_BANDS, seed: int = MINHASH_SEED):
+        if num_perm % bands != 0:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands}).")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.seed = seed
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 31, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, 1 << 31, size=num_perm).astype(np.uint64)
+        self.show_ids: np.ndarray = np.empty(0, dtype=np.int64)
+        self.signatures: np.ndarray = np.empty((0, num_perm), dtype=np.uint64)
+        self.song_sets: List[frozenset] = []
+        self.show_meta: List[Dict[str, Any]] = [] # date, tour, venue, city per row
+        self.buckets: List[Dict[bytes, List[int]]] = [dict() for _ in range(bands)]
+        self._row_by_show_id: Dict[int, int] = {}
+        self._filters: Optional[Dict[str, Any]] = None # Tour/date lookup for filtered queries, built on first use
+
+    # --- Construction ---
+    def minhash(self, song_ids: Set[int]) -> np.ndarray:
+        """Returns the MinHash signature (num_perm uint64 values) for a set of song_ids."""
+        if not song_ids:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        x = np.fromiter(song_ids, dtype=np.uint64)
+        hashed = (np.outer(x, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return hashed.min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        r = self.rows_per_band
+        return [signature[i * r:(i + 1) * r].tobytes() for i in range(self.bands)]
+
+    def add_show(self, show_id: int, song_ids: Set[int], meta: Dict[str, Any]):
+        """Adds (or replaces) a single show. Used for incremental updates."""
+        signature = self.minhash(song_ids)
+        if show_id in self._row_by_show_id:
+            row = self._row_by_show_id[show_id]
+            for band, key in enumerate(self._band_keys(self.signatures[row])):
+                bucket = self.buckets[band].get(key, [])
+                if row in bucket: bucket.remove(row)
+            self.signatures[row] = signature
+            self.song_sets[row] = frozenset(song_ids)
+            self.show_meta[row] = meta
+        else:
+            row = len(self.show_ids)
+            self.show_ids = np.append(self.show_ids, np.int64(show_id))
+            self.signatures = np.vstack([self.signatures, signature[np.newaxis, :]])
+            self.song_sets.append(frozenset(song_ids))
+            self.show_meta.append(meta)
+            self._row_by_show_id[show_id] = row
+        for band, key in enumerate(self._band_keys(signature)):
+            self.buckets[band].setdefault(key, []).append(row)
+        self._filters = None
+
+    @classmethod
+    def build(cls, show_songs: Dict[int, Set[int]], show_meta: Dict[int, Dict[str, Any]], **kwargs) -> "SetlistSimilarityIndex":
+        """Builds a full index from {show_id: {song_id, ...}} and {show_id: meta}."""
+        index = cls(**kwargs)
+        ordered_ids = sorted(show_songs)
+        index.show_ids = np.array(ordered_ids, dtype=np.int64)
+        index.signatures = np.vstack([index.minhash(show_songs[s]) for s in ordered_ids]) if ordered_ids else index.signatures
+        index.song_sets = [frozenset(show_songs[s]) for s in ordered_ids]
+        index.show_meta = [show_meta.get(s, {}) for s in ordered_ids]
+        index._row_by_show_id = {s: row for row, s in enumerate(ordered_ids)}
+        for row in range(len(ordered_ids)):
+            for band, key in enumerate(index._band_keys(index.signatures[row])):
+                index.buckets[band].setdefault(key, []).append(row)
+        logger.info(f"Built MinHash/LSH index for {len(ordered_ids)} shows ({index.bands} bands x {index.rows_per_band} rows).")
+        return index
+
+    # --- Querying ---
+    def _filter_index(self) -> Dict[str, Any]:
+        """Rows per lowercased tour and rows sorted by date (shows without a date left out)."""
+        filters = getattr(self, '_filters', None) # Indexes pickled before it existed lack the attribute
+        if filters is None:
+            by_tour: Dict[str, List[int]] = {}
+            for row, meta in enumerate(self.show_meta):
+                by_tour.setdefault((meta.get('tour') or '').lower(), []).append(row)
+            dates = np.array([meta.get('date') or np.datetime64('NaT') for meta in self.show_meta], dtype='datetime64[D]')
+            dated = np.flatnonzero(~np.isnat(dates))
+            by_date = dated[np.argsort(dates[dated], kind='stable')]
+            filters = self._filters = {'by_tour': {tour: np.array(rows, dtype=np.int64) for tour, rows in by_tour.items()},
+                                       'dates': dates, 'by_date': by_date, 'sorted_dates': dates[by_date]}
+        return filters
+
+    def _filtered_rows(self, tour: Optional[str], start_date: Optional[date], end_date: Optional[date]) -> Optional[np.ndarray]:
+        """Sorted rows of the shows passing the filters (None without filters): a dict lookup for the tour, bisection for dates."""
+        if not (tour or start_date or end_date): return None
+        filters = self._filter_index()
+        start = np.datetime64(start_date, 'D') if start_date else None
+        end = np.datetime64(end_date, 'D') if end_date else None
+        if tour:
+            rows = filters['by_tour'].get(tour.lower(), np.empty(0, dtype=np.int64))
+            if start is None and end is None: return rows
+            dates = filters['dates'][rows]
+            keep = ~np.isnat(dates)
+            if start is not None: keep &= dates >= start
+            if end is not None: keep &= dates <= end
+            return rows[keep]
+        lo = np.searchsorted(filters['sorted_dates'], start, side='left') if start is not None else 0
+        hi = np.searchsorted(filters['sorted_dates'], end, side='right') if end is not None else len(filters['by_date'])
+        return np.sort(filters['by_date'][lo:hi])
+
+    def query(self, show_id: int, k: int = 10, tour: Optional[str] = None,
+              start_date: Optional[date] = None, end_date: Optional[date] = None) -> List[Dict[str, Any]]:
+        """
+        Returns the top-k shows by Jaccard similarity to show_id.
+        Candidates come from shared LSH buckets; if the filters leave fewer than k
+        candidates, the filtered shows (looked up by tour and date, not scanned) are
+        ranked by MinHash agreement instead. Without filters that fallback compares
+        the signature with every show's, one vectorized pass over the signatures.
+        """
+        row = self._row_by_show_id.get(show_id)
+        if row is None:
+            raise KeyError(f"show_id {show_id} is not in the similarity index.")
+        signature = self.signatures[row]
+        candidates: Set[int] = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self.buckets[band].get(key, ()))
+        candidates.discard(row)
+        allowed = self._filtered_rows(tour, start_date, end_date)
+        if allowed is not None:
+            candidates = set(np.intersect1d(np.fromiter(candidates, dtype=np.int64), allowed, assume_unique=True).tolist())
+
+        if len(candidates) < k:
+            # Too few LSH hits (rare setlist or narrow filter): estimate over the filtered rows instead.
+            filtered = allowed if allowed is not None else np.arange(len(self.show_ids), dtype=np.int64)
+            filtered = filtered[filtered != row]
+            if filtered.size:
+                estimates = (self.signatures[filtered] == signature).mean(axis=1)
+                top = filtered[np.argsort(-estimates, kind='stable')[:k * 4]]
+                candidates.update(int(c) for c in top)
+
+        target_songs = self.song_sets[row]
+        scored: List[Tuple[float, int]] = []
+        for c in candidates:
+            other = self.song_sets[c]
+            union = len(target_songs | other)
+            scored.append((len(target_songs & other) / union if union else 0.0, c))
+        scored.sort(key=lambda x: (-x[0], int(self.show_ids[x[1]])))
+
+        results = []
+        for jaccard, c in scored[:k]:
+            meta = self.show_meta[c]
+            results.append({
+                'show_id': int(self.show_ids[c]),
+                'date': meta.get('date'),
+                'tour': meta.get('tour'),
+                'venue': meta.get('venue'),
+                'city': meta.get('city'),
+                'jaccard': round(jaccard, 4),
+                'shared_songs': len(target_songs & self.song_sets[c]),
+            })
+        return results
+
+    def find_show_ids(self, show_date: date, venue: Optional[str] = None, city: Optional[str] = None) -> List[int]:
+        """Finds show_ids by date, optionally narrowed by (case-insensitive) venue or city substring."""
+        matches = []
+        for row, meta in enumerate(self.show_meta):
+            if meta.get('date') != show_date: continue
+            if venue and venue.lower() not in (meta.get('venue') or '').lower(): continue
+            if city and city.lower() not in (meta.get('city') or '').lower(): continue
+            matches.append(int(self.show_ids[row]))
+        return matches
+
+    # --- Persistence ---
+    def save(self, path: Path):
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        logger.info(f"Saved similarity index to {path}")
+
+    @staticmethod
+    def load(path: Path) -> "SetlistSimilarityIndex":
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+
+def get_index_path() -> Path:
+    return OUTPUT_PATH / SIMILARITY_INDEX_FILENAME
+
+
+def build_similarity_index(conn: psycopg2.extensions.connection) -> SetlistSimilarityIndex:
+    """Reads setlists/shows from the database and builds a fresh index."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT show_id, date, tour, venue, city FROM show_details;")
+        show_meta = {row[0]: {'date': row[1], 'tour': row[2], 'venue': row[3], 'city': row[4]} for row in cursor.fetchall()}
+        cursor.execute("SELECT show_id, song_id FROM setlists;")
+        show_songs: Dict[int, Set[int]] = {}
+        for show_id, song_id in cursor.fetchall():
+            show_songs.setdefault(show_id, set()).add(song_id)
+    finally:
+        cursor.close()
+    return SetlistSimilarityIndex.build(show_songs, show_meta)
+
+
+def rebuild_and_save(conn: psycopg2.extensions.connection, path: Optional[Path] = None) -> SetlistSimilarityIndex:
+    index = build_similarity_index(conn)
+    index.save(path or get_index_path())
+    return index
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        from database_config import get_connection_string
+    except ImportError:
+        sys.exit("database_config.py not found.")
+    conn = None
+    try:
+        conn = psycopg2.connect(get_connection_string())
+        rebuild_and_save(conn)
+    except psycopg2.Error as e: logger.error(f"Database error while building similarity index: {e}"); sys.exit(1)
+    finally:
+        if conn: conn.close()
@@ -0,0 +1,127 @@
+# song_timeline.py
+# Compact per-song performance timelines (sorted show dates, show numbers and
+# cumulative play counts) answering "as of" questions by binary search.
+# Loaded from the song_timeline materialized view defined in schema.sql.
+
+import logging
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Any
+
+import numpy as np
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+
+class SongTimeline:
+    """Sorted arrays per song: show dates, show numbers, show ids and cumulative plays."""
+
+    def __init__(self):
+        self.dates: Dict[int, np.ndarray] = {} # datetime64[D], ascending
+        self.show_numbers: Dict[int, np.ndarray] = {}
+        self.show_ids: Dict[int, np.ndarray] = {}
+        self.cumulative: Dict[int, np.ndarray] = {} # plays up to and including each show
+        self.song_ids_by_title: Dict[str, int] = {}
+        self.tour_last_show_number: Dict[str, int] = {}
+
+    @classmethod
+    def from_rows(cls, rows: List[tuple], titles: Dict[int, str], tour_ends: Dict[str, int]) -> "SongTimeline":
+        """Builds from (song_id, show_date, show_number, show_id, cumulative_plays) rows sorted by song_id, show_number."""
+        timeline = cls()
+        by_song: Dict[int, List[tuple]] = {}
+        for row in rows:
+            by_song.setdefault(row[0], []).append(row)
+        for song_id, song_rows in by_song.items():
+            timeline.dates[song_id] = np.array([r[1] for r in song_rows], dtype='datetime64[D]')
+            timeline.show_numbers[song_id] = np.array([r[2] for r in song_rows], dtype=np.int32)
+            timeline.show_ids[song_id] = np.array([r[3] for r in song_rows], dtype=np.int32)
+            timeline.cumulative[song_id] = np.array([r[4] for r in song_rows], dtype=np.int32)
+        timeline.song_ids_by_title = {title.lower(): song_id for song_id, title in titles.items()}
+        timeline.tour_last_show_number = {tour.lower(): n for tour, n in tour_ends.items() if tour}
+        logger.info(f"Built song timelines for {len(by_song)} songs from {len(rows)} rows.")
+        return timeline
+
+    def resolve_song_id(self, title: str) -> Optional[int]:
+        return self.song_ids_by_title.get(title.strip().lower())
+
+    def _plays_through_index(self, song_id: int, idx: int) -> int:
+        """Cumulative plays for the first idx shows of the song (idx may be 0)."""
+        return int(self.cumulative[song_id][idx - 1]) if idx > 0 else 0
+
+    def total_plays(self, song_id: int) -> int:
+        cumulative = self.cumulative.get(song_id)
+        return int(cumulative[-1]) if cumulative is not None and cumulative.size else 0
+
+    def plays_between(self, song_id: int, start: Optional[date] = None, end: Optional[date] = None) -> int:
+        """Number of performances with start <= show date <= end (either bound optional)."""
+        dates = self.dates.get(song_id)
+        if dates is None: return 0
+        lo = int(np.searchsorted(dates, np.datetime64(start, 'D'), side='left')) if start else 0
+        hi = int(np.searchsorted(dates, np.datetime64(end, 'D'), side='right')) if end else dates.size
+        if hi <= lo: return 0
+        return self._plays_through_index(song_id, hi) - self._plays_through_index(song_id, lo)
+
+    def plays_as_of(self, song_id: int, as_of: date) -> int:
+        """Performances on or before as_of."""
+        return self.plays_between(song_id, None, as_of)
+
+    def plays_before(self, song_id: int, before: date) -> int:
+        """Performances strictly before the given date."""
+        return self.plays_between(song_id, None, before - timedelta(days=1))
+
+    def plays_through_show_number(self, song_id: int, show_number: int) -> int:
+        numbers = self.show_numbers.get(song_id)
+        if numbers is None: return 0
+        return self._plays_through_index(song_id, int(np.searchsorted(numbers, show_number, side='right')))
+
+    def plays_through_tour(self, song_id: int, tour: str) -> Optional[int]:
+        """Performances up to and including the last show of the named tour. None if the tour is unknown."""
+        last_number = self.tour_last_show_number.get(tour.strip().lower())
+        if last_number is None: return None
+        return self.plays_through_show_number(song_id, last_number)
+
+    def _play_at(self, song_id: int, idx: int) -> Dict[str, Any]:
+        return {
+            'date': self.dates[song_id][idx].item(),
+            'show_id': int(self.show_ids[song_id][idx]),
+            'show_number': int(self.show_numbers[song_id][idx]),
+            'play_number': int(self.cumulative[song_id][idx]),
+        }
+
+    def last_play_before(self, song_id: int, before: date) -> Optional[Dict[str, Any]]:
+        """Latest performance strictly before the given date."""
+        dates = self.dates.get(song_id)
+        if dates is None: return None
+        idx = int(np.searchsorted(dates, np.datetime64(before, 'D'), side='left')) - 1
+        return self._play_at(song_id, idx) if idx >= 0 else None
+
+    def first_play_on_or_after(self, song_id: int, after: date) -> Optional[Dict[str, Any]]:
+        dates = self.dates.get(song_id)
+        if dates is None: return None
+        idx = int(np.searchsorted(dates, np.datetime64(after, 'D'), side='left'))
+        return self._play_at(song_id, idx) if idx < dates.size else None
+
+    def first_play(self, song_id: int) -> Optional[Dict[str, Any]]:
+        return self._play_at(song_id, 0) if song_id in self.dates else None
+
+    def last_play(self, song_id: int) -> Optional[Dict[str, Any]]:
+        return self._play_at(song_id, self.dates[song_id].size - 1) if song_id in self.dates else None
+
+
+def load_song_timeline(conn: psycopg2.extensions.connection) -> SongTimeline:
+    """Loads the song_timeline materialized view (plus titles and tour end points) into memory."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT song_id, show_date, show_number, show_id, cumulative_plays
+            FROM song_timeline
+            ORDER BY song_id, show_number;
+        """)
+        rows = cursor.fetchall()
+        cursor.execute("SELECT song_id, title FROM songs;")
+        titles = dict(cursor.fetchall())
+        cursor.execute("SELECT t.name, MAX(sh.show_number) FROM shows sh JOIN tours t ON t.tour_id = sh.tour_id GROUP BY t.name;")
+        tour_ends = dict(cursor.fetchall())
+    finally:
+        cursor.close()
+    return SongTimeline.from_rows(rows, titles, tour_ends)
@@ -0,0 +1,185 @@
+# static_assets.py
+# Build step and lookup for the frontend's static files. Running this script
+# copies the page's assets into the build directory (frontend/dist) under
+# content-hashed names (script.js -> script.<hash>.js; the inline <style> of
+# index.html becomes styles.<hash>.css), writes gzip and brotli variants next
+# to them, rewrites index.html to reference the hashed names and saves a
+# manifest. app.py serves hashed files with immutable cache headers and the
+# precompressed variant the client accepts, so repeat visits make no asset
+# requests; index.html itself is revalidated with its ETag (a 304).
+# Without a build, app.py keeps serving the source files.
+# Usage: python static_assets.py [--vendor-cdn]
+
+import os
+import re
+import gzip
+import json
+import shutil
+import hashlib
+import logging
+import argparse
+import textwrap
+import threading
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from result_encoding import accepted_encodings
+
+try:
+    import brotli # Optional dependency: adds .br variants
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+INDEX_NAME = "index.html"
+FINGERPRINT_CHARS = 10
+CONTENT_TYPES = {'.js': 'text/javascript', '.css': 'text/css', '.html': 'text/html'} # Flask adds the utf-8 charset
+# Versioned cdnjs files (Prism) can be copied in with --vendor-cdn; the Tailwind CDN script is a
+# runtime compiler rather than a fixed file, so it always stays remote
+VENDOR_URL_PREFIX = "https://cdnjs.cloudflare.com/"
+
+_STYLE_RE = re.compile(r'[ \t]*<style>(.*?)</style>[ \t]*\n?', re.DOTALL)
+_REF_RE = re.compile(r'(<(?:script|link)\b[^>]*?\b(?:src|href)=")([^"]+)(")')
+
+
+def source_index(frontend_dir: Path) -> Path:
+    """The source index.html: frontend/index.html, or the project root's copy if the frontend folder has none."""
+    candidate = Path(frontend_dir) / INDEX_NAME
+    return candidate if candidate.is_file() else Path(frontend_dir).parent / INDEX_NAME
+
+
+def fingerprinted_name(name: str, data: bytes) -> str:
+    stem, suffix = os.path.splitext(os.path.basename(name))
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:FINGERPRINT_CHARS]}{suffix}"
+
+
+def _precompress(path: Path, data: bytes) -> List[str]:
+    """Writes .br (when brotli is installed) and .gz next to path if they are smaller; returns the encodings written."""
+    encodings = []
+    if brotli is not None:
+        compressed = brotli.compress(data, quality=11)
+        if len(compressed) < len(data):
+            path.with_name(path.name + '.br').write_bytes(compressed)
+            encodings.append('br')
+    compressed = gzip.compress(data, compresslevel=9, mtime=0) # mtime=0 keeps builds byte-identical
+    if len(compressed) < len(data):
+        path.with_name(path.name + '.gz').write_bytes(compressed)
+        encodings.append('gzip')
+    return encodings
+
+
+def _download(url: str) -> Optional[bytes]:
+    try:
+        with urllib.request.urlopen(url, timeout=15) as response: return response.read()
+    except Exception as e:
+        logger.warning(f"Could not download {url} ({e}); keeping the CDN reference.")
+        return None
+
+
+def build(frontend_dir: Path, out_dir: Path, vendor_cdn: bool = False) -> Dict:
+    """Builds out_dir from the source page and its local assets; returns the manifest."""
+    frontend_dir, out_dir = Path(frontend_dir), Path(out_dir)
+    index_path = source_index(frontend_dir)
+    html = index_path.read_text(encoding='utf-8')
+    shutil.rmtree(out_dir, ignore_errors=True) # Generated; stale hashed files would otherwise pile up
+    out_dir.mkdir(parents=True)
+    files = {}
+
+    def add(name: str, data: bytes, hashed: bool = True) -> str:
+        out_name = fingerprinted_name(name, data) if hashed else name
+        path = out_dir / out_name
+        path.write_bytes(data)
+        files[out_name] = {"source": name, "etag": hashlib.sha256(data).hexdigest()[:16], "bytes": len(data),
+                           "encodings": _precompress(path, data), "immutable": hashed}
+        return out_name
+
+    def replace_reference(match) -> str:
+        url = match.group(2)
+        if url.startswith(VENDOR_URL_PREFIX):
+            data = _download(url) if vendor_cdn else None
+            if data is None: return match.group(0)
+            name = add(url.rsplit('/', 1)[-1], data)
+        elif '://' in url or url.startswith('//'):
+            return match.group(0)
+        else:
+            local = frontend_dir / url
+            if not local.is_file():
+                logger.warning(f"{index_path.name} references {url}, which is not in {frontend_dir}; left as is.")
+                return match.group(0)
+            name = add(url, local.read_bytes())
+        return match.group(1) + name + match.group(3)
+
+    html = _REF_RE.sub(replace_reference, html)
+    style = _STYLE_RE.search(html)
+    if style: # Inline CSS is re-sent with every page load; as a hashed file it is cached
+        css = textwrap.dedent(style.group(1)).strip() + "\n"
+        html = html[:style.start()] + f'    <link rel="stylesheet" href="{add("styles.css", css.encode("utf-8"))}" />\n' + html[style.end():]
+    add(INDEX_NAME, html.encode('utf-8'), hashed=False)
+
+    manifest = {"source": str(index_path), "files": files}
+    (out_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+    return manifest
+
+
+class Variant(NamedTuple):
+    path: Path
+    encoding: Optional[str] # Content-Encoding of the file at path (None = identity)
+    etag: str # Differs per encoding, as the bytes do
+    content_type: str
+    immutable: bool
+
+
+class StaticAssets:
+    """Looks up built files in the manifest (re-read after a rebuild) and picks the variant to send."""
+
+    def __init__(self, build_dir: Path):
+        self.build_dir = Path(build_dir)
+        self._files: Dict[str, Dict] = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def files(self) -> Dict[str, Dict]:
+        try: mtime = (self.build_dir / MANIFEST_NAME).stat().st_mtime
+        except OSError: return {} # Not built
+        with self._lock:
+            if mtime != self._mtime:
+                try:
+                    self._files = json.loads((self.build_dir / MANIFEST_NAME).read_text(encoding='utf-8'))["files"]
+                    logger.info(f"Loaded static asset manifest ({len(self._files)} files) from {self.build_dir}")
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"Unreadable static asset manifest in {self.build_dir}: {e}")
+                    self._files = {}
+                self._mtime = mtime
+            return self._files
+
+    def variant(self, name: str, accept_encoding: Optional[str]) -> Optional[Variant]:
+        """The precompressed file the client accepts (br, then gzip), else the plain one; None if name isn't built."""
+        entry = self.files().get(name)
+        if entry is None: return None
+        accepted = accepted_encodings(accept_encoding)
+        content_type = CONTENT_TYPES.get(os.path.splitext(name)[1], 'application/octet-stream')
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if encoding in entry["encodings"] and accepted.get(encoding, 0) > 0:
+                return Variant(self.build_dir / (name + suffix), encoding, f"{entry['etag']}-{encoding}", content_type, entry["immutable"])
+        return Variant(self.build_dir / name, None, entry["etag"], content_type, entry["immutable"])
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        from config import BASE_PATH, STATIC_BUILD_DIR
+    except ImportError:
+        BASE_PATH = Path(__file__).resolve().parent.parent
+        STATIC_BUILD_DIR = BASE_PATH / "frontend" / "dist"
+    parser = argparse.ArgumentParser(description="Fingerprint and precompress the frontend assets for app.py.")
+    parser.add_argument('--vendor-cdn', action='store_true', help="Also copy the cdnjs (Prism) files in, so they are served and cached like local assets.")
+    args = parser.parse_args()
+
+    manifest = build(BASE_PATH / "frontend", STATIC_BUILD_DIR, vendor_cdn=args.vendor_cdn)
+    for name, entry in sorted(manifest["files"].items()):
+        logger.info(f"{name:<36} {entry['bytes']:>8} bytes  {'+'.join(entry['encodings']) or 'uncompressed'}")
+    if brotli is None: logger.info("brotli is not installed; only gzip variants were written.")
+    logger.info(f"Built {len(manifest['files'])} files into {STATIC_BUILD_DIR}")
@@ -0,0 +1,106 @@
+# test_app_nl_without_db.py
+# The NL endpoints answer with the stub LLM backend while the database is unreachable
+# (run with: python -m pytest scripts). The app runs in a spawned worker process, so its
+# environment (a closed PGPORT, LLM_BACKEND=stub) and warmup threads stay out of the other tests.
+
+import os
+import json
+import socket
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pytest
+
+QUESTION = "Which songs did he play most often at the Meadowlands?"
+
+
+# --- Run in the app process ---
+def _start_app(cache_dir: str):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = str(s.getsockname()[1]) # Nothing listens once the socket is closed
+    # Read at import time by config.py and database_config.py
+    os.environ.update(PGHOST="127.0.0.1", PGPORT=port, LLM_BACKEND="stub",
+                      LLM_STUB_LATENCY_SECONDS="0", LLM_STUB_JITTER_SECONDS="0")
+    import config
+    config.OUTPUT_PATH = Path(cache_dir) # The NL cache file
+    import app
+    app.DATA_GENERATION_CHECK_INTERVAL = 0
+
+
+def _post(path: str, body: dict):
+    import app
+    response = app.app.test_client().post(path, json=body)
+    return response.status_code, response.get_data(as_text=True)
+
+
+def _prompt_schema_is_schema_sql() -> bool:
+    import app
+    return app.get_prompt_schema() == app.SCHEMA_INFO
+
+
+def _set_digest(digest):
+    """A schema digest built before the outage, or None for none (the app started while the database was down)."""
+    import app
+    from prompt_builder import SchemaDigestCache
+    app.schema_digest = SchemaDigestCache()
+    if digest is not None: app.schema_digest._digest, app.schema_digest._key = digest, None # None: generation unknown
+
+
+# --- Tests ---
+@pytest.fixture(scope="module")
+def run(tmp_path_factory):
+    """Calls a function of this module in the app process and returns its result."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"), initializer=_start_app,
+                             initargs=(str(tmp_path_factory.mktemp("nl_cache")),)) as executor:
+        yield lambda function, *args: executor.submit(function, *args).result(timeout=120)
+
+
+@pytest.fixture(autouse=True)
+def no_digest(run):
+    run(_set_digest, None)
+
+
+def test_prompt_schema_falls_back_to_schema_sql(run):
+    assert run(_prompt_schema_is_schema_sql)
+
+
+def test_process_nl_query(run):
+    status, body = run(_post, "/process_nl_query", {"query": QUESTION})
+    assert status == 200, body
+    assert "FROM songs" in json.loads(body)["sql"]
+    # Answers generated from the schema.sql fallback prompt are not cached
+    status, body = run(_post, "/process_nl_query", {"query": QUESTION})
+    assert status == 200 and not json.loads(body).get("cached")
+
+
+def test_process_nl_query_stream(run):
+    status, body = run(_post, "/process_nl_query_stream", {"query": QUESTION})
+    assert status == 200
+    assert "event: done" in body and "event: error" not in body
+
+
+def test_ask_and_run_reports_the_query_failure_as_json(run):
+    status, body = run(_post, "/ask_and_run", {"query": QUESTION})
+    answer = json.loads(body)
+    assert "FROM songs" in answer["sql"]
+    assert answer["error"] == "Generated SQL failed to execute."
+
+
+def test_batch_without_running(run):
+    status, body = run(_post, "/batch", {"questions": [QUESTION], "run": False})
+    assert status == 200, body
+    item = json.loads(body)["items"][0]
+    assert item["error"] is None and "FROM songs" in item["sql"]
+
+
+def test_nl_cache_survives_an_outage(run):
+    question = "Which songs opened the most shows in 1985?"
+    run(_set_digest, "-- schema digest built before the outage")
+    run(_post, "/process_nl_query", {"query": question})
+    assert json.loads(run(_post, "/process_nl_query", {"query": question})[1])["cached"] == "exact"
+    run(_set_digest, None) # Restarted while the database is down: prompts use schema.sql
+    assert not json.loads(run(_post, "/process_nl_query", {"query": question})[1]).get("cached")
+    run(_set_digest, "-- schema digest built before the outage") # The database is back
+    assert json.loads(run(_post, "/process_nl_query", {"query": question})[1])["cached"] == "exact"
@@ -0,0 +1,55 @@
+# test_nl_query_cache.py
+# Near-duplicate matching of the NL query cache (run with: python -m pytest scripts).
+
+import pytest
+
+from entity_resolver import EntityResolver
+from nl_query_cache import NLQueryCache
+
+NAMES = {'song': ["Thunder Road", "Born to Run"], 'city': ["New York", "Newark"],
+         'state': ["New Jersey", "New York"], 'country': ["United States"]}
+NEW_JERSEY = "How many times has Thunder Road been played live in concert in New Jersey overall?"
+NEW_YORK = "How many times has Thunder Road been played live in concert in New York overall?"
+
+
+@pytest.fixture
+def resolver():
+    return EntityResolver(NAMES)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return NLQueryCache(tmp_path / "nl_cache.sqlite3", "context", "model")
+
+
+def test_questions_differing_in_an_entity_do_not_match(cache, resolver):
+    cache.put(NEW_JERSEY, "SELECT 'nj';", None, resolver.resolve(NEW_JERSEY))
+    assert cache.get(NEW_YORK, resolver.resolve(NEW_YORK)) is None
+
+
+def test_rephrased_question_with_the_same_entities_matches(cache, resolver):
+    cache.put(NEW_JERSEY, "SELECT 'nj';", None, resolver.resolve(NEW_JERSEY))
+    question = "How many times was Thunder Road played live in concert in New Jersey overall?"
+    hit = cache.get(question, resolver.resolve(question))
+    assert hit is not None and hit["match"] == "similar" and hit["sql"] == "SELECT 'nj';"
+
+
+def test_unknown_entities_allow_exact_matches_only(cache, resolver):
+    cache.put(NEW_JERSEY, "SELECT 'nj';", None, resolver.resolve(NEW_JERSEY))
+    assert cache.get(NEW_JERSEY.lower())["match"] == "exact"
+    assert cache.get("How many times was Thunder Road played live in concert in New Jersey overall?") is None
+
+
+def test_entities_survive_a_reload(tmp_path, resolver):
+    NLQueryCache(tmp_path / "nl_cache.sqlite3", "context", "model").put(NEW_JERSEY, "SELECT 'nj';", None, resolver.resolve(NEW_JERSEY))
+    reloaded = NLQueryCache(tmp_path / "nl_cache.sqlite3", "context", "model")
+    assert reloaded.get(NEW_YORK, resolver.resolve(NEW_YORK)) is None
+    question = "How many times was Thunder Road played live in concert in New Jersey overall?"
+    assert reloaded.get(question, resolver.resolve(question))["match"] == "similar"
+
+
+def test_opening_another_context_keeps_the_entries(tmp_path):
+    NLQueryCache(tmp_path / "nl_cache.sqlite3", "digest", "model").put(NEW_JERSEY, "SELECT 'nj';", None)
+    other = NLQueryCache(tmp_path / "nl_cache.sqlite3", "schema.sql", "model")
+    assert other.get(NEW_JERSEY) is None and other.stats()["entries"] == 0
+    assert NLQueryCache(tmp_path / "nl_cache.sqlite3", "digest", "model").get(NEW_JERSEY)["sql"] == "SELECT 'nj';"
@@ -0,0 +1,68 @@
+# test_query_pagination.py
+# Cursor session lifecycle of the pagination registry (run with: python -m pytest scripts).
+
+import pytest
+
+from query_pagination import CursorRegistry, CursorSession
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.closed = False
+
+    def fetchmany(self, size):
+        page, self.rows = self.rows[:size], self.rows[size:]
+        return page
+
+    def close(self):
+        self.closed = True
+
+
+class CountingPool:
+    def __init__(self):
+        self.returned = []
+
+    def putconn(self, conn):
+        self.returned.append(conn)
+
+
+def session(name, rows=10):
+    return CursorSession(name, f"conn-{name}", FakeCursor([(i,) for i in range(rows)]), ["n"], "SELECT n", rows)
+
+
+@pytest.fixture
+def registry():
+    return CursorRegistry(CountingPool(), max_open=1, idle_seconds=60)
+
+
+def test_close_returns_the_connection_once(registry):
+    first = session("a")
+    with first.lock:
+        registry._close(first, "completed")
+        registry._close(first, "evicted")
+    assert registry.pool.returned == ["conn-a"]
+    assert registry.stats()["completed"] == 1 and registry.stats()["evicted"] == 0
+
+
+def test_eviction_skips_a_cursor_being_read(registry):
+    busy, idle = session("busy"), session("idle")
+    registry._register(busy)
+    with busy.lock: # A fetch is reading this cursor
+        registry._register(idle)
+    assert registry.pool.returned == []
+    assert not busy.closed and not idle.closed
+    registry._register(session("new"))
+    assert sorted(registry.pool.returned) == ["conn-busy", "conn-idle"]
+
+
+def test_evicted_cursor_is_gone(registry):
+    first = session("a")
+    registry._register(first)
+    registry._register(session("b"))
+    assert first.closed and registry.pool.returned == ["conn-a"]
+    with pytest.raises(KeyError): registry.fetch("a", 3)
+    assert not registry.cancel("a")
+    page, _ = registry.fetch("b", 3)
+    assert page["data"] == [(0,), (1,), (2,)] and page["has_more"]
+    assert registry.pool.returned == ["conn-a"]
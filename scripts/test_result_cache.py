@@ -0,0 +1,33 @@
+# test_result_cache.py
+# Which /query results may be cached (run with: python -m pytest scripts).
+
+import pytest
+
+from result_cache import is_volatile
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM shows WHERE date >= CURRENT_DATE - INTERVAL '1 year'",
+    "select * from shows where date > now() - interval '30 days'",
+    "SELECT title FROM songs ORDER BY RANDOM () LIMIT 5",
+    "SELECT current_timestamp",
+    "SELECT localtimestamp, clock_timestamp()",
+    "SELECT * FROM shows WHERE date > 'today'::date - 365",
+    "SELECT * FROM shows WHERE date < ' NOW '::timestamp",
+    "SELECT * FROM shows WHERE date >= DATE 'yesterday'",
+    "SELECT * FROM shows WHERE date < CAST('tomorrow' AS timestamp without time zone)",
+])
+def test_time_dependent_and_random_queries_are_volatile(sql):
+    assert is_volatile(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT title, times_played FROM songs ORDER BY times_played DESC LIMIT 10",
+    "SELECT * FROM shows WHERE show_notes ILIKE '%played now()%'", # Inside a literal
+    "SELECT \"current_date\" FROM t", # Quoted identifier
+    "SELECT 1 -- ORDER BY random()",
+    "SELECT * FROM songs WHERE title = 'Today'",
+    "SELECT snow(1), known_date FROM t",
+])
+def test_deterministic_queries_are_cacheable(sql):
+    assert not is_volatile(sql)
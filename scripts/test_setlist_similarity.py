@@ -0,0 +1,70 @@
+# test_setlist_similarity.py
+# Filtered top-k queries of the MinHash/LSH index (run with: python -m pytest scripts).
+
+import copy
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from setlist_similarity import SetlistSimilarityIndex
+
+TOURS = ["Born to Run Tour", "River Tour", "Wrecking Ball Tour"]
+
+
+@pytest.fixture(scope="module")
+def index():
+    rng = random.Random(7)
+    show_songs, show_meta = {}, {}
+    for show_id in range(1, 301):
+        show_songs[show_id] = set(rng.sample(range(200), 20))
+        show_meta[show_id] = {"date": date(1975, 1, 1) + timedelta(days=show_id * 30) if show_id % 50 else None,
+                              "tour": TOURS[show_id % 3], "venue": f"Venue {show_id}", "city": "Asbury Park"}
+    return SetlistSimilarityIndex.build(show_songs, show_meta)
+
+
+def brute_force(index, show_id, k, tour=None, start_date=None, end_date=None):
+    """Exact top-k over the shows passing the filters."""
+    target = index.song_sets[index._row_by_show_id[show_id]]
+    scored = []
+    for row, meta in enumerate(index.show_meta):
+        if int(index.show_ids[row]) == show_id: continue
+        if tour and meta["tour"].lower() != tour.lower(): continue
+        if (start_date or end_date) and meta["date"] is None: continue
+        if start_date and meta["date"] < start_date or end_date and meta["date"] > end_date: continue
+        other = index.song_sets[row]
+        scored.append((-round(len(target & other) / len(target | other), 4), int(index.show_ids[row])))
+    return [show for _, show in sorted(scored)[:k]]
+
+
+@pytest.mark.parametrize("tour, start_date, end_date", [
+    ("river tour", date(1980, 1, 1), date(1983, 12, 31)),
+    (None, date(1990, 1, 1), date(1991, 12, 31)),
+    ("Wrecking Ball Tour", date(1976, 1, 1), date(1978, 1, 1)),
+    ("No Such Tour", None, None),
+])
+def test_narrow_filter_is_exact(index, tour, start_date, end_date):
+    # Few enough shows pass that all of them are scored exactly
+    for show_id in (1, 77, 150):
+        results = index.query(show_id, 5, tour, start_date, end_date)
+        assert [r["show_id"] for r in results] == brute_force(index, show_id, 5, tour, start_date, end_date)
+
+
+@pytest.mark.parametrize("tour, start_date, end_date", [
+    ("RIVER TOUR", None, None),
+    (None, date(1990, 1, 1), None),
+    (None, None, date(1985, 1, 1)),
+])
+def test_broad_filter_returns_matching_shows(index, tour, start_date, end_date):
+    for show_id in (1, 77, 150):
+        results = index.query(show_id, 10, tour, start_date, end_date)
+        assert len(results) == 10 and results == sorted(results, key=lambda r: -r["jaccard"])
+        assert set(r["show_id"] for r in results) <= set(brute_force(index, show_id, 300, tour, start_date, end_date))
+
+
+def test_add_show_updates_the_filters(index):
+    index = copy.deepcopy(index) # Leaves the shared index as built
+    index.query(1, 5, tour="New Tour")
+    index.add_show(1000, set(index.song_sets[0]), {"date": date(2030, 1, 1), "tour": "New Tour", "venue": "V", "city": "C"})
+    assert [r["show_id"] for r in index.query(1, 5, tour="New Tour")] == [1000]
+    assert [r["show_id"] for r in index.query(1, 5, start_date=date(2029, 1, 1))] == [1000]